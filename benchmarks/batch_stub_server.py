@@ -0,0 +1,212 @@
+"""
+本地批处理测试服务
+模拟OpenAI兼容的Files和Batch接口，不调用真实模型：上传的每个请求按提示词中的文章标题返回一篇固定格式的文案
+（多段提示词时返回相应数量的变体），用于在本地验证 --batch 的提交、查询、续跑和结果解析。
+批处理提交后经过 validating、in_progress、finalizing，--delay 秒后完成；--fail-rate 控制失败请求的比例，
+--drop-rate 让部分文案缺少标签段落，用于验证补全；补全请求走本服务的 /v1/chat/completions
+
+用法:
+    python benchmarks/batch_stub_server.py [--port 8765] [--delay 5] [--fail-rate 0] [--drop-rate 0]
+    BATCH_BASE_URL=http://127.0.0.1:8765/v1 python -m small_redbook.main --batch
+"""
+import argparse
+import email
+import email.policy
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TITLE_PATTERN = re.compile(r'文章标题:\s*(.+)')
+VARIANTS_PATTERN = re.compile(r'生成 (\d+) 篇不同的文案')
+
+
+def fake_copy(title: str, variant: int = 0, drop_tags: bool = False) -> str:
+    """按文章标题生成一篇段落标记格式的文案"""
+    angles = ['🔥一文看懂', '✨划重点', '💡太实用了', '🚀最新进展']
+    body = f"今天聊聊「{title}」😊 " + "这项进展值得关注，普通人也能看懂其中的门道。" * 12
+    copy = f"[标题开始]\n{angles[variant % len(angles)]}：{title[:12]}\n[标题结束]\n[正文开始]\n{body}\n[正文结束]\n"
+    if not drop_tags:
+        copy += "[标签开始]\n#AI #科技 #人工智能 #大模型 #干货 #学习\n[标签结束]\n"
+    return copy
+
+
+def completion_text(body: dict, drop_tags: bool = False) -> str:
+    """按请求体中的提示词构造模型输出"""
+    prompt = body['messages'][-1]['content']
+    match = TITLE_PATTERN.search(prompt)
+    title = match.group(1).strip() if match else '未知文章'
+    if '请只补全缺少的标签' in prompt:
+        return "[标签开始]\n#AI #科技 #人工智能 #大模型 #干货 #学习\n[标签结束]"
+    variants = VARIANTS_PATTERN.search(prompt)
+    if not variants:
+        return fake_copy(title, drop_tags=drop_tags)
+    count = int(variants.group(1))
+    return ''.join(f"[文案{i}开始]\n{fake_copy(title, i - 1)}[文案{i}结束]\n" for i in range(1, count + 1))
+
+
+def chat_completion(body: dict, drop_tags: bool = False) -> dict:
+    content = completion_text(body, drop_tags)
+    return {
+        'id': f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': body.get('model', 'stub'),
+        'choices': [{'index': 0, 'finish_reason': 'stop',
+                     'message': {'role': 'assistant', 'content': content}}],
+        'usage': {'prompt_tokens': 0, 'completion_tokens': len(content), 'total_tokens': len(content)},
+    }
+
+
+class BatchStub:
+    """内存中的文件和批处理"""
+
+    def __init__(self, delay: float, fail_rate: float, drop_rate: float):
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.drop_rate = drop_rate
+        self.files = {}
+        self.batches = {}
+        self.lock = threading.Lock()
+
+    def add_file(self, filename: str, data: bytes, purpose: str) -> dict:
+        file_id = f"file-{uuid.uuid4().hex[:12]}"
+        info = {'id': file_id, 'object': 'file', 'bytes': len(data), 'created_at': int(time.time()),
+                'filename': filename, 'purpose': purpose, 'status': 'processed'}
+        with self.lock:
+            self.files[file_id] = (info, data)
+        return info
+
+    def create_batch(self, params: dict) -> dict:
+        batch_id = f"batch_{uuid.uuid4().hex[:12]}"
+        _, data = self.files[params['input_file_id']]
+        total = sum(1 for line in data.decode('utf-8').splitlines() if line.strip())
+        batch = {
+            'id': batch_id, 'object': 'batch', 'endpoint': params['endpoint'],
+            'input_file_id': params['input_file_id'], 'completion_window': params['completion_window'],
+            'status': 'validating', 'output_file_id': None, 'error_file_id': None,
+            'created_at': int(time.time()), 'request_counts': {'total': total, 'completed': 0, 'failed': 0},
+        }
+        with self.lock:
+            self.batches[batch_id] = batch
+        return batch
+
+    def retrieve_batch(self, batch_id: str) -> dict:
+        with self.lock:
+            batch = self.batches[batch_id]
+            elapsed = time.time() - batch['created_at']
+            if batch['status'] not in ('completed', 'cancelled'):
+                if elapsed >= self.delay:
+                    self._complete(batch)
+                elif elapsed >= self.delay * 0.8:
+                    batch['status'] = 'finalizing'
+                elif elapsed >= self.delay * 0.2:
+                    batch['status'] = 'in_progress'
+            return batch
+
+    def _complete(self, batch: dict):
+        _, data = self.files[batch['input_file_id']]
+        outputs, errors = [], []
+        for line in data.decode('utf-8').splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            record = {'id': f"batch_req_{uuid.uuid4().hex[:12]}", 'custom_id': request['custom_id']}
+            if random.random() < self.fail_rate:
+                errors.append(dict(record, response=None,
+                                   error={'code': 'server_error', 'message': '模拟的批处理请求失败'}))
+                continue
+            body = chat_completion(request['body'], drop_tags=random.random() < self.drop_rate)
+            outputs.append(dict(record, error=None,
+                                response={'status_code': 200, 'request_id': record['id'], 'body': body}))
+        for key, lines in (('output_file_id', outputs), ('error_file_id', errors)):
+            if lines:
+                content = ''.join(json.dumps(line, ensure_ascii=False) + '\n' for line in lines).encode('utf-8')
+                file_id = f"file-{uuid.uuid4().hex[:12]}"
+                self.files[file_id] = ({'id': file_id, 'object': 'file', 'purpose': 'batch_output'}, content)
+                batch[key] = file_id
+        batch['status'] = 'completed'
+        batch['completed_at'] = int(time.time())
+        batch['request_counts'] = {'total': len(outputs) + len(errors), 'completed': len(outputs),
+                                   'failed': len(errors)}
+
+
+def make_handler(stub: BatchStub):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, payload=None, raw: bytes = None):
+            data = raw if raw is not None else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/octet-stream' if raw is not None else 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _body(self) -> bytes:
+            return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        def do_POST(self):
+            path = self.path.split('?')[0]
+            if path.endswith('/files'):
+                # multipart/form-data: file 和 purpose 两个字段
+                message = email.message_from_bytes(
+                    f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode('utf-8') + self._body(),
+                    policy=email.policy.default
+                )
+                fields, filename, data = {}, 'batch.jsonl', b''
+                for part in message.iter_parts():
+                    name = part.get_param('name', header='content-disposition')
+                    if name == 'file':
+                        filename = part.get_filename() or filename
+                        data = part.get_payload(decode=True)
+                    else:
+                        fields[name] = part.get_content().strip()
+                self._send(200, stub.add_file(filename, data, fields.get('purpose', 'batch')))
+            elif path.endswith('/batches'):
+                self._send(200, stub.create_batch(json.loads(self._body())))
+            elif path.endswith('/chat/completions'):
+                self._send(200, chat_completion(json.loads(self._body())))
+            else:
+                self._send(404, {'error': {'message': f'未知接口 {path}'}})
+
+        def do_GET(self):
+            parts = self.path.split('?')[0].rstrip('/').split('/')
+            try:
+                if parts[-2] == 'batches':
+                    self._send(200, stub.retrieve_batch(parts[-1]))
+                elif parts[-1] == 'content' and parts[-3] == 'files':
+                    self._send(200, raw=stub.files[parts[-2]][1])
+                else:
+                    self._send(404, {'error': {'message': f'未知接口 {self.path}'}})
+            except KeyError:
+                self._send(404, {'error': {'message': '文件或批处理不存在'}})
+
+        def log_message(self, format, *args):
+            print(f"{self.command} {self.path} -> {args[1] if len(args) > 1 else ''}")
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地批处理测试服务')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=5, help='批处理从提交到完成的秒数')
+    parser.add_argument('--fail-rate', type=float, default=0, help='失败请求的比例')
+    parser.add_argument('--drop-rate', type=float, default=0, help='缺少标签段落的文案比例')
+    args = parser.parse_args()
+
+    stub = BatchStub(args.delay, args.fail_rate, args.drop_rate)
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(stub))
+    print(f"批处理测试服务已启动: http://127.0.0.1:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
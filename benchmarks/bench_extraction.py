@@ -0,0 +1,127 @@
+"""
+正文提取基准测试
+在合成的深层嵌套页面上比较：
+- legacy: 原先的选择器 + 逐个div调用get_text的兜底逻辑（O(n²)）
+- cascade: 选择器 + 文本密度兜底
+- density: 仅文本密度
+新的两种引擎会在每个已安装的解析后端（html.parser / lxml / selectolax）上分别测试
+
+用法: python benchmarks/bench_extraction.py [--pages 20] [--depth 12] [--paragraphs 40]
+"""
+import argparse
+import copy
+import os
+import random
+import sys
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'small_redbook'))
+
+from bs4 import BeautifulSoup  # noqa: E402
+from extractor import CONTENT_SELECTORS, extract_article, extract_tags, get_backend  # noqa: E402
+
+WORDS = ['人工智能', '大模型', '芯片', '数据', '训练', '推理', '算法', '研究团队', '开源', '性能', 'AI', '实验']
+
+
+def _sentence(rng: random.Random) -> str:
+    return ''.join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))) + '。'
+
+
+def make_page(rng: random.Random, depth: int, paragraphs: int, with_selectors: bool) -> str:
+    """生成一个带导航、侧栏推荐和深层嵌套正文的页面"""
+    nav = ''.join(f'<li><a href="/c/{i}">频道{i}</a></li>' for i in range(30))
+    sidebar = ''.join(f'<div class="item"><a href="/a/{i}">{_sentence(rng)}</a></div>' for i in range(40))
+    body = ''.join(f'<p>{_sentence(rng)}{_sentence(rng)}</p>' for _ in range(paragraphs))
+    article_class = 'article-content' if with_selectors else 'x-main'
+    article = f'<div class="{article_class}">{body}</div>'
+    for level in range(depth):
+        # 每层容器都带登录入口，旧的div兜底逻辑需要逐层向内对整棵子树调用get_text
+        article = f'<div class="wrap-{level}">{article}<div class="meta">{_sentence(rng)}<a href="/login">登录</a></div></div>'
+    return (
+        '<html><head><script>var a = 1;</script><style>p {}</style></head><body>'
+        f'<div class="header"><ul>{nav}</ul></div>'
+        f'{article}'
+        f'<div class="sidebar">{sidebar}</div>'
+        '<div class="footer"><a href="/about">关于我们</a></div>'
+        '</body></html>'
+    )
+
+
+def legacy_extract(html: str) -> str:
+    """原先 fetch_article_content 中的提取逻辑"""
+    soup = BeautifulSoup(html, 'html.parser')
+    content = ""
+    for selector in CONTENT_SELECTORS:
+        content_elements = soup.select(selector)
+        if content_elements:
+            full_content = ""
+            for element in content_elements:
+                for script in element(["script", "style", "nav", "header", "footer", "aside"]):
+                    script.decompose()
+                element_text = element.get_text().strip()
+                if element_text and len(element_text) > 100 and "登录" not in element_text and "会员" not in element_text:
+                    if "今天" not in element_text and "08月" not in element_text:
+                        full_content += element_text + "\n\n"
+            if len(full_content) > len(content):
+                content = full_content
+                if len(content) > 500:
+                    break
+    if not content or len(content) < 300:
+        for div in soup.find_all('div'):
+            for script in div(["script", "style", "nav", "header", "footer", "aside"]):
+                script.decompose()
+            div_content = div.get_text().strip()
+            if len(div_content) > 1000 and "登录" not in div_content and "会员" not in div_content:
+                if any(keyword in div_content for keyword in ["AI", "人工智能", "模型", "芯片", "数据"]):
+                    if "今天" not in div_content[:500] and "08月" not in div_content[:500]:
+                        content = div_content
+                        break
+    extract_tags(soup, get_backend('html.parser'))
+    return content
+
+
+def available_backends():
+    """列出已安装的解析后端"""
+    names = []
+    for name in ('html.parser', 'lxml', 'selectolax'):
+        if get_backend(name).name == name:
+            names.append(name)
+    return names
+
+
+def bench(name, func, pages):
+    lengths = []
+    start = time.perf_counter()
+    with redirect_stdout(StringIO()):
+        for html in pages:
+            lengths.append(len(func(html)))
+    elapsed = time.perf_counter() - start
+    print(f"{name:<24} {elapsed * 1000 / len(pages):8.2f} ms/页   平均内容长度 {sum(lengths) / len(lengths):8.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='正文提取基准测试')
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--depth', type=int, default=12)
+    parser.add_argument('--paragraphs', type=int, default=40)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with redirect_stdout(StringIO()):
+        backends = available_backends()
+    for with_selectors in (True, False):
+        pages = [make_page(rng, args.depth, args.paragraphs, with_selectors) for _ in range(args.pages)]
+        label = '选择器可命中' if with_selectors else '选择器未命中（走兜底）'
+        print(f"\n== {label}: {args.pages} 页, 嵌套深度 {args.depth}, 段落 {args.paragraphs} ==")
+        bench('legacy', legacy_extract, copy.copy(pages))
+        for backend in backends:
+            for engine in ('cascade', 'density'):
+                bench(f"{engine}/{backend}",
+                      lambda html: extract_article(html, engine=engine, backend=backend)['content'], pages)
+
+
+if __name__ == '__main__':
+    main()
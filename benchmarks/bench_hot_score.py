@@ -0,0 +1,86 @@
+"""
+热度评分基准测试
+在合成文章上比较原先逐关键词 `in` 判断的 calculate_hot_score 与 HotScorer，
+并校验两者评分一致；用 --extra-keywords 扩大关键词表可以看到正则匹配的收益
+
+用法: python benchmarks/bench_hot_score.py [--entries 100000] [--extra-keywords 0]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'small_redbook'))
+
+from hot_score import HotScorer, KeywordMatcher  # noqa: E402
+
+HOT_KEYWORDS = ['AI', '人工智能', '大模型', '深度学习', '机器学习', 'NLP', 'CV', 'GPT', 'BERT', '算法', '神经网络', '芯片', '数据集', '发布', '突破']
+BOOST_WORDS = ['最新', '发布', '重磅', '突破', '升级', '开源']
+FILLER = '的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可也你能而子那得着下自之年过后里'
+
+
+def legacy_score(article, hot_keywords):
+    """原先 get_popular_articles 中的 calculate_hot_score"""
+    score = 0
+    title = article.get('title', '')
+    summary = article.get('summary', '')
+    for keyword in hot_keywords:
+        if keyword in title:
+            score += 15
+        if keyword in summary:
+            score += 8
+    if 10 <= len(title) <= 50:
+        score += 5
+    if any(word in title for word in BOOST_WORDS):
+        score += 10
+    summary_length = len(summary)
+    if summary_length > 200:
+        score += 10
+    elif summary_length > 100:
+        score += 5
+    return score
+
+
+def make_text(rng, length, keywords):
+    chars = [rng.choice(FILLER) for _ in range(length)]
+    for _ in range(rng.randint(0, 3)):
+        chars.insert(rng.randrange(len(chars) + 1), rng.choice(keywords))
+    return ''.join(chars)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='热度评分基准测试')
+    parser.add_argument('--entries', type=int, default=100000)
+    parser.add_argument('--extra-keywords', type=int, default=0, help='额外追加的随机关键词数量，模拟更大的关键词表')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    keywords = list(HOT_KEYWORDS)
+    for i in range(args.extra_keywords):
+        keywords.append(f"词{i}" + ''.join(rng.choice(FILLER) for _ in range(2)))
+    articles = [
+        {'title': make_text(rng, rng.randint(8, 40), keywords), 'summary': make_text(rng, rng.randint(50, 300), keywords)}
+        for _ in range(args.entries)
+    ]
+    mode = '正则' if len(keywords) >= KeywordMatcher.REGEX_MIN_KEYWORDS else '逐个 in 判断'
+    print(f"{args.entries} 篇文章，{len(keywords)} 个关键词（HotScorer 使用{mode}）")
+
+    start = time.perf_counter()
+    expected = [legacy_score(article, keywords) for article in articles]
+    legacy_elapsed = time.perf_counter() - start
+
+    scorer = HotScorer({keyword: 1 for keyword in keywords}, BOOST_WORDS)
+    start = time.perf_counter()
+    scores = scorer.score_batch(articles)
+    batch_elapsed = time.perf_counter() - start
+
+    mismatches = sum(1 for a, b in zip(expected, scores) if a != b)
+    print(f"legacy     {legacy_elapsed:6.2f} s   {args.entries / legacy_elapsed:10.0f} 篇/秒")
+    print(f"HotScorer  {batch_elapsed:6.2f} s   {args.entries / batch_elapsed:10.0f} 篇/秒")
+    print(f"评分不一致: {mismatches}")
+
+
+if __name__ == '__main__':
+    main()
@@ -18,6 +18,13 @@ setup(
         "python-dotenv>=1.0.1",
     ],
     extras_require={
+        "fast": [
+            "lxml>=5.0.0",
+            "selectolax>=0.3.21",
+        ],
+        "tokenizer": [
+            "tiktoken>=0.7.0",
+        ],
         "dev": [
             "pytest>=7.0.0",
             "black>=22.0.0",
@@ -1,8 +1,25 @@
 from langchain.agents import AgentExecutor, create_tool_calling_agent
+from langchain_core.messages import convert_to_messages
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
-from typing import Dict, List
-from config import DASHSCOPE_API_KEY, AI_MODEL_NAME
+from typing import Callable, Dict, List, Optional, Tuple
+import openai
+from config import (
+    AI_MODEL_NAME, LLM_TEMPERATURE, LLM_MAX_TOKENS, LLM_CACHE_ENABLED, COPY_STREAMING, COPY_OUTPUT_MODE,
+    COPY_REPAIR_ENABLED, COPY_VARIANTS, COPY_VARIANT_MODE, BATCH_BASE_URL
+)
+from copy_ranker import get_copy_ranker
+from copy_parser import (
+    SECTION_NAMES, COPY_JSON_SCHEMA, REPAIR_MAX_TOKENS, CopyFormatError, IncrementalCopyParser,
+    build_copy_messages, build_repair_messages, check_result, finalize_copy, missing_fields, normalize_structured,
+    parse_copy, parse_copy_sections, split_variants
+)
+from llm_cache import LLMResponseCache, get_llm_cache, llm_cache_key
+from llm_client import get_chat_model
+from llm_router import Route, get_llm_router
+from prompt_budget import report_prompt_tokens
+
+# 批处理结果由 BATCH_BASE_URL 上的 AI_MODEL_NAME 生成，缓存键按该路由区分
+BATCH_CACHE_MODEL = Route(AI_MODEL_NAME, BATCH_BASE_URL).cache_name
 
 # 尝试导入MCP客户端
 try:
@@ -14,117 +31,485 @@ except ImportError:
 
 class CopyAgent:
     def __init__(self):
-        # Initialize the LLM
-        self.llm = ChatOpenAI(
-            base_url="https://apis.iflow.cn/v1",
-            api_key=DASHSCOPE_API_KEY,
-            model=AI_MODEL_NAME,
-            temperature=0.7,
-            max_tokens=1500
-        )
+        # Initialize the LLM（进程内共享客户端，复用连接池）
+        self.llm = get_chat_model()
+        # 服务端不支持结构化输出时置为False，之后改用段落标记格式
+        self.structured_output = COPY_OUTPUT_MODE in ('json_schema', 'tool')
+        # 服务端不支持n参数时置为False，之后改用多段提示词生成变体
+        self.variant_n = COPY_VARIANT_MODE in ('auto', 'n')
     
-    def generate_xiaohongshu_copy(self, article_info: Dict) -> Dict:
+    def build_messages(self, article_info: Dict, structured: bool = False, variants: int = 1) -> List[Dict]:
         """
-        调用AI模型生成小红书风格的文案
+        构造生成小红书文案的消息
         :param article_info: 文章信息
-        :return: 生成的文案
+        :param structured: 是否使用结构化输出（此时由JSON Schema约束格式）
+        :param variants: 在一次回复中生成的文案变体数（多段提示词方式）
+        :return: 消息列表
+        """
+        return build_copy_messages(article_info, structured, variants)
+    
+    def parse_copy_result(self, result: str) -> Optional[Dict]:
+        """
+        解析模型返回的自定义格式文案
+        :param result: 模型返回的文本
+        :return: {'title', 'content', 'tags'}，格式不正确时返回None
+        """
+        return parse_copy(result)
+    
+    def _print_section(self, name: str, value: str) -> None:
+        """流式生成时每个段落完成的默认回调"""
+        print(f"{SECTION_NAMES[name]}已生成（{len(value)} 字）: {value[:50]}")
+    
+    def _stream_finished(self, parser: IncrementalCopyParser) -> Dict:
+        if parser.done:
+            print(f"流式生成完成，共接收 {parser.received} 字")
+        else:
+            missing = [SECTION_NAMES[name] for name in missing_fields(parser.sections)]
+            print(f"流式输出结束但文案不完整，缺少: {', '.join(missing)}")
+        return dict(parser.sections)
+    
+    def _stream_copy(self, messages: List[Dict], on_section: Optional[Callable[[str, str], None]] = None) -> Dict:
         """
+        流式生成文案，边接收边解析，格式明显错误时立即中止生成
+        :param messages: 发送给模型的消息
+        :param on_section: 每个段落完成时的回调 on_section(字段名, 内容)
+        :return: 已完成的段落，中止时只包含中止前完成的段落
+        """
+        parser = IncrementalCopyParser(on_section or self._print_section)
+        stream = get_llm_router().stream_messages(messages)
         try:
-            # 构造提示词
-            prompt = f"""
-            请根据以下文章信息，生成一篇小红书风格的文案，包含标题、正文内容和标签。
-
-            文章标题: {article_info['title']}
-            文章内容: {article_info['content'][:2000]}  # 限制内容长度
-            
-            要求:
-            1. 标题要有吸引力，使用小红书常用的emoji，单独一行返回
-            2. 正文内容要通俗易懂，面向普通读者，使用小红书风格的语言，单独一行返回
-            3. 标签要以#开头，用空格分隔，单独一行返回
-            4. 严格按照以下格式返回，不要包含其他解释文字:
-            [标题开始]
-            你的标题内容
-            [标题结束]
-            [正文开始]
-            你的正文内容
-            [正文结束]
-            [标签开始]
-            #标签1 #标签2 #标签3 #标签4 #标签5 #标签6 #标签7 #标签8
-            [标签结束]
-            """
-            
-            # 调用模型
-            messages = [
-                {"role": "system", "content": "你是一个小红书文案专家，擅长将科技类文章转换为小红书风格的文案。严格按照指定格式返回内容，不要包含其他解释文字。"},
-                {"role": "user", "content": prompt}
-            ]
-            
-            response = self.llm.invoke(messages)
-            
-            print("API调用完成")
-            
-            # 获取响应内容
-            result = response.content if hasattr(response, 'content') else str(response)
-            
-            print(f"生成的文案内容: {result}")
-            
-            # 确保返回有效数据
-            if not result:
-                print("模型返回空结果")
+            for chunk in stream:
+                parser.feed(chunk.content or '')
+                # 三个段落都已完成，后面的输出不再需要
+                if parser.done:
+                    break
+        except CopyFormatError as e:
+            print(f"输出不符合格式，提前中止生成（已接收 {parser.received} 字）: {e}")
+            return dict(parser.sections)
+        finally:
+            # 关闭生成器即断开流式响应，服务端停止继续生成
+            stream.close()
+        return self._stream_finished(parser)
+    
+    async def _astream_copy(self, messages: List[Dict],
+                            on_section: Optional[Callable[[str, str], None]] = None) -> Optional[Dict]:
+        """
+        异步流式生成文案，逻辑与 _stream_copy 相同
+        :param messages: 发送给模型的消息
+        :param on_section: 每个段落完成时的回调 on_section(字段名, 内容)
+        :return: 生成的文案，格式错误时返回None
+        """
+        parser = IncrementalCopyParser(on_section or self._print_section)
+        stream = get_llm_router().astream_messages(messages)
+        try:
+            async for chunk in stream:
+                parser.feed(chunk.content or '')
+                if parser.done:
+                    break
+        except CopyFormatError as e:
+            print(f"输出不符合格式，提前中止生成（已接收 {parser.received} 字）: {e}")
+            return dict(parser.sections)
+        finally:
+            await stream.aclose()
+        return self._stream_finished(parser)
+    
+    def _parse_sections(self, response) -> Dict:
+        """从段落标记格式的响应中取出能解析的字段"""
+        result = response.content if hasattr(response, 'content') else str(response)
+        if not check_result(result):
+            return {}
+        return parse_copy_sections(result)
+    
+    def _structured_model(self, llm):
+        method = 'json_schema' if COPY_OUTPUT_MODE == 'json_schema' else 'function_calling'
+        return llm.with_structured_output(COPY_JSON_SCHEMA, method=method, include_raw=True)
+    
+    def _structured_fields(self, output: Dict) -> Dict:
+        """
+        取出结构化输出中的有效字段；JSON不完整（例如被截断）时从原始输出中尽量取出已生成的字段
+        :param output: with_structured_output(include_raw=True) 的返回值
+        :return: 有效字段
+        """
+        parsed = output.get('parsed')
+        if isinstance(parsed, dict):
+            fields = normalize_structured(parsed)
+        else:
+            raw = output.get('raw')
+            error = str(output.get('parsing_error') or '')
+            print(f"结构化输出解析失败: {error.splitlines()[0] if error else '无解析结果'}")
+            tool_calls = getattr(raw, 'tool_calls', None) or getattr(raw, 'invalid_tool_calls', None)
+            if tool_calls:
+                fields = normalize_structured(tool_calls[0].get('args'))
+            else:
+                fields = normalize_structured(getattr(raw, 'content', '') or '')
+        print(f"结构化输出: 有效字段 {', '.join(SECTION_NAMES[name] for name in fields) or '无'}")
+        return fields
+    
+    def _structured_unsupported(self, error: Exception):
+        print(f"服务端不支持结构化输出（{COPY_OUTPUT_MODE}），改用段落标记格式: {error}")
+        self.structured_output = False
+    
+    def _structured_copy(self, messages: List[Dict]) -> Optional[Dict]:
+        """
+        使用JSON Schema或工具调用生成文案
+        :param messages: 发送给模型的消息
+        :return: 有效字段，服务端不支持结构化输出时返回None
+        """
+        try:
+            output = get_llm_router().invoke_messages(messages, wrap=self._structured_model)
+            return self._structured_fields(output)
+        except openai.BadRequestError as e:
+            self._structured_unsupported(e)
+            return None
+    
+    async def _astructured_copy(self, messages: List[Dict]) -> Optional[Dict]:
+        """异步使用结构化输出生成文案，逻辑与 _structured_copy 相同"""
+        try:
+            output = await get_llm_router().ainvoke_messages(messages, wrap=self._structured_model)
+            return self._structured_fields(output)
+        except openai.BadRequestError as e:
+            self._structured_unsupported(e)
+            return None
+    
+    def _fields_to_repair(self, sections: Dict) -> List[str]:
+        """
+        需要补全的字段
+        :param sections: 已生成的字段
+        :return: 缺少的字段；没有任何有效字段或未开启补全时返回空列表
+        """
+        missing = missing_fields(sections)
+        if not missing:
+            return []
+        names = ', '.join(SECTION_NAMES[name] for name in missing)
+        if not sections or not COPY_REPAIR_ENABLED:
+            print(f"文案缺少: {names}")
+            return []
+        print(f"文案缺少: {names}，只补全缺少的字段")
+        return missing
+    
+    def _repaired(self, field: str, response) -> Optional[str]:
+        result = response.content if hasattr(response, 'content') else str(response)
+        value = parse_copy_sections(result, [field]).get(field)
+        if value:
+            print(f"{SECTION_NAMES[field]}补全成功")
+        else:
+            print(f"{SECTION_NAMES[field]}补全失败")
+        return value
+    
+    def _repair(self, article_info: Dict, sections: Dict) -> Optional[Dict]:
+        """
+        补全缺少的字段，每个字段一次简短请求，而不是整篇重新生成
+        :param article_info: 文章信息
+        :param sections: 已生成的字段
+        :return: 完整的文案（字段齐全时直接返回），无法补全时返回None
+        """
+        for field in self._fields_to_repair(sections):
+            messages = build_repair_messages(article_info, sections, field)
+            response = get_llm_router().invoke_messages(messages, max_tokens=REPAIR_MAX_TOKENS[field])
+            value = self._repaired(field, response)
+            if not value:
                 return None
-                
-            # 检查是否是错误信息
-            if "error" in result.lower() or "ErrorMsg" in result:
-                print("模型返回错误信息")
+            sections[field] = value
+        return finalize_copy(sections)
+    
+    async def _arepair(self, article_info: Dict, sections: Dict) -> Optional[Dict]:
+        """异步补全缺少的字段，逻辑与 _repair 相同"""
+        for field in self._fields_to_repair(sections):
+            messages = build_repair_messages(article_info, sections, field)
+            response = await get_llm_router().ainvoke_messages(messages, max_tokens=REPAIR_MAX_TOKENS[field])
+            value = self._repaired(field, response)
+            if not value:
                 return None
-                
-            # 解析自定义格式的内容
+            sections[field] = value
+        return finalize_copy(sections)
+    
+    def _variant_texts_from_n(self, result, count: int) -> List[str]:
+        """取出n参数返回的各个候选；返回数量不足说明服务端忽略了n参数"""
+        texts = [generation.text for generation in result.generations[0]]
+        if len(texts) < count:
+            print(f"服务端只返回 {len(texts)} 个候选（不支持n参数），之后改用多段提示词生成变体")
+            self.variant_n = False
+        return texts
+    
+    def _n_unsupported(self, error: Exception):
+        print(f"服务端不支持n参数，改用多段提示词生成变体: {error}")
+        self.variant_n = False
+    
+    def _request_variants(self, article_info: Dict, count: int) -> List[str]:
+        """
+        一次请求生成多个文案变体
+        :param article_info: 文章信息
+        :param count: 变体数
+        :return: 各变体的原始文本
+        """
+        router = get_llm_router()
+        if self.variant_n:
+            # generate 接口需要消息对象
+            messages = convert_to_messages(self.build_messages(article_info))
             try:
-                # 提取标题
-                title_start = result.find("[标题开始]")
-                title_end = result.find("[标题结束]")
-                if title_start != -1 and title_end != -1:
-                    title = result[title_start+6:title_end].strip()
-                else:
-                    print("无法找到标题")
-                    return None
-                    
-                # 提取正文
-                content_start = result.find("[正文开始]")
-                content_end = result.find("[正文结束]")
-                if content_start != -1 and content_end != -1:
-                    content = result[content_start+6:content_end].strip()
+                result = router.invoke(lambda route: route.chat_model().generate([messages], n=count),
+                                       lambda route: route.chat_model().agenerate([messages], n=count))
+                return self._variant_texts_from_n(result, count)
+            except openai.BadRequestError as e:
+                self._n_unsupported(e)
+        # 多段提示词：所有变体在一次回复中返回，生成长度相应放宽
+        messages = self.build_messages(article_info, variants=count)
+        response = router.invoke_messages(messages, max_tokens=LLM_MAX_TOKENS * count)
+        result = response.content if hasattr(response, 'content') else str(response)
+        return split_variants(result, count)
+    
+    async def _arequest_variants(self, article_info: Dict, count: int) -> List[str]:
+        """异步生成多个文案变体，逻辑与 _request_variants 相同"""
+        router = get_llm_router()
+        if self.variant_n:
+            messages = convert_to_messages(self.build_messages(article_info))
+            try:
+                result = await router.ainvoke(lambda route: route.chat_model().agenerate([messages], n=count))
+                return self._variant_texts_from_n(result, count)
+            except openai.BadRequestError as e:
+                self._n_unsupported(e)
+        messages = self.build_messages(article_info, variants=count)
+        response = await router.ainvoke_messages(messages, max_tokens=LLM_MAX_TOKENS * count)
+        result = response.content if hasattr(response, 'content') else str(response)
+        return split_variants(result, count)
+    
+    def _rank_variants(self, texts: List[str]) -> Tuple[List[Dict], Optional[Dict]]:
+        """
+        解析并排序变体
+        :param texts: 各变体的原始文本
+        :return: (按评分从高到低排序的完整变体, 没有完整变体时第一个有内容的变体的已解析字段)
+        """
+        copies, partial = [], None
+        for text in texts:
+            sections = parse_copy_sections(text)
+            copy_data = finalize_copy(sections)
+            if copy_data:
+                copies.append(copy_data)
+            elif sections and partial is None:
+                partial = sections
+        ranker = get_copy_ranker()
+        ranked = []
+        for copy_data in ranker.rank(copies):
+            ranked.append(dict(copy_data, score=ranker.score(copy_data)))
+        print(f"收到 {len(texts)} 个文案变体，完整 {len(copies)} 个，评分: "
+              f"{', '.join(str(copy_data['score']) for copy_data in ranked) or '无'}")
+        return ranked, partial
+    
+    def _pick_best(self, ranked: List[Dict]) -> Optional[Dict]:
+        """评分最高的变体作为文案，其余变体作为候选附在 alternatives 中"""
+        if not ranked:
+            return None
+        best = dict(ranked[0], alternatives=ranked[1:])
+        print(f"选用评分最高的文案（{best['score']} 分）: {best['title']}")
+        return best
+    
+    def generate_xiaohongshu_variants(self, article_info: Dict, count: int = COPY_VARIANTS) -> List[Dict]:
+        """
+        一次请求生成多个文案变体并按本地评分排序
+        服务端支持时使用n参数（提示词只计费一次），否则在一次回复中按多段格式返回所有变体
+        :param article_info: 文章信息
+        :param count: 变体数
+        :return: 按评分从高到低排序的文案（每篇带 score），全部失败时为空列表
+        """
+        try:
+            messages = self.build_messages(article_info)
+            cache, cache_key, cached = self._lookup_cache(messages, count)
+            if cached is not None:
+                return cached['variants']
+            report_prompt_tokens(article_info, messages)
+            
+            ranked, partial = self._rank_variants(self._request_variants(article_info, count))
+            if not ranked and partial:
+                repaired = self._repair(article_info, partial)
+                ranked = [dict(repaired, score=get_copy_ranker().score(repaired))] if repaired else []
+            if cache is not None and ranked:
+                cache.put(cache_key, get_llm_router().cache_model, {'variants': ranked})
+            return ranked
+            
+        except Exception as e:
+            print(f"生成小红书文案变体失败: {e}")
+            import traceback
+            traceback.print_exc()
+            return []
+    
+    async def agenerate_xiaohongshu_variants(self, article_info: Dict, count: int = COPY_VARIANTS) -> List[Dict]:
+        """
+        异步生成多个文案变体并排序，超时和异常由调用方处理
+        :param article_info: 文章信息
+        :param count: 变体数
+        :return: 按评分从高到低排序的文案
+        """
+        messages = self.build_messages(article_info)
+        cache, cache_key, cached = self._lookup_cache(messages, count)
+        if cached is not None:
+            return cached['variants']
+        report_prompt_tokens(article_info, messages)
+        
+        ranked, partial = self._rank_variants(await self._arequest_variants(article_info, count))
+        if not ranked and partial:
+            repaired = await self._arepair(article_info, partial)
+            ranked = [dict(repaired, score=get_copy_ranker().score(repaired))] if repaired else []
+        if cache is not None and ranked:
+            cache.put(cache_key, get_llm_router().cache_model, {'variants': ranked})
+        return ranked
+    
+    def _lookup_cache(self, messages: List[Dict], n: int = 1,
+                      model: Optional[str] = None) -> Tuple[Optional[LLMResponseCache], Optional[str], Optional[Dict]]:
+        """
+        查询大模型响应缓存（LLM_CACHE_ENABLED 开启时）
+        :param messages: 发送给模型的消息
+        :param n: 文案变体数
+        :param model: 生成结果的模型标识，默认为模型路由的 cache_model
+        :return: (缓存, 缓存键, 命中的文案)，未开启缓存时均为None
+        """
+        if not LLM_CACHE_ENABLED:
+            return None, None, None
+        cache = get_llm_cache()
+        key = llm_cache_key(model or get_llm_router().cache_model, LLM_TEMPERATURE, messages, n)
+        cached = cache.get(key)
+        if cached is not None:
+            print("命中大模型响应缓存，跳过模型调用")
+        return cache, key, cached
+
+    def _cache_messages(self, article_info: Dict, count: int) -> List[Dict]:
+        """
+        与交互生成相同的缓存键消息：单篇文案按当前的输出格式（COPY_OUTPUT_MODE）构造，多个变体固定为段落标记格式
+        :param article_info: 文章信息
+        :param count: 文案变体数
+        :return: 用于计算缓存键的消息
+        """
+        if count == 1:
+            return self.build_messages(article_info, self.structured_output)
+        return self.build_messages(article_info)
+
+    def batch_request(self, article_info: Dict, count: int = COPY_VARIANTS) -> Dict:
+        """
+        构造批处理文件中一篇文章的请求体
+        批处理无法根据返回结果切换格式，因此固定使用段落标记格式，多个变体使用多段提示词
+        :param article_info: 文章信息
+        :param count: 文案变体数
+        :return: /v1/chat/completions 的请求体
+        """
+        messages = self.build_messages(article_info, variants=count)
+        report_prompt_tokens(article_info, messages)
+        return {
+            'model': AI_MODEL_NAME,
+            'messages': messages,
+            'temperature': LLM_TEMPERATURE,
+            'max_tokens': LLM_MAX_TOKENS * count,
+        }
+
+    def cached_copy(self, article_info: Dict, count: int = COPY_VARIANTS) -> Optional[Dict]:
+        """
+        批处理提交前查询缓存；只有默认路由且批处理使用同一接口地址时，与交互生成共用缓存键
+        :param article_info: 文章信息
+        :param count: 文案变体数
+        :return: 缓存的文案，未命中时返回None
+        """
+        _, _, cached = self._lookup_cache(self._cache_messages(article_info, count), count, BATCH_CACHE_MODEL)
+        if cached is not None and count > 1:
+            return self._pick_best(cached['variants'])
+        return cached
+
+    def copy_from_batch_result(self, article_info: Dict, result: str, count: int = COPY_VARIANTS) -> Optional[Dict]:
+        """
+        解析批处理返回的文本，缺少的字段通过交互接口补全，结果写入缓存
+        :param article_info: 文章信息
+        :param result: 模型返回的文本
+        :param count: 文案变体数
+        :return: 生成的文案（多个变体时为评分最高的一篇），无法解析时返回None
+        """
+        cache = get_llm_cache() if LLM_CACHE_ENABLED else None
+        cache_key = llm_cache_key(BATCH_CACHE_MODEL, LLM_TEMPERATURE, self._cache_messages(article_info, count), count)
+        if count > 1:
+            ranked, partial = self._rank_variants(split_variants(result, count))
+            if not ranked and partial:
+                repaired = self._repair(article_info, partial)
+                ranked = [dict(repaired, score=get_copy_ranker().score(repaired))] if repaired else []
+            if cache is not None and ranked:
+                cache.put(cache_key, BATCH_CACHE_MODEL, {'variants': ranked})
+            return self._pick_best(ranked)
+        sections = parse_copy_sections(result) if check_result(result) else {}
+        copy_data = self._repair(article_info, sections)
+        if cache is not None and copy_data:
+            cache.put(cache_key, BATCH_CACHE_MODEL, copy_data)
+        return copy_data
+
+    def generate_xiaohongshu_copy(self, article_info: Dict,
+                                  on_section: Optional[Callable[[str, str], None]] = None) -> Dict:
+        """
+        调用AI模型生成小红书风格的文案
+        :param article_info: 文章信息
+        :param on_section: 流式生成（COPY_STREAMING）时每个段落完成的回调
+        :return: 生成的文案（COPY_VARIANTS 大于1时为评分最高的变体，其余变体在 alternatives 中）
+        """
+        if COPY_VARIANTS > 1:
+            return self._pick_best(self.generate_xiaohongshu_variants(article_info))
+        try:
+            structured = self.structured_output
+            messages = self.build_messages(article_info, structured)
+            cache, cache_key, cached = self._lookup_cache(messages)
+            if cached is not None:
+                return cached
+            report_prompt_tokens(article_info, messages)
+            
+            sections = self._structured_copy(messages) if structured else None
+            if sections is None:
+                if structured:
+                    messages = self.build_messages(article_info)
+                if COPY_STREAMING:
+                    sections = self._stream_copy(messages, on_section)
                 else:
-                    print("无法找到正文")
-                    return None
+                    # 经模型路由调用，主模型慢时对冲到备用模型
+                    response = get_llm_router().invoke_messages(messages)
                     
-                # 提取标签
-                tags_start = result.find("[标签开始]")
-                tags_end = result.find("[标签结束]")
-                if tags_start != -1 and tags_end != -1:
-                    tags_str = result[tags_start+6:tags_end].strip()
-                    # 按空格分割标签
-                    tags = [tag.strip() for tag in tags_str.split() if tag.strip().startswith('#')]
-                else:
-                    print("无法找到标签")
-                    return None
+                    print("API调用完成")
                     
-                # 构造返回数据
-                copy_data = {
-                    'title': title,
-                    'content': content,
-                    'tags': tags
-                }
-                
-                print("内容解析成功")
-                return copy_data
-                
-            except Exception as e:
-                print(f"内容解析错误: {e}")
-                return None
+                    # 获取响应内容
+                    sections = self._parse_sections(response)
+            # 只有部分字段有效时只补全缺少的字段
+            copy_data = self._repair(article_info, sections)
+            if cache is not None and copy_data:
+                cache.put(cache_key, get_llm_router().cache_model, copy_data)
+            return copy_data
             
         except Exception as e:
             print(f"生成小红书文案失败: {e}")
             import traceback
             traceback.print_exc()
-            return None
\ No newline at end of file
+            return None
+    
+    async def agenerate_xiaohongshu_copy(self, article_info: Dict,
+                                         on_section: Optional[Callable[[str, str], None]] = None) -> Dict:
+        """
+        异步调用AI模型生成小红书风格的文案，供多篇文章并发生成使用
+        超时和异常由调用方按文章分别处理
+        :param article_info: 文章信息
+        :param on_section: 流式生成（COPY_STREAMING）时每个段落完成的回调
+        :return: 生成的文案（COPY_VARIANTS 大于1时为评分最高的变体）
+        """
+        if COPY_VARIANTS > 1:
+            return self._pick_best(await self.agenerate_xiaohongshu_variants(article_info))
+        structured = self.structured_output
+        messages = self.build_messages(article_info, structured)
+        cache, cache_key, cached = self._lookup_cache(messages)
+        if cached is not None:
+            return cached
+        report_prompt_tokens(article_info, messages)
+        
+        sections = await self._astructured_copy(messages) if structured else None
+        if sections is None:
+            if structured:
+                messages = self.build_messages(article_info)
+            if COPY_STREAMING:
+                sections = await self._astream_copy(messages, on_section)
+            else:
+                response = await get_llm_router().ainvoke_messages(messages)
+                
+                print(f"API调用完成: {article_info.get('title', '')}")
+                
+                sections = self._parse_sections(response)
+        copy_data = await self._arepair(article_info, sections)
+        if cache is not None and copy_data:
+            cache.put(cache_key, get_llm_router().cache_model, copy_data)
+        return copy_data
@@ -1,12 +1,23 @@
 from langchain.agents import AgentExecutor, create_tool_calling_agent
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
+import asyncio
 import os
 import re
 import json
+import time
 from datetime import datetime
-from config import DASHSCOPE_API_KEY, AI_MODEL_NAME, OUTPUT_DIR, TOP_ARTICLES_COUNT
+from config import (
+    OUTPUT_DIR, TOP_ARTICLES_COUNT, PROCESSED_INDEX_ENABLED, NEAR_DUP_ENABLED, NEAR_DUP_EXTRA_ARTICLES,
+    COPY_GENERATION_ASYNC, COPY_GENERATION_CONCURRENCY, COPY_GENERATION_TIMEOUT, LLM_CACHE_ENABLED
+)
+from article_index import ProcessedArticleIndex
+from copy_batch import CopyBatchRunner, load_articles
+from llm_cache import get_llm_cache
+from llm_client import aclose_llm_async_client, get_chat_model
+from llm_router import get_llm_router
+from llm_scheduler import get_llm_scheduler
+from near_dup import content_text, drop_near_duplicates, get_near_dup_index
 from agents.article_agent import ArticleAgent, fetch_articles_from_rss, get_popular_articles
 from agents.copy_agent import CopyAgent
 
@@ -27,14 +38,8 @@ except ImportError:
 
 class MainAgent:
     def __init__(self):
-        # Initialize the LLM
-        self.llm = ChatOpenAI(
-            base_url="https://apis.iflow.cn/v1",
-            api_key=DASHSCOPE_API_KEY,
-            model=AI_MODEL_NAME,
-            temperature=0.7,
-            max_tokens=1500
-        )
+        # Initialize the LLM（进程内共享客户端，复用连接池）
+        self.llm = get_chat_model()
         
         # Initialize sub-agents
         self.article_agent = ArticleAgent()
@@ -44,6 +49,11 @@ class MainAgent:
         if not os.path.exists(OUTPUT_DIR):
             os.makedirs(OUTPUT_DIR)
         
+        # 已处理文章索引，用于跳过之前已生成过文案的文章
+        self.processed_index = ProcessedArticleIndex() if PROCESSED_INDEX_ENABLED else None
+        # 近似重复索引，用于跳过与之前已生成过文案的文章内容相近的转载
+        self.near_dup_index = get_near_dup_index() if NEAR_DUP_ENABLED else None
+        
         # 如果MCP可用，自动注册工具
         if MCP_AVAILABLE:
             # 这里可以添加自动注册的工具
@@ -57,91 +67,247 @@ class MainAgent:
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         print(f"[{current_time}] 开始执行任务...")
+        # 每次任务重新计算大模型请求的重试预算
+        get_llm_scheduler().start_run()
+        
+        popular_articles = self._select_articles()
+        if not popular_articles:
+            return
+        
+        # 3. 生成小红书文案
+        jobs = [(i, article) for i, article in enumerate(popular_articles) if self._prepare_article(i, article)]
+        if COPY_GENERATION_ASYNC and len(jobs) > 1:
+            # 并发调用大模型，整体耗时接近最慢的一次调用，而不是所有调用之和
+            asyncio.run(self._generate_copies_async(jobs, timestamp, current_time))
+        else:
+            for i, article in jobs:
+                xiaohongshu_copy = self.copy_agent.generate_xiaohongshu_copy(article)
+                self._save_copy(i, article, xiaohongshu_copy, timestamp, current_time)
+        
+        if LLM_CACHE_ENABLED:
+            print(get_llm_cache().stats())
+        print(get_llm_scheduler().stats())
+        print(get_llm_router().stats())
+        print(f"[{current_time}] 任务执行完成")
+    
+    def process_articles_batch(self, articles_path: Optional[str] = None) -> None:
+        """
+        通过Batch接口离线生成文案，适合大批量回填；上次运行未完成时先继续上次的批处理
+        :param articles_path: 需要回填的文章文件（JSON或JSONL），为None时与定时任务一样从RSS获取文章
+        """
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        print(f"[{current_time}] 开始执行批处理任务...")
+        get_llm_scheduler().start_run()
+        
+        runner = CopyBatchRunner(self.copy_agent, self._save_copy)
+        jobs = []
+        if not runner.pending:
+            if articles_path:
+                # 显式指定的文章（例如回填）不按已处理索引跳过
+                jobs = list(enumerate(load_articles(articles_path)))
+                print(f"从 {articles_path} 读取到 {len(jobs)} 篇文章")
+            else:
+                popular_articles = self._select_articles()
+                jobs = [(i, article) for i, article in enumerate(popular_articles) if self._prepare_article(i, article)]
+            if not jobs:
+                print("没有需要批量生成文案的文章")
+                return
         
+        runner.run(jobs, timestamp, current_time)
+        
+        if LLM_CACHE_ENABLED:
+            print(get_llm_cache().stats())
+        print(get_llm_scheduler().stats())
+        print(f"[{current_time}] 批处理任务结束")
+    
+    def _select_articles(self) -> List[Dict]:
+        """
+        获取文章列表，跳过已处理的文章并筛选热门文章
+        :return: 需要生成文案的文章，没有时为空列表
+        """
         # 1. 获取文章列表
         print("正在获取文章列表...")
         articles = fetch_articles_from_rss.invoke({})
         if not articles:
             print("未获取到文章列表")
-            return
+            return []
         
         print(f"获取到 {len(articles)} 篇文章")
         
-        # 2. 筛选热门文章
+        # 跳过之前已生成过文案的文章，避免重复抓取和调用大模型
+        if self.processed_index:
+            total = len(articles)
+            articles = self.processed_index.filter_unprocessed(articles)
+            print(f"跳过 {total - len(articles)} 篇已处理的文章，剩余 {len(articles)} 篇")
+            if not articles:
+                print("没有新的文章需要处理")
+                return []
+        
+        # 2. 筛选热门文章（按正文去重时多抓取几篇，被跳过的文章由后面的文章补足）
         print("正在筛选热门文章...")
-        popular_articles = get_popular_articles.invoke({"articles": articles, "count": TOP_ARTICLES_COUNT})
+        count = TOP_ARTICLES_COUNT + (max(0, NEAR_DUP_EXTRA_ARTICLES) if self.near_dup_index else 0)
+        popular_articles = get_popular_articles.invoke({"articles": articles, "count": count})
         if not popular_articles:
             print("未筛选到热门文章")
-            return
+            return []
         
         print(f"筛选出 {len(popular_articles)} 篇热门文章")
         
-        # 3. 生成小红书文案
-        for i, article in enumerate(popular_articles):
-            print(f"正在生成第 {i+1} 篇文章的小红书文案: {article.get('title', '')}")
-            
-            # 如果MCP可用，使用MCP工具格式化文章信息
-            if MCP_AVAILABLE:
+        # 按正文再做一次近似重复检测，每簇只保留热度最高的一篇交给大模型
+        if self.near_dup_index:
+            popular_articles = drop_near_duplicates(popular_articles, 'content', content_text, self.near_dup_index)
+        return popular_articles[:TOP_ARTICLES_COUNT]
+    
+    def _prepare_article(self, i: int, article: Dict) -> bool:
+        """
+        生成文案前的检查和格式化
+        :param i: 文章序号
+        :param article: 文章信息
+        :return: 是否需要生成文案
+        """
+        print(f"准备生成第 {i+1} 篇文章的小红书文案: {article.get('title', '')}")
+        
+        # 同一篇文章可能换了链接重新出现，按正文哈希再检查一次
+        if self.processed_index and self.processed_index.is_processed_content(article.get('content', '')):
+            print(f"文章内容已处理过，跳过: {article.get('title', '')}")
+            return False
+        
+        # 如果MCP可用，使用MCP工具格式化文章信息
+        if MCP_AVAILABLE:
+            try:
+                formatted_article = format_article_info_tool.invoke({
+                    "title": article.get('title', ''),
+                    "content": article.get('content', ''),
+                    "tags": article.get('tags', [])
+                })
+                if formatted_article:
+                    article.update(formatted_article)
+            except Exception as e:
+                print(f"MCP格式化文章信息失败: {e}")
+        return True
+    
+    async def _generate_copies_async(self, jobs: List[Tuple[int, Dict]], timestamp: str, current_time: str) -> None:
+        """
+        限制并发数异步生成文案，每篇文章生成完成后立即保存，单篇失败或超时不影响其他文章
+        :param jobs: (文章序号, 文章信息) 列表
+        :param timestamp: 文件名中的时间戳
+        :param current_time: 任务开始时间
+        """
+        semaphore = asyncio.Semaphore(max(1, COPY_GENERATION_CONCURRENCY))
+        timeout = COPY_GENERATION_TIMEOUT if COPY_GENERATION_TIMEOUT > 0 else None
+        
+        async def generate(i: int, article: Dict):
+            async with semaphore:
+                start = time.perf_counter()
                 try:
-                    formatted_article = format_article_info_tool.invoke({
-                        "title": article.get('title', ''),
-                        "content": article.get('content', ''),
-                        "tags": article.get('tags', [])
-                    })
-                    if formatted_article:
-                        article.update(formatted_article)
+                    xiaohongshu_copy = await asyncio.wait_for(
+                        self.copy_agent.agenerate_xiaohongshu_copy(article), timeout
+                    )
+                except asyncio.TimeoutError:
+                    print(f"生成小红书文案超时（{COPY_GENERATION_TIMEOUT:g} 秒）: {article.get('title', '')}")
+                    xiaohongshu_copy = None
                 except Exception as e:
-                    print(f"MCP格式化文章信息失败: {e}")
+                    print(f"生成小红书文案失败 {article.get('title', '')}: {e}")
+                    xiaohongshu_copy = None
+                print(f"第 {i+1} 篇文章生成耗时 {time.perf_counter() - start:.1f} 秒")
+            return i, article, xiaohongshu_copy
+        
+        start = time.perf_counter()
+        tasks = [asyncio.ensure_future(generate(i, article)) for i, article in jobs]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                i, article, xiaohongshu_copy = await finished
+                # 保存（可能经过MCP）放到线程中执行，不阻塞其他文章的生成
+                try:
+                    await asyncio.to_thread(self._save_copy, i, article, xiaohongshu_copy, timestamp, current_time)
+                except Exception as e:
+                    print(f"保存文案失败 {article.get('title', '')}: {e}")
+        finally:
+            # 异步连接池绑定在本次事件循环上，循环结束前关闭
+            await aclose_llm_async_client()
+        print(f"{len(jobs)} 篇文章并发生成完成（并发数 {COPY_GENERATION_CONCURRENCY}），总耗时 {time.perf_counter() - start:.1f} 秒")
+    
+    def _save_copy(self, i: int, article: Dict, xiaohongshu_copy: Optional[Dict], timestamp: str, current_time: str) -> None:
+        """
+        保存生成的文案并记录文章已处理
+        :param i: 文章序号
+        :param article: 文章信息
+        :param xiaohongshu_copy: 生成的文案，为None时表示生成失败
+        :param timestamp: 文件名中的时间戳
+        :param current_time: 任务开始时间
+        """
+        if not xiaohongshu_copy:
+            print(f"生成小红书文案失败: {article.get('title', '')}")
+            return
+        
+        print(f"生成小红书文案成功: {xiaohongshu_copy.get('title', '')}")
+        
+        # 如果MCP可用，使用MCP工具保存文案
+        if MCP_AVAILABLE:
+            try:
+                save_result = save_xiaohongshu_copy_tool.invoke({
+                    "title": xiaohongshu_copy.get('title', ''),
+                    "content": xiaohongshu_copy.get('content', ''),
+                    "original_title": article.get('title', ''),
+                    "tags": xiaohongshu_copy.get('tags', [])
+                })
+                print(f"保存结果: {save_result}")
+                self._mark_processed(article)
+                return  # 如果MCP保存成功，跳过默认保存逻辑
+            except Exception as e:
+                print(f"MCP保存文案失败: {e}")
+        
+        # 默认保存到文件，文件名包含时间戳
+        # 清理标题中的特殊字符
+        clean_title = re.sub(r'[^\w\s-]', '', article.get('title', 'unknown')[:10])
+        clean_title = re.sub(r'[-\s]+', '_', clean_title).strip('_')
+        
+        filename = f"{OUTPUT_DIR}/{timestamp}_{i+1}_{clean_title}.txt"
+        
+        with open(filename, "w", encoding="utf-8") as f:
+            # 写入时间信息
+            f.write(f"生成时间: {current_time}\n")
+            f.write("=" * 50 + "\n\n")
             
-            xiaohongshu_copy = self.copy_agent.generate_xiaohongshu_copy(article)
-            if xiaohongshu_copy:
-                print(f"生成小红书文案成功: {xiaohongshu_copy.get('title', '')}")
-                
-                # 如果MCP可用，使用MCP工具保存文案
-                if MCP_AVAILABLE:
-                    try:
-                        save_result = save_xiaohongshu_copy_tool.invoke({
-                            "title": xiaohongshu_copy.get('title', ''),
-                            "content": xiaohongshu_copy.get('content', ''),
-                            "original_title": article.get('title', ''),
-                            "tags": xiaohongshu_copy.get('tags', [])
-                        })
-                        print(f"保存结果: {save_result}")
-                        continue  # 如果MCP保存成功，跳过默认保存逻辑
-                    except Exception as e:
-                        print(f"MCP保存文案失败: {e}")
-                
-                # 默认保存到文件，文件名包含时间戳
-                # 清理标题中的特殊字符
-                clean_title = re.sub(r'[^\w\s-]', '', article.get('title', 'unknown')[:10])
-                clean_title = re.sub(r'[-\s]+', '_', clean_title).strip('_')
-                
-                filename = f"{OUTPUT_DIR}/{timestamp}_{i+1}_{clean_title}.txt"
-                
-                with open(filename, "w", encoding="utf-8") as f:
-                    # 写入时间信息
-                    f.write(f"生成时间: {current_time}\n")
-                    f.write("=" * 50 + "\n\n")
-                    
-                    # 写入原始文章信息
-                    f.write("原始文章信息:\n")
-                    f.write(f"标题: {article.get('title', '')}\n")
-                    f.write(f"链接: {article.get('link', '')}\n")
-                    f.write(f"发布时间: {article.get('published', '')}\n")
-                    f.write(f"摘要: {article.get('summary', '')}\n")
-                    # 写入完整正文内容
-                    f.write(f"正文内容: {article.get('content', '')}\n")
-                    f.write("=" * 50 + "\n\n")
-                    
-                    # 写入生成的小红书文案
-                    f.write("生成的小红书文案:\n")
-                    f.write(f"标题: {xiaohongshu_copy.get('title', '')}\n")
-                    f.write(f"内容: {xiaohongshu_copy.get('content', '')}\n")
-                    f.write(f"标签: {', '.join(xiaohongshu_copy.get('tags', []))}\n")
-            else:
-                print(f"生成小红书文案失败: {article.get('title', '')}")
+            # 写入原始文章信息
+            f.write("原始文章信息:\n")
+            f.write(f"标题: {article.get('title', '')}\n")
+            f.write(f"链接: {article.get('link', '')}\n")
+            f.write(f"发布时间: {article.get('published', '')}\n")
+            f.write(f"摘要: {article.get('summary', '')}\n")
+            # 写入完整正文内容
+            f.write(f"正文内容: {article.get('content', '')}\n")
+            f.write("=" * 50 + "\n\n")
+            
+            # 写入生成的小红书文案
+            f.write("生成的小红书文案:\n")
+            f.write(f"标题: {xiaohongshu_copy.get('title', '')}\n")
+            f.write(f"内容: {xiaohongshu_copy.get('content', '')}\n")
+            f.write(f"标签: {', '.join(xiaohongshu_copy.get('tags', []))}\n")
+            
+            # 多变体生成时附上其余候选及评分，便于人工挑选
+            alternatives = xiaohongshu_copy.get('alternatives', [])
+            if alternatives:
+                f.write(f"评分: {xiaohongshu_copy.get('score')}\n")
+                for j, alternative in enumerate(alternatives, 1):
+                    f.write("\n" + "-" * 50 + "\n")
+                    f.write(f"候选文案 {j}（评分: {alternative.get('score')}）:\n")
+                    f.write(f"标题: {alternative.get('title', '')}\n")
+                    f.write(f"内容: {alternative.get('content', '')}\n")
+                    f.write(f"标签: {', '.join(alternative.get('tags', []))}\n")
         
-        print(f"[{current_time}] 任务执行完成")
+        self._mark_processed(article)
+    
+    def _mark_processed(self, article: Dict) -> None:
+        """
+        记录文章已生成文案（链接、正文哈希和近似重复签名）
+        :param article: 文章信息
+        """
+        if self.processed_index:
+            self.processed_index.mark_processed(article)
+        if self.near_dup_index:
+            self.near_dup_index.add_article(article)
     
     def run_once(self) -> None:
         """
@@ -151,5 +317,16 @@ class MainAgent:
         self.process_articles()
         
         # 如果MCP可用，停止所有服务器
+        if MCP_AVAILABLE:
+            mcp_server_manager.stop_all_servers()
+    
+    def run_batch(self, articles_path: Optional[str] = None) -> None:
+        """
+        执行一次批处理任务
+        :param articles_path: 需要回填的文章文件，为None时从RSS获取文章
+        """
+        print("执行批处理任务...")
+        self.process_articles_batch(articles_path)
+        
         if MCP_AVAILABLE:
             mcp_server_manager.stop_all_servers()
\ No newline at end of file
@@ -0,0 +1,96 @@
+"""
+已处理文章索引
+记录已经生成过文案的文章（按规范化链接和正文哈希），
+每日任务据此在抓取和调用大模型之前跳过旧文章
+"""
+import hashlib
+import re
+import time
+from typing import Dict, List
+from config import PROCESSED_INDEX_PATH
+from sqlite_store import SQLiteStore
+from url_utils import canonicalize_url
+
+# SQLite单条语句的参数个数有上限，批量查询时分块
+_QUERY_CHUNK_SIZE = 500
+
+
+def content_hash(content: str) -> str:
+    """
+    计算正文哈希，忽略空白差异
+    :param content: 文章正文
+    :return: 十六进制哈希值
+    """
+    normalized = re.sub(r'\s+', ' ', content or '').strip()
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+
+class ProcessedArticleIndex(SQLiteStore):
+    """基于SQLite的已处理文章索引，链接为主键、正文哈希建索引，查询不随条目增长而变慢"""
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS processed_articles (
+            link TEXT PRIMARY KEY,
+            content_hash TEXT,
+            title TEXT,
+            processed_at REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_processed_articles_hash ON processed_articles (content_hash)",
+    )
+
+    def __init__(self, path: str = PROCESSED_INDEX_PATH):
+        super().__init__(path)
+
+    def filter_unprocessed(self, articles: List[Dict]) -> List[Dict]:
+        """
+        过滤掉链接已处理过的文章
+        :param articles: 文章列表
+        :return: 未处理过的文章列表（保持原顺序）
+        """
+        links = [canonicalize_url(article.get('link', '')) for article in articles]
+        processed = set()
+        with self._lock:
+            conn = self._connect()
+            unique_links = list({link for link in links if link})
+            for i in range(0, len(unique_links), _QUERY_CHUNK_SIZE):
+                chunk = unique_links[i:i + _QUERY_CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT link FROM processed_articles WHERE link IN ({placeholders})", chunk
+                ).fetchall()
+                processed.update(row[0] for row in rows)
+        return [article for article, link in zip(articles, links) if link not in processed]
+
+    def is_processed_content(self, content: str) -> bool:
+        """
+        检查正文是否已处理过（同一篇文章换了链接的情况）
+        :param content: 文章正文
+        :return: 是否已处理
+        """
+        if not content:
+            return False
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT 1 FROM processed_articles WHERE content_hash = ? LIMIT 1", (content_hash(content),)
+            ).fetchone()
+        return row is not None
+
+    def mark_processed(self, article: Dict):
+        """
+        记录文章已生成文案
+        :param article: 文章信息
+        """
+        content = article.get('content', '')
+        digest = content_hash(content) if content else None
+        # 没有链接的文章以正文哈希作为键
+        link = canonicalize_url(article.get('link', '')) or f"content:{digest}"
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO processed_articles (link, content_hash, title, processed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (link, digest, article.get('title', ''), time.time())
+            )
+            conn.commit()
@@ -0,0 +1,281 @@
+"""
+Playwright浏览器池
+长期持有浏览器进程，复用上下文和页面，避免每篇文章都重新启动Chromium
+"""
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Optional
+from urllib.parse import urlparse
+from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+from config import (
+    PLAYWRIGHT_POOL_SIZE, PLAYWRIGHT_MAX_NAVIGATIONS, PLAYWRIGHT_HEADLESS, PLAYWRIGHT_FETCH_MODE,
+    PLAYWRIGHT_DEADLINE_MS, PLAYWRIGHT_BLOCKED_RESOURCE_TYPES, PLAYWRIGHT_BLOCKED_HOSTS
+)
+
+USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36'
+
+# 关闭工作线程的哨兵
+_STOP = object()
+
+
+def _block_resources(route):
+    """拦截图片、字体、样式表以及统计广告等请求，只放行文档和渲染正文所需的请求"""
+    request = route.request
+    host = urlparse(request.url).hostname or ''
+    if request.resource_type in PLAYWRIGHT_BLOCKED_RESOURCE_TYPES or \
+            any(host == blocked or host.endswith('.' + blocked) for blocked in PLAYWRIGHT_BLOCKED_HOSTS):
+        route.abort()
+    else:
+        route.continue_()
+
+
+def load_article_page(page, url: str, content_selector: str, mode: str = PLAYWRIGHT_FETCH_MODE):
+    """
+    打开文章页面并等待正文加载
+    fast模式只等到DOM就绪且正文容器出现，整体不超过 PLAYWRIGHT_DEADLINE_MS；
+    full模式保持原先的 networkidle + 固定等待5秒
+    :param page: Playwright页面
+    :param url: 文章链接
+    :param content_selector: 正文容器选择器
+    :param mode: fast 或 full
+    :return: 页面导航的响应
+    """
+    if mode != 'fast':
+        response = page.goto(url, wait_until='networkidle')
+        if response and response.status == 200:
+            # 等待页面加载完成
+            page.wait_for_timeout(5000)
+        return response
+
+    deadline = time.monotonic() + PLAYWRIGHT_DEADLINE_MS / 1000
+    response = page.goto(url, wait_until='domcontentloaded', timeout=PLAYWRIGHT_DEADLINE_MS)
+    if response and response.status == 200:
+        remaining_ms = (deadline - time.monotonic()) * 1000
+        # Playwright中 timeout=0 表示不限时，截止时间已到时不再等待
+        if remaining_ms < 1:
+            print("已到达页面截止时间，直接提取当前页面内容")
+            return response
+        try:
+            page.wait_for_selector(content_selector, state='attached', timeout=remaining_ms)
+        except PlaywrightTimeoutError:
+            print("等待正文容器超时，直接提取当前页面内容")
+    return response
+
+
+class _BrowserSlot:
+    """单个工作线程持有的浏览器、上下文和页面"""
+
+    def __init__(self, playwright, max_navigations: int, headless: bool, block_resources: bool):
+        self.playwright = playwright
+        self.max_navigations = max_navigations
+        self.headless = headless
+        self.block_resources = block_resources
+        self.browser = None
+        self.context = None
+        self.page = None
+        self.navigations = 0
+
+    def checkout(self):
+        """取出一个可用页面，必要时重新启动浏览器或重建上下文"""
+        if self.browser is None or not self.browser.is_connected():
+            self.close_browser()
+            print("启动Playwright浏览器")
+            self.browser = self.playwright.chromium.launch(headless=self.headless)
+        if self.context is None:
+            self.context = self.browser.new_context(
+                viewport={"width": 1280, "height": 800},
+                user_agent=USER_AGENT
+            )
+            if self.block_resources:
+                self.context.route("**/*", _block_resources)
+            self.navigations = 0
+        if self.page is None or self.page.is_closed():
+            self.page = self.context.new_page()
+        self.navigations += 1
+        return self.page
+
+    def release(self, failed: bool = False):
+        """归还页面；导航次数达到上限或出错时回收"""
+        if failed:
+            # 页面或浏览器崩溃后，整体重建最稳妥
+            if self.browser is None or not self.browser.is_connected():
+                self.close_browser()
+            else:
+                self.close_context()
+        elif self.navigations >= self.max_navigations:
+            print(f"浏览器上下文已导航 {self.navigations} 次，回收重建")
+            self.close_context()
+
+    def close_context(self):
+        try:
+            if self.context is not None:
+                self.context.close()
+        except Exception as e:
+            print(f"关闭浏览器上下文失败: {e}")
+        self.context = None
+        self.page = None
+        self.navigations = 0
+
+    def close_browser(self):
+        self.close_context()
+        try:
+            if self.browser is not None:
+                self.browser.close()
+        except Exception as e:
+            print(f"关闭浏览器失败: {e}")
+        self.browser = None
+
+
+class BrowserPool:
+    """
+    Playwright浏览器池
+    Playwright的同步API只能在创建它的线程中使用，因此每个工作线程各自持有一个浏览器，
+    调用方通过 run() 把任务交给空闲的工作线程执行，工作线程数即并发页面上限
+    """
+
+    def __init__(self, size: int = PLAYWRIGHT_POOL_SIZE,
+                 max_navigations: int = PLAYWRIGHT_MAX_NAVIGATIONS,
+                 headless: bool = PLAYWRIGHT_HEADLESS,
+                 block_resources: bool = PLAYWRIGHT_FETCH_MODE == 'fast'):
+        self.size = max(1, size)
+        self.max_navigations = max(1, max_navigations)
+        self.headless = headless
+        self.block_resources = block_resources
+        self._jobs: queue.Queue = queue.Queue()
+        self._workers = []
+        self._started = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _ensure_workers(self):
+        """补足工作线程（调用方持有 self._lock）"""
+        if self._closed:
+            raise RuntimeError("浏览器池已关闭")
+        # 启动失败而退出的工作线程不再计入，重新启动补足
+        self._workers = [worker for worker in self._workers if worker.is_alive()]
+        while len(self._workers) < self.size:
+            self._started += 1
+            worker = threading.Thread(
+                target=self._worker_loop,
+                name=f"browser-pool-{self._started}",
+                daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def _fail_pending(self, error: Exception):
+        """工作线程无法启动时，让排队中的任务立即失败，而不是一直等待"""
+        stops = 0
+        while True:
+            try:
+                job = self._jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is _STOP:
+                stops += 1
+                continue
+            _, future = job
+            if future.set_running_or_notify_cancel():
+                future.set_exception(error)
+        # 关闭信号留给其他工作线程
+        for _ in range(stops):
+            self._jobs.put(_STOP)
+
+    def _worker_loop(self):
+        try:
+            playwright = sync_playwright().start()
+        except Exception as e:
+            print(f"启动Playwright失败: {e}")
+            with self._lock:
+                if threading.current_thread() in self._workers:
+                    self._workers.remove(threading.current_thread())
+                # 最后一个工作线程也无法启动时，排队中的任务不会再有人执行；
+                # 与 run() 的入队在同一把锁下进行，之后入队的任务会重新启动工作线程
+                if not self._workers:
+                    self._fail_pending(e)
+            return
+        slot = _BrowserSlot(playwright, self.max_navigations, self.headless, self.block_resources)
+        try:
+            while True:
+                job = self._jobs.get()
+                if job is _STOP:
+                    break
+                func, future = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    page = slot.checkout()
+                except Exception as e:
+                    slot.close_browser()
+                    future.set_exception(e)
+                    continue
+                try:
+                    result = func(page)
+                except Exception as e:
+                    slot.release(failed=True)
+                    future.set_exception(e)
+                else:
+                    slot.release()
+                    future.set_result(result)
+        finally:
+            slot.close_browser()
+            try:
+                playwright.stop()
+            except Exception as e:
+                print(f"停止Playwright失败: {e}")
+
+    def run(self, func: Callable[[Any], Any], timeout: Optional[float] = None) -> Any:
+        """
+        从池中取出一个页面执行func(page)，返回其结果
+        :param func: 接收Playwright页面的函数
+        :param timeout: 等待结果的超时时间（秒）
+        :return: func的返回值
+        """
+        future: Future = Future()
+        with self._lock:
+            self._ensure_workers()
+            self._jobs.put((func, future))
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            # 仍在排队时取消，避免之后再占用页面
+            future.cancel()
+            raise
+
+    def close(self):
+        """关闭所有工作线程及其浏览器"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            workers = list(self._workers)
+        for _ in workers:
+            self._jobs.put(_STOP)
+        for worker in workers:
+            worker.join(timeout=10)
+
+
+_browser_pool: Optional[BrowserPool] = None
+_browser_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """获取进程内共享的浏览器池"""
+    global _browser_pool
+    with _browser_pool_lock:
+        if _browser_pool is None:
+            _browser_pool = BrowserPool()
+            atexit.register(_browser_pool.close)
+        return _browser_pool
+
+
+def close_browser_pool():
+    """关闭共享的浏览器池"""
+    global _browser_pool
+    with _browser_pool_lock:
+        pool, _browser_pool = _browser_pool, None
+    if pool is not None:
+        pool.close()
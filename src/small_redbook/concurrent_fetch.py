@@ -0,0 +1,134 @@
+"""
+并发获取候选文章内容
+按站点限制并发数和请求频率，凑够所需文章后立即停止剩余的抓取
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlparse
+from config import FETCH_MAX_WORKERS, FETCH_PER_HOST_CONCURRENCY, FETCH_PER_HOST_RPS
+
+
+class HostRateLimiter:
+    """按站点限制并发请求数和每秒请求数"""
+
+    def __init__(self, per_host_concurrency: int = FETCH_PER_HOST_CONCURRENCY,
+                 per_host_rps: float = FETCH_PER_HOST_RPS):
+        self.per_host_concurrency = max(1, per_host_concurrency)
+        self.per_host_rps = per_host_rps
+        self._lock = threading.Lock()
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._next_slot: Dict[str, float] = {}
+
+    def _semaphore(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.per_host_concurrency)
+            return self._semaphores[host]
+
+    def _wait_turn(self, host: str):
+        """为请求预约一个发送时间点，保证同一站点的请求间隔不小于 1/rps"""
+        if self.per_host_rps <= 0:
+            return
+        interval = 1.0 / self.per_host_rps
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, 0.0))
+            self._next_slot[host] = slot + interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+    @contextmanager
+    def limit(self, url: str):
+        """在限流范围内执行对url的请求"""
+        host = urlparse(url).netloc.lower()
+        with self._semaphore(host):
+            self._wait_turn(host)
+            yield
+
+
+# 进程内共享的限流器，保证多次调用之间同样遵守站点限速
+host_rate_limiter = HostRateLimiter()
+
+
+def fetch_candidates(candidates: List[Dict], fetch_func: Callable[[str], Dict], count: int,
+                     is_valid: Callable[[Dict], bool],
+                     max_workers: int = FETCH_MAX_WORKERS,
+                     limiter: Optional[HostRateLimiter] = None,
+                     cache=None) -> List[Dict]:
+    """
+    并发获取候选文章的详细内容
+    :param candidates: 按热度排序的候选文章
+    :param fetch_func: 根据链接获取文章内容的函数
+    :param count: 需要的有效文章数量
+    :param is_valid: 判断文章内容是否有效的函数
+    :param max_workers: 最大并发抓取数
+    :param limiter: 站点限流器，默认使用共享限流器
+    :param cache: 文章内容缓存（提供get/put），命中时不再发起网络请求
+    :return: 有效文章列表（按候选顺序，即热度顺序）
+    """
+    limiter = limiter or host_rate_limiter
+    stop = threading.Event()
+
+    def fetch(article: Dict) -> Optional[Dict]:
+        # 已凑够文章时，尚未开始的抓取直接放弃
+        if stop.is_set():
+            return None
+        if cache is not None:
+            cached = cache.get(article['link'])
+            if cached is not None:
+                print(f"命中内容缓存: {article.get('title', '')}")
+                return cached
+        with limiter.limit(article['link']):
+            if stop.is_set():
+                return None
+            print(f"\n正在处理文章: {article.get('title', '')}")
+            content_info = fetch_func(article['link'])
+        if cache is not None:
+            try:
+                cache.put(article['link'], content_info)
+            except Exception as e:
+                print(f"写入内容缓存失败: {e}")
+        return content_info
+
+    accepted: Dict[int, Dict] = {}
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    try:
+        futures = {}
+        for rank, article in enumerate(candidates):
+            # 检查文章是否有链接
+            if 'link' not in article:
+                print(f"文章缺少链接，跳过: {article.get('title', '')}")
+                continue
+            futures[executor.submit(fetch, article)] = rank
+
+        for future in as_completed(futures):
+            rank = futures[future]
+            article = candidates[rank]
+            try:
+                content_info = future.result()
+            except Exception as e:
+                print(f"获取文章内容失败 {article.get('link', '')}: {e}")
+                continue
+            if content_info is None:
+                continue
+
+            article.update(content_info)
+            # 只有成功获取到内容的文章才加入热门列表
+            if is_valid(article):
+                print(f"成功获取到内容，长度: {len(article['content'])}，文章: {article.get('title', '')}")
+                accepted[rank] = article
+            else:
+                print(f"未获取到有效内容: {article.get('title', '')}")
+
+            # 如果已经获取到足够的文章，就停止
+            if len(accepted) >= count:
+                break
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return [accepted[rank] for rank in sorted(accepted)][:count]
@@ -9,6 +9,16 @@ load_dotenv()
 # Jiqizhixin website configuration
 JIQIZHIXIN_RSS_URL = os.getenv("JIQIZHIXIN_RSS_URL", "https://www.jiqizhixin.com/rss.xml")
 
+# RSS feeds configuration
+# 逗号分隔的RSS源列表，默认只包含机器之心
+FEED_URLS = [
+    u.strip() for u in os.getenv("FEED_URLS", JIQIZHIXIN_RSS_URL).split(",") if u.strip()
+]
+# 单个RSS源的超时时间（秒），超时的源直接跳过
+FEED_TIMEOUT = float(os.getenv("FEED_TIMEOUT", "10"))
+# 同时获取的RSS源数量上限（不小于源数量时，慢源不会占用其他源的名额）
+FEED_MAX_WORKERS = int(os.getenv("FEED_MAX_WORKERS", "16"))
+
 # Popular articles configuration
 TOP_ARTICLES_COUNT = int(os.getenv("TOP_ARTICLES_COUNT", "5"))
 
@@ -19,5 +29,193 @@ SCHEDULE_TIME = os.getenv("SCHEDULE_TIME", "09:00")
 AI_MODEL_NAME = os.getenv("AI_MODEL_NAME", "kimi-k2")
 DASHSCOPE_API_KEY = os.getenv("DASHSCOPE_API_KEY", "")
 
+# Shared LLM client configuration
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://apis.iflow.cn/v1")
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.7"))
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "1500"))
+# 单次请求的超时时间和建立连接的超时时间（秒）
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+# 大模型连接池大小与空闲连接保持时间（秒）
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "10"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "5"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+
+# LLM request scheduler (rate limits, retries and backoff for every generation path)
+# 每分钟请求数和每分钟token数上限（按服务商的限额设置，0表示不限制）
+LLM_RPM = float(os.getenv("LLM_RPM", "0"))
+LLM_TPM = float(os.getenv("LLM_TPM", "0"))
+# 单个请求遇到429、临时性5xx或连接错误时的最大重试次数
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+# 单次任务所有请求的重试总次数上限
+LLM_RETRY_BUDGET = int(os.getenv("LLM_RETRY_BUDGET", "20"))
+# 指数退避的初始和最大等待时间（秒），实际等待在 0 到该值之间随机取
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30"))
+# 服务端返回的Retry-After最多等待多少秒
+LLM_RETRY_AFTER_MAX = float(os.getenv("LLM_RETRY_AFTER_MAX", "60"))
+
+# Model routing and hedged requests
+# 逗号分隔的模型路由，按优先顺序排列，每项为 模型名 或 模型名@接口地址（省略地址时使用 LLM_BASE_URL）；默认只有 AI_MODEL_NAME
+LLM_ROUTES = [
+    r.strip() for r in os.getenv("LLM_ROUTES", AI_MODEL_NAME).split(",") if r.strip()
+]
+# 延迟目标（秒）：主模型超过该时间未返回时向下一个模型发送对冲请求，先返回者胜出（0表示只在失败时切换）
+LLM_HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER", "30"))
+# 每条路由保留最近多少次调用的延迟用于计算分位数
+LLM_LATENCY_WINDOW = int(os.getenv("LLM_LATENCY_WINDOW", "500"))
+
+# Copy generation concurrency
+# 多篇文章并发调用大模型生成文案（false时逐篇生成）
+COPY_GENERATION_ASYNC = os.getenv("COPY_GENERATION_ASYNC", "true").lower() == "true"
+# 同时进行的生成请求数
+COPY_GENERATION_CONCURRENCY = int(os.getenv("COPY_GENERATION_CONCURRENCY", "3"))
+# 单篇文案生成的超时时间（秒，0表示不限制）
+COPY_GENERATION_TIMEOUT = float(os.getenv("COPY_GENERATION_TIMEOUT", "120"))
+
+# Streaming copy generation
+# 流式生成文案，边接收边解析，格式明显错误时提前中止
+COPY_STREAMING = os.getenv("COPY_STREAMING", "false").lower() == "true"
+# 各段落的最大长度，超过后视为格式错误
+COPY_MAX_TITLE_CHARS = int(os.getenv("COPY_MAX_TITLE_CHARS", "100"))
+COPY_MAX_CONTENT_CHARS = int(os.getenv("COPY_MAX_CONTENT_CHARS", "3000"))
+COPY_MAX_TAGS_CHARS = int(os.getenv("COPY_MAX_TAGS_CHARS", "300"))
+
+# Structured copy output and targeted repair
+# 输出格式：markers（段落标记）、json_schema（JSON Schema结构化输出）或 tool（工具调用），
+# 服务端不支持结构化输出时自动改用 markers
+COPY_OUTPUT_MODE = os.getenv("COPY_OUTPUT_MODE", "markers").lower()
+# 只有部分字段有效时，发起只补全缺少字段的简短请求，而不是丢弃整篇文案
+COPY_REPAIR_ENABLED = os.getenv("COPY_REPAIR_ENABLED", "true").lower() == "true"
+
+# Multi-variant copy generation
+# 每篇文章一次请求生成的文案变体数，按本地评分选出最佳的一篇（1表示只生成一篇）
+COPY_VARIANTS = int(os.getenv("COPY_VARIANTS", "1"))
+# 变体生成方式：auto（优先使用n参数，服务端不支持时改用多段提示词）、n 或 prompt
+COPY_VARIANT_MODE = os.getenv("COPY_VARIANT_MODE", "auto").lower()
+
+# Prompt token budget
+# 提示词中文章正文的token预算，超出时按信息量挑选句子（0表示不限制）
+PROMPT_CONTENT_TOKENS = int(os.getenv("PROMPT_CONTENT_TOKENS", "1500"))
+# 计算token数使用的tiktoken编码；heuristic 或tiktoken不可用时按字符类型估算
+PROMPT_TOKENIZER = os.getenv("PROMPT_TOKENIZER", "cl100k_base")
+
 # Output directory
-OUTPUT_DIR = os.getenv("OUTPUT_DIR", "output")
\ No newline at end of file
+OUTPUT_DIR = os.getenv("OUTPUT_DIR", "output")
+
+# Playwright browser pool configuration
+# 同时打开的页面上限（即浏览器工作线程数）
+PLAYWRIGHT_POOL_SIZE = int(os.getenv("PLAYWRIGHT_POOL_SIZE", "2"))
+# 每个浏览器上下文导航多少次后回收重建
+PLAYWRIGHT_MAX_NAVIGATIONS = int(os.getenv("PLAYWRIGHT_MAX_NAVIGATIONS", "50"))
+# 等待浏览器池执行单个抓取任务的最长时间（秒），包括排队时间
+PLAYWRIGHT_JOB_TIMEOUT = float(os.getenv("PLAYWRIGHT_JOB_TIMEOUT", "120"))
+PLAYWRIGHT_HEADLESS = os.getenv("PLAYWRIGHT_HEADLESS", "true").lower() == "true"
+# 页面加载模式：fast（拦截静态资源，等到正文容器出现即可）或 full（networkidle后再等待5秒）
+PLAYWRIGHT_FETCH_MODE = os.getenv("PLAYWRIGHT_FETCH_MODE", "fast")
+# fast模式下打开页面并等待正文的总时限（毫秒）
+PLAYWRIGHT_DEADLINE_MS = int(os.getenv("PLAYWRIGHT_DEADLINE_MS", "8000"))
+# fast模式下拦截的资源类型；如页面正文不依赖JS渲染，可追加 script,xhr,fetch
+PLAYWRIGHT_BLOCKED_RESOURCE_TYPES = [
+    t.strip() for t in os.getenv(
+        "PLAYWRIGHT_BLOCKED_RESOURCE_TYPES", "image,media,font,stylesheet,manifest,texttrack,other"
+    ).split(",") if t.strip()
+]
+# fast模式下拦截的统计、广告等第三方域名
+PLAYWRIGHT_BLOCKED_HOSTS = [
+    h.strip() for h in os.getenv(
+        "PLAYWRIGHT_BLOCKED_HOSTS",
+        "google-analytics.com,googletagmanager.com,doubleclick.net,hm.baidu.com,cnzz.com,growingio.com"
+    ).split(",") if h.strip()
+]
+
+# Article fetching concurrency configuration
+FETCH_MAX_WORKERS = int(os.getenv("FETCH_MAX_WORKERS", "4"))
+# 对同一站点的最大并发请求数
+FETCH_PER_HOST_CONCURRENCY = int(os.getenv("FETCH_PER_HOST_CONCURRENCY", "2"))
+# 对同一站点每秒最多发起的请求数（0表示不限速）
+FETCH_PER_HOST_RPS = float(os.getenv("FETCH_PER_HOST_RPS", "1.0"))
+
+# Shared HTTP client configuration
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+# 空闲连接保持时间（秒）
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+# 启用HTTP/2需要安装h2（pip install httpx[http2]）
+HTTP_ENABLE_HTTP2 = os.getenv("HTTP_ENABLE_HTTP2", "false").lower() == "true"
+
+# RSS feed snapshot cache (ETag/Last-Modified + parsed articles)
+FEED_CACHE_PATH = os.getenv("FEED_CACHE_PATH", os.path.join(OUTPUT_DIR, "feed_cache.json"))
+
+# Article content cache configuration
+CONTENT_CACHE_ENABLED = os.getenv("CONTENT_CACHE_ENABLED", "true").lower() == "true"
+CONTENT_CACHE_PATH = os.getenv("CONTENT_CACHE_PATH", os.path.join(OUTPUT_DIR, "content_cache.sqlite3"))
+# 成功提取的内容缓存时间（小时）
+CONTENT_CACHE_TTL_HOURS = float(os.getenv("CONTENT_CACHE_TTL_HOURS", "72"))
+# 提取失败的页面缓存时间（小时），在此期间不再重复抓取
+CONTENT_CACHE_NEGATIVE_TTL_HOURS = float(os.getenv("CONTENT_CACHE_NEGATIVE_TTL_HOURS", "2"))
+# 缓存内容总大小上限（MB），超出后淘汰最早写入的条目
+CONTENT_CACHE_MAX_MB = float(os.getenv("CONTENT_CACHE_MAX_MB", "50"))
+
+# Processed article index (skip articles already turned into copy)
+PROCESSED_INDEX_ENABLED = os.getenv("PROCESSED_INDEX_ENABLED", "true").lower() == "true"
+PROCESSED_INDEX_PATH = os.getenv("PROCESSED_INDEX_PATH", os.path.join(OUTPUT_DIR, "processed_articles.sqlite3"))
+
+# LLM response cache (opt-in)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "false").lower() == "true"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(OUTPUT_DIR, "llm_cache.sqlite3"))
+LLM_CACHE_TTL_HOURS = float(os.getenv("LLM_CACHE_TTL_HOURS", "168"))
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "20"))
+# 为true时不读取缓存，强制重新生成（也可使用 main.py --regenerate）
+LLM_CACHE_BYPASS = os.getenv("LLM_CACHE_BYPASS", "false").lower() == "true"
+
+# Offline batch generation (main.py --batch)
+# OpenAI兼容的Batch接口地址，默认与 LLM_BASE_URL 相同（本地测试时可指向 benchmarks/batch_stub_server.py）
+BATCH_BASE_URL = os.getenv("BATCH_BASE_URL", LLM_BASE_URL)
+# 批处理进度文件，中断后重新运行 --batch 从这里继续
+BATCH_STATE_PATH = os.getenv("BATCH_STATE_PATH", os.path.join(OUTPUT_DIR, "batch_state.json"))
+# 批处理的完成时限
+BATCH_COMPLETION_WINDOW = os.getenv("BATCH_COMPLETION_WINDOW", "24h")
+# 查询批处理状态的间隔（秒）
+BATCH_POLL_INTERVAL = float(os.getenv("BATCH_POLL_INTERVAL", "30"))
+# 本次运行最多等待的时间（秒），超时后保留进度文件并退出，0表示一直等到完成
+BATCH_MAX_WAIT = float(os.getenv("BATCH_MAX_WAIT", "0"))
+# 单个批处理文件的最大请求数，超出时拆分为多个批处理
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "50000"))
+
+# Near-duplicate detection (MinHash LSH over title+summary and content)
+NEAR_DUP_ENABLED = os.getenv("NEAR_DUP_ENABLED", "true").lower() == "true"
+NEAR_DUP_INDEX_PATH = os.getenv("NEAR_DUP_INDEX_PATH", os.path.join(OUTPUT_DIR, "near_dup_index.sqlite3"))
+# 两篇文章估计的Jaccard相似度不低于该值时视为近似重复
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.5"))
+# 按正文去重前额外多抓取的文章数，正文近似重复被跳过的文章由这些文章补足
+NEAR_DUP_EXTRA_ARTICLES = int(os.getenv("NEAR_DUP_EXTRA_ARTICLES", "2"))
+
+# Content extraction engine: cascade（选择器优先，文本密度兜底）或 density（仅文本密度）
+EXTRACTION_ENGINE = os.getenv("EXTRACTION_ENGINE", "cascade")
+
+# Per-host content selector cache
+SELECTOR_CACHE_ENABLED = os.getenv("SELECTOR_CACHE_ENABLED", "true").lower() == "true"
+SELECTOR_CACHE_PATH = os.getenv("SELECTOR_CACHE_PATH", os.path.join(OUTPUT_DIR, "selector_cache.sqlite3"))
+# 记住的选择器每使用多少次后重新运行完整选择器级联复核（0表示不复核）
+SELECTOR_REVALIDATE_EVERY = int(os.getenv("SELECTOR_REVALIDATE_EVERY", "20"))
+
+# HTML parser backend: auto / selectolax / lxml / html.parser
+HTML_PARSER_BACKEND = os.getenv("HTML_PARSER_BACKEND", "auto")
+
+# Article page download mode: stream（流式读取，正文读完即停止）或 full（完整下载）
+ARTICLE_FETCH_MODE = os.getenv("ARTICLE_FETCH_MODE", "stream")
+# 单个文章页面最多读取的字节数
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(2 * 1024 * 1024)))
+# 流式读取时正文读完后为查找标签最多再读取的字节数
+FETCH_TAG_SCAN_BYTES = int(os.getenv("FETCH_TAG_SCAN_BYTES", str(64 * 1024)))
+
+# 热度评分关键词，例如 "AI:1,大模型:1.5"（冒号后为权重，省略时为1）
+HOT_KEYWORDS = os.getenv(
+    "HOT_KEYWORDS",
+    "AI,人工智能,大模型,深度学习,机器学习,NLP,CV,GPT,BERT,算法,神经网络,芯片,数据集,发布,突破"
+)
+# 标题中出现任意一个即加分的词
+BOOST_KEYWORDS = os.getenv("BOOST_KEYWORDS", "最新,发布,重磅,突破,升级,开源")
@@ -0,0 +1,101 @@
+"""
+文章内容缓存
+以规范化URL为键，把提取出的 {'content', 'tags'} 持久化到SQLite，
+热门文章会在RSS中停留多天，命中缓存时无需再次下载和提取
+"""
+import json
+import sqlite3
+import time
+from typing import Dict, Optional
+from config import (
+    CONTENT_CACHE_PATH, CONTENT_CACHE_TTL_HOURS,
+    CONTENT_CACHE_NEGATIVE_TTL_HOURS, CONTENT_CACHE_MAX_MB
+)
+from sqlite_store import SQLiteStore, evict_oldest, shared_instance
+from url_utils import canonicalize_url
+
+
+class ContentCache(SQLiteStore):
+    """基于SQLite的文章内容缓存，支持过期时间、负缓存和按大小淘汰"""
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS article_content (
+            url TEXT PRIMARY KEY,
+            content TEXT NOT NULL,
+            tags TEXT NOT NULL,
+            ok INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            fetched_at REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_article_content_fetched_at ON article_content (fetched_at)",
+    )
+
+    def __init__(self, path: str = CONTENT_CACHE_PATH,
+                 ttl_hours: float = CONTENT_CACHE_TTL_HOURS,
+                 negative_ttl_hours: float = CONTENT_CACHE_NEGATIVE_TTL_HOURS,
+                 max_mb: float = CONTENT_CACHE_MAX_MB):
+        super().__init__(path)
+        self.ttl = ttl_hours * 3600
+        self.negative_ttl = negative_ttl_hours * 3600
+        self.max_bytes = int(max_mb * 1024 * 1024)
+
+    def get(self, url: str) -> Optional[Dict]:
+        """
+        查询缓存
+        :param url: 文章链接
+        :return: 缓存的文章内容；负缓存返回空内容；未命中或已过期返回None
+        """
+        key = canonicalize_url(url)
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT content, tags, ok, fetched_at FROM article_content WHERE url = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        content, tags, ok, fetched_at = row
+        ttl = self.ttl if ok else self.negative_ttl
+        if time.time() - fetched_at > ttl:
+            return None
+        return {'content': content, 'tags': json.loads(tags)}
+
+    def put(self, url: str, content_info: Optional[Dict]):
+        """
+        写入缓存，没有提取到内容的页面记为负缓存
+        :param url: 文章链接
+        :param content_info: 提取结果
+        """
+        content_info = content_info or {}
+        content = content_info.get('content') or ''
+        tags = content_info.get('tags') or []
+        tags_json = json.dumps(tags, ensure_ascii=False)
+        size = len(content.encode('utf-8')) + len(tags_json.encode('utf-8'))
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO article_content (url, content, tags, ok, size, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (canonicalize_url(url), content, tags_json, 1 if content else 0, size, time.time())
+            )
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection):
+        """删除过期条目，总大小超过上限时按写入时间淘汰最早的条目"""
+        now = time.time()
+        conn.execute(
+            "DELETE FROM article_content WHERE (ok = 1 AND fetched_at < ?) OR (ok = 0 AND fetched_at < ?)",
+            (now - self.ttl, now - self.negative_ttl)
+        )
+        evicted = evict_oldest(conn, 'article_content', 'url', 'fetched_at', self.max_bytes)
+        if evicted:
+            print(f"内容缓存超出大小上限，淘汰 {evicted} 条")
+
+
+_shared_content_cache = shared_instance(ContentCache)
+
+
+def get_content_cache() -> ContentCache:
+    """获取进程内共享的文章内容缓存"""
+    return _shared_content_cache()
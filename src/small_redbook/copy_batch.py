@@ -0,0 +1,292 @@
+"""
+离线批量生成文案
+大批量回填（例如为上个月的文章重新生成文案）时，不再逐篇调用交互接口：
+- 把每篇文章的CopyAgent请求写入JSONL批处理文件，上传后通过OpenAI兼容的Batch接口提交
+- 按间隔查询状态，完成后下载结果，经现有的段落解析器解析，缺少的字段再补全，然后逐篇保存
+批处理按离线价格计费，吞吐量来自批处理本身。上传、提交、查询和下载使用单独的客户端，不经过交互调用的限流和重试，
+不占用交互接口的RPM/TPM额度和重试预算；上传和提交不自动重试，避免重复上传或重复提交，只有查询和下载失败时重试。
+补全缺少字段的请求仍走交互接口。
+上传、提交、查询到的状态和已保存的文章都记录在进度文件中，中断后重新运行会从上次的位置继续，不会重复提交
+"""
+import io
+import json
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from openai import OpenAI
+from config import (
+    BATCH_BASE_URL, BATCH_STATE_PATH, BATCH_COMPLETION_WINDOW, BATCH_POLL_INTERVAL, BATCH_MAX_WAIT,
+    BATCH_MAX_REQUESTS, COPY_VARIANTS
+)
+from llm_client import get_batch_client
+
+BATCH_ENDPOINT = '/v1/chat/completions'
+# 批处理的终止状态
+FINAL_STATUS = {'completed', 'failed', 'expired', 'cancelled'}
+# 进度文件中保存的文章字段（保存文案时使用，续跑时无需重新抓取）
+ARTICLE_FIELDS = ('title', 'link', 'published', 'summary', 'content', 'tags')
+# 每保存多少篇文章更新一次进度文件
+_SAVE_EVERY = 20
+# 查询状态和下载结果（GET请求，重复执行没有副作用）失败时的重试次数
+_GET_RETRIES = 3
+
+
+def load_articles(path: str) -> List[Dict]:
+    """
+    读取需要回填的文章
+    :param path: JSON数组或每行一篇文章的JSONL文件，每篇至少包含 title 和 content
+    :return: 文章列表
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    if text.lstrip().startswith('['):
+        articles = json.loads(text)
+    else:
+        articles = [json.loads(line) for line in text.splitlines() if line.strip()]
+    valid = [article for article in articles if article.get('title') and article.get('content')]
+    if len(valid) < len(articles):
+        print(f"跳过 {len(articles) - len(valid)} 篇缺少标题或正文的文章")
+    return valid
+
+
+def batch_output_text(line: Dict) -> Tuple[Optional[str], Optional[str]]:
+    """
+    取出批处理结果中一行的模型输出
+    :param line: 结果文件或错误文件中的一行
+    :return: (模型返回的文本, 错误信息)，成功时错误信息为None
+    """
+    response = line.get('response') or {}
+    error = line.get('error')
+    if error:
+        return None, error.get('message') if isinstance(error, dict) else str(error)
+    body = response.get('body') or {}
+    if response.get('status_code') != 200:
+        message = (body.get('error') or {}).get('message') if isinstance(body, dict) else None
+        return None, f"HTTP {response.get('status_code')}: {message or body}"
+    try:
+        return body['choices'][0]['message']['content'] or '', None
+    except (KeyError, IndexError, TypeError):
+        return None, "结果中没有 choices"
+
+
+class CopyBatchRunner:
+    """提交、查询和接收文案批处理，进度保存在JSON文件中"""
+
+    def __init__(self, copy_agent, save_copy: Callable[[int, Dict, Optional[Dict], str, str], None],
+                 path: str = BATCH_STATE_PATH, client: Optional[OpenAI] = None,
+                 poll_interval: float = BATCH_POLL_INTERVAL, max_wait: float = BATCH_MAX_WAIT,
+                 max_requests: int = BATCH_MAX_REQUESTS, variants: int = COPY_VARIANTS):
+        """
+        :param copy_agent: CopyAgent，负责构造请求和解析结果
+        :param save_copy: 保存文案的回调 save_copy(文章序号, 文章信息, 文案, 时间戳, 任务开始时间)
+        :param path: 进度文件路径
+        :param client: OpenAI客户端，默认使用指向 BATCH_BASE_URL 的批处理客户端（不经过交互调用的调度器）
+        :param poll_interval: 查询状态的间隔（秒）
+        :param max_wait: 本次运行最多等待的时间（秒），0表示一直等到完成
+        :param max_requests: 单个批处理的最大请求数
+        :param variants: 文案变体数
+        """
+        self.copy_agent = copy_agent
+        self.save_copy = save_copy
+        self.path = path
+        self.client = client or get_batch_client(BATCH_BASE_URL)
+        self.poll_interval = poll_interval
+        self.max_wait = max_wait
+        self.max_requests = max(1, max_requests)
+        self.variants = variants
+        self.state: Optional[Dict] = self._load()
+
+    @property
+    def pending(self) -> bool:
+        """是否有未完成的批处理（上次运行被中断或等待超时）"""
+        return self.state is not None
+
+    def _load(self) -> Optional[Dict]:
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"读取批处理进度文件失败，将重新提交: {e}")
+            return None
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 先写临时文件再替换，避免中途退出导致进度文件损坏
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def _finish(self):
+        """全部结果已保存，删除进度文件"""
+        self.state = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _create_state(self, jobs: List[Tuple[int, Dict]], timestamp: str, current_time: str) -> int:
+        """
+        为新的文章构造批处理，命中缓存的文章直接保存
+        :return: 需要提交的文章数
+        """
+        articles, saved = {}, 0
+        for i, article in jobs:
+            cached = self.copy_agent.cached_copy(article, self.variants)
+            if cached:
+                self.save_copy(i, article, cached, timestamp, current_time)
+                saved += 1
+                continue
+            record = {field: article[field] for field in ARTICLE_FIELDS if field in article}
+            articles[f"article-{i}"] = dict(record, index=i)
+        if saved:
+            print(f"{saved} 篇文章命中大模型响应缓存，不再提交")
+        custom_ids = list(articles)
+        self.state = {
+            'timestamp': timestamp,
+            'current_time': current_time,
+            'variants': self.variants,
+            'articles': articles,
+            'batches': [{'custom_ids': custom_ids[start:start + self.max_requests]}
+                        for start in range(0, len(custom_ids), self.max_requests)],
+            'saved': [],
+        }
+        if custom_ids:
+            self._save()
+        return len(custom_ids)
+
+    def _submit(self, batch: Dict):
+        """上传批处理文件并提交（已完成的步骤不会重复执行）"""
+        if not batch.get('input_file_id'):
+            lines = []
+            for custom_id in batch['custom_ids']:
+                article = self.state['articles'][custom_id]
+                body = self.copy_agent.batch_request(article, self.state['variants'])
+                lines.append(json.dumps({'custom_id': custom_id, 'method': 'POST', 'url': BATCH_ENDPOINT,
+                                         'body': body}, ensure_ascii=False))
+            data = ('\n'.join(lines) + '\n').encode('utf-8')
+            uploaded = self.client.files.create(
+                file=(f"copy_batch_{self.state['timestamp']}.jsonl", io.BytesIO(data), 'application/jsonl'),
+                purpose='batch'
+            )
+            batch['input_file_id'] = uploaded.id
+            self._save()
+            print(f"已上传批处理文件 {uploaded.id}（{len(lines)} 个请求，{len(data) / 1024:.0f} KB）")
+        if not batch.get('batch_id'):
+            created = self.client.batches.create(
+                input_file_id=batch['input_file_id'], endpoint=BATCH_ENDPOINT,
+                completion_window=BATCH_COMPLETION_WINDOW
+            )
+            batch['batch_id'] = created.id
+            batch['status'] = created.status
+            self._save()
+            print(f"已提交批处理 {created.id}")
+
+    def _poll(self) -> bool:
+        """
+        查询未结束的批处理，直到全部结束或超过本次运行的等待时间
+        :return: 全部批处理是否都已结束
+        """
+        start = time.monotonic()
+        while True:
+            waiting = [batch for batch in self.state['batches'] if batch.get('status') not in FINAL_STATUS]
+            for batch in waiting:
+                info = self.client.with_options(max_retries=_GET_RETRIES).batches.retrieve(batch['batch_id'])
+                counts = info.request_counts
+                progress = f"{counts.completed + counts.failed}/{counts.total}" if counts else "-"
+                if info.status != batch.get('status'):
+                    print(f"批处理 {info.id}: {info.status}（已处理 {progress}）")
+                batch['status'] = info.status
+                batch['output_file_id'] = info.output_file_id
+                batch['error_file_id'] = info.error_file_id
+            self._save()
+            if all(batch.get('status') in FINAL_STATUS for batch in self.state['batches']):
+                return True
+            if self.max_wait > 0 and time.monotonic() - start + self.poll_interval > self.max_wait:
+                print(f"批处理尚未完成，已等待 {time.monotonic() - start:.0f} 秒，进度已保存，"
+                      f"稍后重新运行 --batch 继续")
+                return False
+            time.sleep(self.poll_interval)
+
+    def _read_file(self, file_id: Optional[str]) -> List[Dict]:
+        if not file_id:
+            return []
+        text = self.client.with_options(max_retries=_GET_RETRIES).files.content(file_id).text
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    def _ingest(self, batch: Dict) -> Tuple[int, int]:
+        """
+        下载批处理结果，逐篇解析并保存（已保存的文章在续跑时跳过）
+        :return: (保存成功的篇数, 失败的篇数)
+        """
+        saved_ids = set(self.state['saved'])
+        results = {line.get('custom_id'): line
+                   for line in self._read_file(batch.get('output_file_id')) + self._read_file(batch.get('error_file_id'))}
+        succeeded = failed = 0
+        try:
+            for custom_id in batch['custom_ids']:
+                if custom_id in saved_ids:
+                    continue
+                article = self.state['articles'][custom_id]
+                line = results.get(custom_id)
+                result, error = batch_output_text(line) if line else (None, f"批处理状态为 {batch.get('status')}，没有结果")
+                copy_data = None
+                if error:
+                    print(f"批处理请求失败 {article.get('title', '')}: {error}")
+                else:
+                    try:
+                        copy_data = self.copy_agent.copy_from_batch_result(article, result, self.state['variants'])
+                    except Exception as e:
+                        print(f"解析批处理结果失败 {article.get('title', '')}: {e}")
+                # 失败的文章不会标记为已处理，之后的任务会重新生成
+                self.save_copy(article['index'], article, copy_data, self.state['timestamp'],
+                               self.state['current_time'])
+                self.state['saved'].append(custom_id)
+                if copy_data:
+                    succeeded += 1
+                else:
+                    failed += 1
+                if len(self.state['saved']) % _SAVE_EVERY == 0:
+                    self._save()
+            batch['ingested'] = True
+        finally:
+            self._save()
+        return succeeded, failed
+
+    def run(self, jobs: List[Tuple[int, Dict]], timestamp: str, current_time: str) -> bool:
+        """
+        提交新的批处理，或继续上次未完成的批处理
+        :param jobs: (文章序号, 文章信息) 列表，有未完成的批处理时忽略
+        :param timestamp: 文件名中的时间戳
+        :param current_time: 任务开始时间
+        :return: 是否全部完成（等待超时时返回False，进度文件保留）
+        """
+        if self.state is not None:
+            done = len(self.state['saved'])
+            print(f"继续上次未完成的批处理（{self.state['current_time']} 开始，"
+                  f"共 {len(self.state['articles'])} 篇，已处理 {done} 篇）")
+            if jobs:
+                print(f"本次的 {len(jobs)} 篇文章留到下次运行 --batch 时提交")
+        elif not self._create_state(jobs, timestamp, current_time):
+            self._finish()
+            return True
+
+        for batch in self.state['batches']:
+            self._submit(batch)
+        if not self._poll():
+            return False
+
+        succeeded = failed = 0
+        for batch in self.state['batches']:
+            if batch.get('ingested'):
+                continue
+            if batch['status'] != 'completed':
+                print(f"批处理 {batch['batch_id']} 结束状态为 {batch['status']}，只保存已返回的结果")
+            batch_succeeded, batch_failed = self._ingest(batch)
+            succeeded += batch_succeeded
+            failed += batch_failed
+        print(f"批处理完成: 成功 {succeeded} 篇，失败 {failed} 篇")
+        self._finish()
+        return True
@@ -1,7 +1,94 @@
 import json
 import os
-from openai import OpenAI
-from config import DASHSCOPE_API_KEY, AI_MODEL_NAME
+import openai
+from config import (
+    LLM_TEMPERATURE, LLM_MAX_TOKENS, LLM_CACHE_ENABLED, COPY_OUTPUT_MODE, COPY_REPAIR_ENABLED
+)
+from copy_parser import (
+    COPY_JSON_SCHEMA, REPAIR_MAX_TOKENS, SECTION_NAMES, build_copy_messages, build_repair_messages, check_result,
+    finalize_copy, missing_fields, normalize_structured, parse_copy_sections
+)
+from llm_cache import get_llm_cache, llm_cache_key
+from llm_client import get_async_openai_client, get_openai_client
+from llm_router import get_llm_router
+from prompt_budget import report_prompt_tokens
+
+# 服务端不支持结构化输出时置为False，之后改用段落标记格式
+_structured_output = COPY_OUTPUT_MODE in ('json_schema', 'tool')
+
+
+def _create_completion(**kwargs):
+    """
+    经模型路由调用对话补全，主模型慢时对冲到备用模型，失败时改用备用模型
+    :param kwargs: 除 model 以外传给 chat.completions.create 的参数
+    :return: 响应
+    """
+    return get_llm_router().invoke(
+        lambda route: get_openai_client(route.base_url).chat.completions.create(model=route.model, **kwargs),
+        lambda route: get_async_openai_client(route.base_url).chat.completions.create(model=route.model, **kwargs)
+    )
+
+
+def _structured_request(mode):
+    """
+    结构化输出的请求参数
+    :param mode: json_schema 或 tool
+    :return: 传给 chat.completions.create 的参数
+    """
+    if mode == 'json_schema':
+        return {'response_format': {
+            'type': 'json_schema',
+            'json_schema': {'name': COPY_JSON_SCHEMA['title'], 'schema': COPY_JSON_SCHEMA}
+        }}
+    return {
+        'tools': [{'type': 'function', 'function': {
+            'name': COPY_JSON_SCHEMA['title'],
+            'description': COPY_JSON_SCHEMA['description'],
+            'parameters': COPY_JSON_SCHEMA
+        }}],
+        'tool_choice': {'type': 'function', 'function': {'name': COPY_JSON_SCHEMA['title']}}
+    }
+
+
+def _structured_fields(response):
+    """取出结构化输出中的有效字段（工具调用参数或JSON正文，不完整时尽量取出已生成的字段）"""
+    message = response.choices[0].message
+    if message.tool_calls:
+        fields = normalize_structured(message.tool_calls[0].function.arguments)
+    else:
+        fields = normalize_structured(message.content or '')
+    print(f"结构化输出: 有效字段 {', '.join(SECTION_NAMES[name] for name in fields) or '无'}")
+    return fields
+
+
+def repair_copy(article_info, sections):
+    """
+    补全缺少的字段，每个字段一次简短请求，而不是整篇重新生成
+    :param article_info: 文章信息
+    :param sections: 已生成的字段
+    :return: 完整的文案（字段齐全时直接返回），无法补全时返回None
+    """
+    missing = missing_fields(sections)
+    if missing:
+        names = ', '.join(SECTION_NAMES[name] for name in missing)
+        if not sections or not COPY_REPAIR_ENABLED:
+            print(f"文案缺少: {names}")
+            return None
+        print(f"文案缺少: {names}，只补全缺少的字段")
+    for field in missing:
+        response = _create_completion(
+            messages=build_repair_messages(article_info, sections, field),
+            temperature=LLM_TEMPERATURE,
+            max_tokens=REPAIR_MAX_TOKENS[field]
+        )
+        value = parse_copy_sections(response.choices[0].message.content or '', [field]).get(field)
+        if not value:
+            print(f"{SECTION_NAMES[field]}补全失败")
+            return None
+        print(f"{SECTION_NAMES[field]}补全成功")
+        sections[field] = value
+    return finalize_copy(sections)
+
 
 def generate_xiaohongshu_copy(article_info):
     """
@@ -9,48 +96,47 @@ def generate_xiaohongshu_copy(article_info):
     :param article_info: 文章信息
     :return: 生成的文案
     """
+    global _structured_output
     try:
-        # 初始化OpenAI客户端
-        client = OpenAI(
-            base_url="https://apis.iflow.cn/v1",
-            api_key=DASHSCOPE_API_KEY,
-        )
+        # 使用配置的模型路由（进程内共享的OpenAI客户端，复用连接池）
+        print(f"正在调用文本模型: {', '.join(route.name for route in get_llm_router().routes)}")
         
-        # 使用配置文件中的模型名称
-        print(f"正在调用文本模型: {AI_MODEL_NAME}")
+        # 与CopyAgent使用同一份提示词（结构化输出时格式由JSON Schema约束，不需要格式要求）
+        messages = build_copy_messages(article_info, _structured_output)
         
-        # 构造提示词
-        prompt = f"""
-        请根据以下文章信息，生成一篇小红书风格的文案，包含标题、正文内容和标签。
-
-        文章标题: {article_info['title']}
-        文章内容: {article_info['content'][:2000]}  # 限制内容长度
+        # 提示词完全相同时直接使用缓存的文案
+        cache = get_llm_cache() if LLM_CACHE_ENABLED else None
+        cache_key = llm_cache_key(get_llm_router().cache_model, LLM_TEMPERATURE, messages)
+        if cache is not None:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                print("命中大模型响应缓存，跳过模型调用")
+                return cached
+        report_prompt_tokens(article_info, messages)
         
-        要求:
-        1. 标题要有吸引力，使用小红书常用的emoji，单独一行返回
-        2. 正文内容要通俗易懂，面向普通读者，使用小红书风格的语言，单独一行返回
-        3. 标签要以#开头，用空格分隔，单独一行返回
-        4. 严格按照以下格式返回，不要包含其他解释文字:
-        [标题开始]
-        你的标题内容
-        [标题结束]
-        [正文开始]
-        你的正文内容
-        [正文结束]
-        [标签开始]
-        #标签1 #标签2 #标签3 #标签4 #标签5 #标签6 #标签7 #标签8
-        [标签结束]
-        """
+        # 结构化输出：格式由JSON Schema约束，部分字段无效时只补全缺少的字段
+        if _structured_output:
+            try:
+                response = _create_completion(
+                    messages=messages,
+                    temperature=LLM_TEMPERATURE,
+                    max_tokens=LLM_MAX_TOKENS,
+                    **_structured_request(COPY_OUTPUT_MODE)
+                )
+                copy_data = repair_copy(article_info, _structured_fields(response))
+                if copy_data and cache is not None:
+                    cache.put(cache_key, get_llm_router().cache_model, copy_data)
+                return copy_data
+            except openai.BadRequestError as e:
+                print(f"服务端不支持结构化输出（{COPY_OUTPUT_MODE}），改用段落标记格式: {e}")
+                _structured_output = False
+                messages = build_copy_messages(article_info)
         
         # 调用模型
-        response = client.chat.completions.create(
-            model=AI_MODEL_NAME,
-            messages=[
-                {"role": "system", "content": "你是一个小红书文案专家，擅长将科技类文章转换为小红书风格的文案。严格按照指定格式返回内容，不要包含其他解释文字。"},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=1500
+        response = _create_completion(
+            messages=messages,
+            temperature=LLM_TEMPERATURE,
+            max_tokens=LLM_MAX_TOKENS
         )
         
         print("API调用完成")
@@ -81,62 +167,11 @@ def generate_xiaohongshu_copy(article_info):
             elif hasattr(response, '__str__'):
                 result = str(response)
         
-        print(f"生成的文案内容: {result}")
-        
-        # 确保返回有效数据
-        if not result:
-            print("模型返回空结果")
-            return None
-            
-        # 检查是否是错误信息
-        if "error" in result.lower() or "ErrorMsg" in result:
-            print("模型返回错误信息")
-            return None
-            
-        # 解析自定义格式的内容
-        try:
-            # 提取标题
-            title_start = result.find("[标题开始]")
-            title_end = result.find("[标题结束]")
-            if title_start != -1 and title_end != -1:
-                title = result[title_start+6:title_end].strip()
-            else:
-                print("无法找到标题")
-                return None
-                
-            # 提取正文
-            content_start = result.find("[正文开始]")
-            content_end = result.find("[正文结束]")
-            if content_start != -1 and content_end != -1:
-                content = result[content_start+6:content_end].strip()
-            else:
-                print("无法找到正文")
-                return None
-                
-            # 提取标签
-            tags_start = result.find("[标签开始]")
-            tags_end = result.find("[标签结束]")
-            if tags_start != -1 and tags_end != -1:
-                tags_str = result[tags_start+6:tags_end].strip()
-                # 按空格分割标签
-                tags = [tag.strip() for tag in tags_str.split() if tag.strip().startswith('#')]
-            else:
-                print("无法找到标签")
-                return None
-                
-            # 构造返回数据
-            copy_data = {
-                'title': title,
-                'content': content,
-                'tags': tags
-            }
-            
-            print("内容解析成功")
-            return copy_data
-            
-        except Exception as e:
-            print(f"内容解析错误: {e}")
-            return None
+        sections = parse_copy_sections(result) if check_result(result) else {}
+        copy_data = repair_copy(article_info, sections)
+        if copy_data and cache is not None:
+            cache.put(cache_key, get_llm_router().cache_model, copy_data)
+        return copy_data
         
     except Exception as e:
         print(f"生成小红书文案失败: {e}")
@@ -0,0 +1,417 @@
+"""
+小红书文案格式解析
+模型按 [标题开始]…[标题结束]、[正文开始]…[正文结束]、[标签开始]…[标签结束] 的格式返回文案。
+- parse_copy: 解析完整的返回文本
+- IncrementalCopyParser: 流式生成时边接收边解析，每个段落结束即交给下游，
+  一旦输出明显不符合格式（段落前有多余内容、段落顺序错误、长度超限）立即报错，以便提前中止生成
+- COPY_JSON_SCHEMA / normalize_structured: 结构化输出模式的文案结构与字段整理
+- build_repair_messages: 只有部分字段有效时，构造只补全缺少字段的简短请求
+- split_variants: 切分一次请求返回的多个文案变体
+"""
+import json
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+from config import COPY_MAX_TITLE_CHARS, COPY_MAX_CONTENT_CHARS, COPY_MAX_TAGS_CHARS, LLM_MAX_TOKENS
+from prompt_budget import article_excerpt
+
+# (字段名, 开始标记, 结束标记)，按模型输出顺序排列
+SECTIONS = [
+    ('title', '[标题开始]', '[标题结束]'),
+    ('content', '[正文开始]', '[正文结束]'),
+    ('tags', '[标签开始]', '[标签结束]'),
+]
+
+SECTION_NAMES = {'title': '标题', 'content': '正文', 'tags': '标签'}
+
+SECTION_MAX_CHARS = {
+    'title': COPY_MAX_TITLE_CHARS,
+    'content': COPY_MAX_CONTENT_CHARS,
+    'tags': COPY_MAX_TAGS_CHARS,
+}
+
+
+class CopyFormatError(Exception):
+    """模型输出不符合文案格式"""
+
+
+def parse_tags(tags_str: str) -> List[str]:
+    """按空格分割标签，只保留以#开头的"""
+    return [tag.strip() for tag in tags_str.split() if tag.strip().startswith('#')]
+
+
+def check_result(result: str) -> bool:
+    """
+    检查模型返回的文本是否可以解析
+    :param result: 模型返回的文本
+    :return: 非空且不是错误信息时返回True
+    """
+    print(f"生成的文案内容: {result}")
+
+    # 确保返回有效数据
+    if not result:
+        print("模型返回空结果")
+        return False
+
+    # 检查是否是错误信息
+    if "error" in result.lower() or "ErrorMsg" in result:
+        print("模型返回错误信息")
+        return False
+    return True
+
+
+def parse_copy_sections(result: str, fields: Optional[List[str]] = None) -> Dict:
+    """
+    解析返回文本中能找到的段落
+    :param result: 模型返回的文本
+    :param fields: 只解析这些字段，默认全部
+    :return: 找到的字段 {'title', 'content', 'tags'}，缺少的字段不出现在结果中
+    """
+    sections = {}
+    for name, start_marker, end_marker in SECTIONS:
+        if fields is not None and name not in fields:
+            continue
+        start = (result or '').find(start_marker)
+        end = (result or '').find(end_marker)
+        if start == -1 or end == -1 or end < start:
+            print(f"无法找到{SECTION_NAMES[name]}")
+            continue
+        value = result[start + len(start_marker):end].strip()
+        if name == 'tags':
+            value = parse_tags(value)
+        if value:
+            sections[name] = value
+    return sections
+
+
+def missing_fields(sections: Optional[Dict]) -> List[str]:
+    """返回缺少或为空的字段名（按输出顺序）"""
+    sections = sections or {}
+    return [name for name, _, _ in SECTIONS if not sections.get(name)]
+
+
+def finalize_copy(sections: Optional[Dict]) -> Optional[Dict]:
+    """
+    把完整的段落整理为文案
+    :param sections: 字段字典，tags 可以是列表或未拆分的字符串
+    :return: {'title', 'content', 'tags'}，有字段缺失时返回None
+    """
+    if not sections:
+        return None
+    tags = sections.get('tags')
+    if isinstance(tags, str):
+        tags = parse_tags(tags)
+    copy_data = {'title': sections.get('title'), 'content': sections.get('content'), 'tags': tags}
+    if missing_fields(copy_data):
+        return None
+    return copy_data
+
+
+def parse_copy(result: str) -> Optional[Dict]:
+    """
+    解析模型返回的完整文案
+    :param result: 模型返回的文本
+    :return: {'title', 'content', 'tags'}，格式不正确时返回None
+    """
+    if not check_result(result):
+        return None
+
+    # 解析自定义格式的内容
+    try:
+        copy_data = finalize_copy(parse_copy_sections(result))
+        if copy_data is None:
+            return None
+
+        print("内容解析成功")
+        return copy_data
+
+    except Exception as e:
+        print(f"内容解析错误: {e}")
+        return None
+
+
+# 结构化输出（JSON Schema / 工具调用）使用的文案结构
+COPY_JSON_SCHEMA = {
+    'title': 'xiaohongshu_copy',
+    'description': '小红书风格的文案',
+    'type': 'object',
+    'properties': {
+        'title': {'type': 'string', 'description': '有吸引力的标题，使用小红书常用的emoji'},
+        'content': {'type': 'string', 'description': '通俗易懂、面向普通读者的小红书风格正文'},
+        'tags': {'type': 'array', 'items': {'type': 'string'}, 'description': '以#开头的标签，6到8个'},
+    },
+    'required': ['title', 'content', 'tags'],
+    'additionalProperties': False,
+}
+
+_JSON_STRING_FIELD = r'"{}"\s*:\s*"((?:[^"\\]|\\.)*)"'
+
+
+def normalize_structured(data) -> Dict:
+    """
+    整理结构化输出中的字段，只保留有效的字段（部分有效时由调用方补全缺少的字段）
+    :param data: 模型返回的对象或JSON文本
+    :return: 有效字段
+    """
+    if isinstance(data, str):
+        data = salvage_json(data)
+    if not isinstance(data, dict):
+        return {}
+    fields = {}
+    for name in ('title', 'content'):
+        value = data.get(name)
+        if isinstance(value, str) and value.strip():
+            fields[name] = value.strip()
+    tags = data.get('tags')
+    if isinstance(tags, str):
+        tags = tags.split()
+    if isinstance(tags, list):
+        tags = [t.strip() if t.strip().startswith('#') else '#' + t.strip()
+                for t in tags if isinstance(t, str) and t.strip()]
+        if tags:
+            fields['tags'] = tags
+    return fields
+
+
+def salvage_json(text: str) -> Dict:
+    """
+    从可能被截断或不合法的JSON文本中取出能识别的字段
+    :param text: 模型返回的JSON文本
+    :return: 字段字典
+    """
+    text = (text or '').strip()
+    try:
+        data = json.loads(text)
+        return data if isinstance(data, dict) else {}
+    except ValueError:
+        pass
+    data = {}
+    for name in ('title', 'content'):
+        match = re.search(_JSON_STRING_FIELD.format(name), text)
+        if match:
+            try:
+                data[name] = json.loads(f'"{match.group(1)}"')
+            except ValueError:
+                continue
+    match = re.search(r'"tags"\s*:\s*\[([^\]]*)\]', text)
+    if match:
+        data['tags'] = re.findall(r'"((?:[^"\\]|\\.)*)"', match.group(1))
+    return data
+
+
+def build_copy_messages(article_info: Dict, structured: bool = False, variants: int = 1) -> List[Dict]:
+    """
+    构造生成小红书文案的消息（CopyAgent 和 copy_generator 共用）
+    :param article_info: 文章信息
+    :param structured: 是否使用结构化输出（此时由JSON Schema约束格式）
+    :param variants: 在一次回复中生成的文案变体数（多段提示词方式）
+    :return: 消息列表
+    """
+    # 正文按token预算挑选信息量最高的句子，代替按字符截断
+    excerpt = article_excerpt(article_info)
+    if structured:
+        prompt = f"""
+        请根据以下文章信息，生成一篇小红书风格的文案，包含标题、正文内容和标签。
+
+        文章标题: {article_info['title']}
+        文章内容: {excerpt.text}
+        
+        要求:
+        1. 标题(title)要有吸引力，使用小红书常用的emoji
+        2. 正文(content)要通俗易懂，面向普通读者，使用小红书风格的语言
+        3. 标签(tags)为6到8个以#开头的词
+        """
+        return [
+            {"role": "system", "content": "你是一个小红书文案专家，擅长将科技类文章转换为小红书风格的文案。"},
+            {"role": "user", "content": prompt}
+        ]
+    
+    # 构造提示词
+    requirements = f"""
+        请根据以下文章信息，生成一篇小红书风格的文案，包含标题、正文内容和标签。
+
+        文章标题: {article_info['title']}
+        文章内容: {excerpt.text}
+        
+        要求:
+        1. 标题要有吸引力，使用小红书常用的emoji，单独一行返回
+        2. 正文内容要通俗易懂，面向普通读者，使用小红书风格的语言，单独一行返回
+        3. 标签要以#开头，用空格分隔，单独一行返回
+"""
+    copy_format = """        [标题开始]
+        你的标题内容
+        [标题结束]
+        [正文开始]
+        你的正文内容
+        [正文结束]
+        [标签开始]
+        #标签1 #标签2 #标签3 #标签4 #标签5 #标签6 #标签7 #标签8
+        [标签结束]
+"""
+    if variants > 1:
+        # 多个变体放在一次回复中，文章内容只发送一次
+        first_start, first_end = variant_markers(1)
+        last_end = variant_markers(variants)[1]
+        prompt = requirements + f"""        4. 生成 {variants} 篇不同的文案，标题角度和开头方式各不相同，严格按照以下格式依次返回，不要包含其他解释文字:
+        {first_start}
+{copy_format}        {first_end}
+        ……（其余各篇格式相同，编号依次递增）
+        {last_end}
+        """
+    else:
+        prompt = requirements + "        4. 严格按照以下格式返回，不要包含其他解释文字:\n" + copy_format + "        "
+    
+    return [
+        {"role": "system", "content": "你是一个小红书文案专家，擅长将科技类文章转换为小红书风格的文案。严格按照指定格式返回内容，不要包含其他解释文字。"},
+        {"role": "user", "content": prompt}
+    ]
+
+
+# 补全单个字段时的最大生成token数
+REPAIR_MAX_TOKENS = {'title': 100, 'content': LLM_MAX_TOKENS, 'tags': 150}
+
+
+def build_repair_messages(article_info: Dict, sections: Dict, field: str) -> List[Dict]:
+    """
+    构造只补全缺少字段的简短请求
+    :param article_info: 文章信息
+    :param sections: 已生成的字段
+    :param field: 需要补全的字段
+    :return: 消息列表
+    """
+    _, start_marker, end_marker = next(section for section in SECTIONS if section[0] == field)
+    known = []
+    for name, known_start, known_end in SECTIONS:
+        value = sections.get(name)
+        if value:
+            value = ' '.join(value) if isinstance(value, list) else value
+            known.append(f"{known_start}\n{value}\n{known_end}")
+    # 补全标题和标签只需要正文，补全正文时才需要原文
+    source = article_excerpt(article_info).text if field == 'content' else ''
+    prompt = f"""
+        下面是一篇小红书文案中已经生成的部分，请只补全缺少的{SECTION_NAMES[field]}。
+
+        文章标题: {article_info.get('title', '')}
+        {f"文章内容: {source}" if source else ""}
+
+        已生成的部分:
+        {chr(10).join(known)}
+
+        严格按照以下格式只返回{SECTION_NAMES[field]}，不要包含其他内容:
+        {start_marker}
+        你的{SECTION_NAMES[field]}内容
+        {end_marker}
+        """
+    return [
+        {"role": "system", "content": "你是一个小红书文案专家，严格按照指定格式返回内容，不要包含其他解释文字。"},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def variant_markers(index: int) -> Tuple[str, str]:
+    """第 index 个文案变体（从1开始）的开始、结束标记"""
+    return f'[文案{index}开始]', f'[文案{index}结束]'
+
+
+def split_variants(result: str, count: int) -> List[str]:
+    """
+    按 [文案N开始]…[文案N结束] 切分一次返回的多个文案变体
+    :param result: 模型返回的文本
+    :param count: 请求的变体数
+    :return: 各变体的文本（缺少结束标记时取到下一个变体开始或文本末尾，便于保留被截断的变体）
+    """
+    result = result or ''
+    variants = []
+    for index in range(1, count + 1):
+        start_marker, end_marker = variant_markers(index)
+        start = result.find(start_marker)
+        if start == -1:
+            continue
+        start += len(start_marker)
+        end = result.find(end_marker, start)
+        if end == -1:
+            next_start = result.find(variant_markers(index + 1)[0], start)
+            end = next_start if next_start != -1 else len(result)
+        variants.append(result[start:end])
+    return variants
+
+
+class IncrementalCopyParser:
+    """流式文案解析器，feed() 接收模型输出的增量文本"""
+
+    def __init__(self, on_section: Optional[Callable[[str, str], None]] = None,
+                 max_chars: Optional[Dict[str, int]] = None):
+        """
+        :param on_section: 每个段落结束时的回调 on_section(字段名, 内容)
+        :param max_chars: 各段落的最大长度，默认使用配置
+        """
+        self.on_section = on_section
+        self.max_chars = max_chars or SECTION_MAX_CHARS
+        self.sections: Dict[str, str] = {}
+        self.received = 0
+        self._buffer = ''
+        self._index = 0
+        self._inside = False
+
+    @property
+    def done(self) -> bool:
+        """三个段落是否都已解析完成（之后的输出可以忽略）"""
+        return self._index >= len(SECTIONS)
+
+    def feed(self, text: str) -> List[Tuple[str, str]]:
+        """
+        接收增量文本
+        :param text: 新收到的文本
+        :return: 本次新完成的段落 [(字段名, 内容)]
+        :raises CopyFormatError: 输出不符合格式时
+        """
+        self.received += len(text)
+        if self.done:
+            return []
+        self._buffer += text
+        completed = []
+        while not self.done:
+            name, start_marker, end_marker = SECTIONS[self._index]
+            if not self._inside:
+                stripped = self._buffer.lstrip()
+                if stripped.startswith(start_marker):
+                    self._buffer = stripped[len(start_marker):]
+                    self._inside = True
+                    continue
+                if stripped and not start_marker.startswith(stripped):
+                    raise CopyFormatError(f"[{SECTION_NAMES[name]}开始]之前出现多余内容: {stripped[:30]!r}")
+                break
+
+            end = self._buffer.find(end_marker)
+            # 段落内出现其他段落的标记，说明顺序错乱或缺少结束标记
+            for other_name, other_start, other_end in SECTIONS:
+                if other_name == name:
+                    continue
+                position = self._buffer.find(other_start)
+                if position != -1 and (end == -1 or position < end):
+                    raise CopyFormatError(f"{SECTION_NAMES[name]}未结束就出现了 {other_start}")
+            if end == -1:
+                # 去掉可能是结束标记前半部分的结尾后，检查长度是否超限
+                if len(self._buffer) - len(end_marker) > self.max_chars[name]:
+                    raise CopyFormatError(f"{SECTION_NAMES[name]}超过 {self.max_chars[name]} 字仍未结束")
+                break
+
+            value = self._buffer[:end].strip()
+            if len(value) > self.max_chars[name]:
+                raise CopyFormatError(f"{SECTION_NAMES[name]}超过 {self.max_chars[name]} 字")
+            self._buffer = self._buffer[end + len(end_marker):]
+            self._inside = False
+            self._index += 1
+            self.sections[name] = value
+            completed.append((name, value))
+            if self.on_section:
+                self.on_section(name, value)
+        return completed
+
+    def result(self) -> Optional[Dict]:
+        """
+        解析结果
+        :return: {'title', 'content', 'tags'}，段落不完整时返回None
+        """
+        if not self.done:
+            return None
+        return finalize_copy(self.sections)
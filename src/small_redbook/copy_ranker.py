@@ -0,0 +1,118 @@
+"""
+文案变体的本地评分
+一次请求生成多个文案变体后，按标题长度、emoji使用、标签数量、正文长度和重复片段给每个变体打分，
+只用字符串统计，不再调用模型，从多个变体中挑出最适合发布的一篇
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+# 常用emoji所在的Unicode区段
+_EMOJI_PATTERN = re.compile(
+    r'[\U0001F000-\U0001FAFF\u2600-\u27BF\u2B00-\u2BFF\u2190-\u21FF\u2300-\u23FF\u3030\u303D\u3297\u3299]'
+)
+_SPACE_PATTERN = re.compile(r'\s+')
+
+# 各项的满分，总分100
+WEIGHTS = {
+    'title_length': 25,
+    'title_emoji': 10,
+    'content_emoji': 10,
+    'tags': 15,
+    'content_length': 20,
+    'duplicates': 20,
+}
+
+
+def _in_range(value: float, low: float, high: float, slope: float) -> float:
+    """value 在 [low, high] 内得1分，超出部分每 slope 扣1分，最低0分"""
+    if value < low:
+        return max(0.0, 1 - (low - value) / slope)
+    if value > high:
+        return max(0.0, 1 - (value - high) / slope)
+    return 1.0
+
+
+def count_emoji(text: str) -> int:
+    """统计文本中的emoji个数"""
+    return len(_EMOJI_PATTERN.findall(text or ''))
+
+
+def duplicate_ratio(text: str, size: int = 6) -> float:
+    """
+    重复片段比例：正文中长度为 size 的片段有多少是重复出现的
+    :param text: 正文
+    :param size: 片段长度（字符）
+    :return: 0到1之间的比例，正文过短时为0
+    """
+    compact = _SPACE_PATTERN.sub('', text or '')
+    total = len(compact) - size + 1
+    if total <= 1:
+        return 0.0
+    unique = len({compact[i:i + size] for i in range(total)})
+    return 1 - unique / total
+
+
+class CopyRanker:
+    """按发布规范给文案变体打分并排序"""
+
+    def __init__(self, title_range: Tuple[int, int] = (8, 20), title_emoji_range: Tuple[int, int] = (1, 3),
+                 content_emoji_per_100: Tuple[float, float] = (0.5, 3.0), tag_range: Tuple[int, int] = (6, 8),
+                 content_range: Tuple[int, int] = (300, 900)):
+        self.title_range = title_range
+        self.title_emoji_range = title_emoji_range
+        self.content_emoji_per_100 = content_emoji_per_100
+        self.tag_range = tag_range
+        self.content_range = content_range
+
+    def details(self, copy: Dict) -> Dict[str, float]:
+        """
+        各项得分
+        :param copy: 文案 {'title', 'content', 'tags'}
+        :return: {项目: 得分}，每项满分见 WEIGHTS
+        """
+        title = copy.get('title', '') or ''
+        content = copy.get('content', '') or ''
+        tags = copy.get('tags', []) or []
+        title_emoji = count_emoji(title)
+        # 小红书标题上限按字符计，emoji也占位
+        title_length = len(title.strip())
+        content_length = len(_SPACE_PATTERN.sub('', content))
+        emoji_density = count_emoji(content) * 100 / content_length if content_length else 0
+        # 重复的标签只算一个
+        tag_count = len({tag.lower() for tag in tags})
+
+        scores = {
+            'title_length': _in_range(title_length, *self.title_range, slope=10),
+            'title_emoji': _in_range(title_emoji, *self.title_emoji_range, slope=3),
+            'content_emoji': _in_range(emoji_density, *self.content_emoji_per_100, slope=3),
+            'tags': _in_range(tag_count, *self.tag_range, slope=5),
+            'content_length': _in_range(content_length, *self.content_range, slope=self.content_range[0]),
+            # 正常文章的重复片段很少，重复超过25%时该项为0
+            'duplicates': max(0.0, 1 - duplicate_ratio(content) * 4),
+        }
+        return {name: round(score * WEIGHTS[name], 1) for name, score in scores.items()}
+
+    def score(self, copy: Dict) -> float:
+        """文案总分（0到100）"""
+        return round(sum(self.details(copy).values()), 1)
+
+    def rank(self, copies: List[Dict]) -> List[Dict]:
+        """
+        按总分从高到低排序，分数相同时保持原顺序
+        :param copies: 文案列表
+        :return: 排序后的文案列表
+        """
+        scores = [self.score(copy) for copy in copies]
+        order = sorted(range(len(copies)), key=scores.__getitem__, reverse=True)
+        return [copies[i] for i in order]
+
+
+_copy_ranker: Optional[CopyRanker] = None
+
+
+def get_copy_ranker() -> CopyRanker:
+    """获取文案评分器"""
+    global _copy_ranker
+    if _copy_ranker is None:
+        _copy_ranker = CopyRanker()
+    return _copy_ranker
@@ -1,35 +1,24 @@
-import feedparser
-import requests
-from bs4 import BeautifulSoup
 from typing import List, Dict
-import time
-import re
-from playwright.sync_api import sync_playwright
+from browser_pool import get_browser_pool
+from concurrent_fetch import fetch_candidates
+from content_cache import get_content_cache
+from extractor import extract_article
+from feed_fetcher import fetch_all_feeds
+from hot_score import get_hot_scorer
+from near_dup import drop_near_duplicates, get_near_dup_index, summary_text
+from http_client import get_http_client
+from page_extractor import extract_with_page
+from stream_extractor import stream_article
+from config import CONTENT_CACHE_ENABLED, ARTICLE_FETCH_MODE, NEAR_DUP_ENABLED, PLAYWRIGHT_JOB_TIMEOUT
 
-# 机器之心RSS地址
-JIQIZHIXIN_RSS_URL = "https://www.jiqizhixin.com/rss.xml"
 
 def fetch_articles_from_rss() -> List[Dict]:
     """
-    从机器之心RSS获取最新文章列表
-    :return: 文章列表
+    从配置的RSS源（默认机器之心）并发获取最新文章列表
+    :return: 文章列表（按规范化链接去重）
     """
     try:
-        # 解析RSS
-        feed = feedparser.parse(JIQIZHIXIN_RSS_URL)
-        
-        articles = []
-        for entry in feed.entries:
-            article = {
-                'title': entry.title,
-                'link': entry.link,
-                'summary': getattr(entry, 'summary', ''),
-                'published': getattr(entry, 'published', ''),
-                'author': getattr(entry, 'author', '机器之心')
-            }
-            articles.append(article)
-        
-        return articles
+        return fetch_all_feeds()
     except Exception as e:
         print(f"获取RSS文章列表失败: {e}")
         return []
@@ -43,129 +32,8 @@ def fetch_article_content_with_playwright(url: str) -> Dict:
     try:
         print(f"使用Playwright获取文章内容: {url}")
         
-        with sync_playwright() as p:
-            # 启动浏览器（无头模式）
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-            
-            # 设置视口大小
-            page.set_viewport_size({"width": 1280, "height": 800})
-            
-            # 设置用户代理
-            page.set_extra_http_headers({
-                'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36'
-            })
-            
-            # 访问页面
-            response = page.goto(url, wait_until='networkidle')
-            
-            if response and response.status == 200:
-                # 等待页面加载完成
-                page.wait_for_timeout(5000)
-                
-                # 获取页面标题
-                title = page.title()
-                print(f"页面标题: {title}")
-                
-                # 尝试多种选择器来提取文章内容
-                content = ""
-                
-                # 更精确的文章内容选择器
-                content_selectors = [
-                    'article .content',
-                    '.article-content .content',
-                    '.article-content',
-                    '.content-wrapper',
-                    '.article-body',
-                    '.post-content',
-                    '.entry-content',
-                    '[class*="article"] [class*="content"]'
-                ]
-                
-                for selector in content_selectors:
-                    try:
-                        content_elements = page.query_selector_all(selector)
-                        if content_elements:
-                            # 合并所有匹配元素的文本
-                            full_content = ""
-                            for element in content_elements:
-                                element_text = element.inner_text().strip()
-                                # 过滤掉太短的内容和可能的噪声内容
-                                if element_text and len(element_text) > 100 and "登录" not in element_text and "会员" not in element_text:
-                                    # 过滤掉包含列表项的内容（可能是推荐文章）
-                                    if "今天" not in element_text and "08月" not in element_text:
-                                        full_content += element_text + "\n\n"
-                            
-                            if len(full_content) > len(content):
-                                content = full_content
-                                print(f"通过选择器 {selector} 提取到内容，长度: {len(content)}")
-                                if len(content) > 500:  # 如果内容足够长，认为找到了正文
-                                    break
-                    except Exception as e:
-                        print(f"使用选择器 {selector} 提取内容时出错: {e}")
-                        continue
-                
-                # 如果没找到特定内容区域，尝试查找包含文章主要内容的div
-                if not content or len(content) < 500:
-                    try:
-                        # 查找所有div元素
-                        div_elements = page.query_selector_all('div')
-                        for div in div_elements:
-                            div_text = div.inner_text().strip()
-                            # 查找包含较长文本且不包含噪声词汇的div
-                            if len(div_text) > 1000 and "登录" not in div_text and "会员" not in div_text:
-                                # 检查是否包含文章相关内容
-                                if any(keyword in div_text for keyword in ["AI", "人工智能", "模型", "芯片", "数据"]):
-                                    # 过滤掉包含推荐列表的内容
-                                    if "今天" not in div_text[:500] and "08月" not in div_text[:500]:
-                                        content = div_text
-                                        print(f"从div提取到内容，长度: {len(content)}")
-                                        break
-                    except Exception as e:
-                        print(f"从div提取内容时出错: {e}")
-                
-                # 提取文章标签
-                tags = []
-                try:
-                    # 查找标签相关的元素
-                    tag_elements = page.query_selector_all('.tag, .tags, [class*="tag"], a[href*="tag"]')
-                    for tag_element in tag_elements:
-                        tag_text = tag_element.inner_text().strip()
-                        if tag_text and len(tag_text) > 1 and len(tag_text) < 30 and "#" not in tag_text:
-                            tags.append(tag_text)
-                    
-                    # 如果没找到标签，尝试从页面文本中提取
-                    if not tags:
-                        page_text = page.inner_text()
-                        # 简单的标签提取（假设标签在文章末尾）
-                        lines = page_text.split('\n')
-                        for line in lines[-20:]:  # 检查最后20行
-                            if line.strip().startswith('#') and len(line.strip()) < 30:
-                                tags.append(line.strip())
-                    
-                    # 去重
-                    tags = list(set(tags))[:10]  # 最多保留10个标签
-                    print(f"提取到标签: {tags}")
-                except Exception as e:
-                    print(f"提取标签时出错: {e}")
-                
-                # 关闭浏览器
-                browser.close()
-                
-                print(f"最终提取到的内容长度: {len(content)}")
-                
-                # 如果内容太短，认为获取失败
-                if len(content) < 300:
-                    print("内容太短，认为获取失败")
-                    return {'content': '', 'tags': []}
-                
-                return {
-                    'content': content[:8000] if content else '',  # 限制内容长度为8000字符
-                    'tags': tags
-                }
-            else:
-                print(f"访问页面失败，状态码: {response.status if response else 'None'}")
-                browser.close()
+        # 从浏览器池取出页面，避免每篇文章都重新启动浏览器
+        return get_browser_pool().run(lambda page: extract_with_page(page, url), timeout=PLAYWRIGHT_JOB_TIMEOUT)
     except Exception as e:
         print(f"使用Playwright获取文章内容失败 {url}: {e}")
     
@@ -173,102 +41,35 @@ def fetch_article_content_with_playwright(url: str) -> Dict:
 
 def fetch_article_content(url: str) -> Dict:
     """
-    通过网页抓取获取文章详细内容（优先使用requests，失败后使用Playwright）
+    通过网页抓取获取文章详细内容（优先直接请求，失败后使用Playwright）
     :param url: 文章链接
     :return: 文章详细内容
     """
     try:
-        # 首先尝试使用requests获取内容
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36'
-        }
-        
+        # 首先尝试使用共享HTTP客户端获取内容（复用连接池）
         print(f"正在获取文章内容: {url}")
-        response = requests.get(url, headers=headers, timeout=10)
-        response.encoding = 'utf-8'
+        if ARTICLE_FETCH_MODE == 'stream':
+            # 流式读取，正文容器读完或超过字节上限即停止下载，已读取的部分照常提取
+            streamed = stream_article(url)
+            status_code, html = streamed.status_code, streamed.text
+        else:
+            response = get_http_client().get(url)
+            response.encoding = 'utf-8'
+            status_code, html = response.status_code, response.text
         
-        print(f"响应状态码: {response.status_code}")
-        print(f"响应内容长度: {len(response.text)}")
+        print(f"响应状态码: {status_code}")
+        print(f"响应内容长度: {len(html)}")
         
-        if response.status_code == 200:
+        if status_code == 200:
             # 检查是否是登录页面
-            if "登录" in response.text and "会员" in response.text:
+            if "登录" in html and "会员" in html:
                 print("检测到登录页面，尝试使用Playwright获取内容")
                 return fetch_article_content_with_playwright(url)
             
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # 尝试多种选择器来提取文章内容
-            content = ""
-            
-            # 尝试查找文章正文的常见选择器
-            content_selectors = [
-                'article .content',
-                '.article-content .content',
-                '.article-content',
-                '.content-wrapper',
-                '.article-body',
-                '.post-content',
-                '.entry-content',
-                '[class*="article"] [class*="content"]'
-            ]
-            
-            for selector in content_selectors:
-                content_elements = soup.select(selector)
-                if content_elements:
-                    print(f"找到 {len(content_elements)} 个匹配元素，选择器: {selector}")
-                    # 合并所有匹配元素的文本
-                    full_content = ""
-                    for element in content_elements:
-                        # 移除script和style标签
-                        for script in element(["script", "style", "nav", "header", "footer", "aside"]):
-                            script.decompose()
-                        element_text = element.get_text().strip()
-                        # 过滤掉太短的内容和可能的噪声内容
-                        if element_text and len(element_text) > 100 and "登录" not in element_text and "会员" not in element_text:
-                            # 过滤掉包含列表项的内容（可能是推荐文章）
-                            if "今天" not in element_text and "08月" not in element_text:
-                                full_content += element_text + "\n\n"
-                    
-                    if len(full_content) > len(content):
-                        content = full_content
-                        print(f"提取到的内容长度: {len(content)}")
-                        if len(content) > 500:  # 如果内容足够长，认为找到了正文
-                            print("内容足够长，认为找到了正文")
-                            break
-            
-            # 如果没找到特定内容区域，则尝试其他方法
-            if not content or len(content) < 300:
-                print("未找到特定内容区域，尝试其他方法")
-                # 尝试查找包含文章内容的特定div
-                article_divs = soup.find_all('div')
-                for div in article_divs:
-                    # 移除script和style标签
-                    for script in div(["script", "style", "nav", "header", "footer", "aside"]):
-                        script.decompose()
-                    div_content = div.get_text().strip()
-                    # 查找包含较长文本且不包含登录相关词汇的div
-                    if len(div_content) > 1000 and "登录" not in div_content and "会员" not in div_content:
-                        # 检查是否包含文章相关内容
-                        if any(keyword in div_content for keyword in ["AI", "人工智能", "模型", "芯片", "数据"]):
-                            # 过滤掉包含推荐列表的内容
-                            if "今天" not in div_content[:500] and "08月" not in div_content[:500]:
-                                content = div_content
-                                print(f"从div提取到的内容长度: {len(content)}")
-                                break
-            
-            # 提取文章标签或分类
-            tags = []
-            tag_elements = soup.find_all('a', class_=re.compile(r'tag|category', re.I)) or \
-                          soup.find_all('a', attrs={'rel': 'tag'}) or \
-                          soup.find_all(class_=re.compile(r'tag|category', re.I))
-            for tag in tag_elements:
-                tag_text = tag.get_text().strip()
-                if tag_text and len(tag_text) > 1 and len(tag_text) < 30 and "#" not in tag_text:
-                    tags.append(tag_text)
-            
-            # 去重
-            tags = list(set(tags))[:10]  # 最多保留10个标签
+            # 提取正文和标签（引擎由 EXTRACTION_ENGINE 配置）
+            extracted = extract_article(html, url=url)
+            content = extracted['content']
+            tags = extracted['tags']
             
             print(f"最终提取到的内容长度: {len(content)}")
             print(f"提取到的标签: {tags}")
@@ -283,8 +84,8 @@ def fetch_article_content(url: str) -> Dict:
                 'tags': tags
             }
     except Exception as e:
-        print(f"使用requests获取文章内容失败 {url}: {e}")
-        # 如果requests失败，尝试使用Playwright
+        print(f"请求文章内容失败 {url}: {e}")
+        # 如果请求失败，尝试使用Playwright
         print("尝试使用Playwright获取内容")
         return fetch_article_content_with_playwright(url)
     
@@ -298,67 +99,26 @@ def get_popular_articles(articles: List[Dict], count: int = 5) -> List[Dict]:
     :param count: 热门文章数量
     :return: 热门文章列表
     """
-    # 热门关键词列表
-    hot_keywords = ['AI', '人工智能', '大模型', '深度学习', '机器学习', 'NLP', 'CV', 'GPT', 'BERT', '算法', '神经网络', '芯片', '数据集', '发布', '突破']
-    
-    def calculate_hot_score(article):
-        score = 0
-        title = article.get('title', '')
-        summary = article.get('summary', '')
-        
-        # 标题包含热门关键词加分
-        for keyword in hot_keywords:
-            if keyword in title:
-                score += 15
-            if keyword in summary:
-                score += 8
-        
-        # 标题长度适中加分（标题过短或过长可能不够吸引人）
-        if 10 <= len(title) <= 50:
-            score += 5
-            
-        # 包含"最新"、"发布"等词汇加分
-        if any(word in title for word in ['最新', '发布', '重磅', '突破', '升级', '开源']):
-            score += 10
-            
-        # 内容长度加分
-        summary_length = len(summary)
-        if summary_length > 200:
-            score += 10
-        elif summary_length > 100:
-            score += 5
-            
-        return score
+    # 按热度评分排序（关键词匹配器只编译一次，每段文本扫描一次）
+    sorted_articles = get_hot_scorer().rank(articles)
     
-    # 按热度评分排序
-    sorted_articles = sorted(articles, key=calculate_hot_score, reverse=True)
+    # 同一事件的转载、跟进等版本只保留热度最高的一篇，并跳过与已生成过文案的文章近似重复的文章
+    if NEAR_DUP_ENABLED:
+        sorted_articles = drop_near_duplicates(sorted_articles, 'summary', summary_text, get_near_dup_index())
     
     print(f"按热度排序后的前10篇文章:")
     for i, article in enumerate(sorted_articles[:10]):
         print(f"{i+1}. {article.get('title', '')}")
         print(f"   摘要长度: {len(article.get('summary', ''))}")
     
-    # 获取前N篇文章的详细内容
-    popular_articles = []
-    for article in sorted_articles[:count * 2]:  # 多获取一些文章，因为有些可能获取不到内容
-        print(f"\n正在处理文章: {article.get('title', '')}")
-        # 获取文章详细内容
-        content_info = fetch_article_content(article['link'])
-        article.update(content_info)
-        
-        # 只有成功获取到内容的文章才加入热门列表
-        if 'content' in article and article['content'] and len(article['content']) > 300:
-            print(f"成功获取到内容，长度: {len(article['content'])}")
-            popular_articles.append(article)
-        else:
-            print("未获取到有效内容")
-        
-        # 如果已经获取到足够的文章，就停止
-        if len(popular_articles) >= count:
-            break
-        
-        # 添加延时，避免请求过于频繁
-        time.sleep(1)
+    # 并发获取前N篇文章的详细内容，多获取一些文章，因为有些可能获取不到内容
+    popular_articles = fetch_candidates(
+        sorted_articles[:count * 2],
+        fetch_article_content,
+        count,
+        is_valid=lambda article: bool(article.get('content')) and len(article['content']) > 300,
+        cache=get_content_cache() if CONTENT_CACHE_ENABLED else None
+    )
     
     # 如果获取到的文章数量不够，就返回所有获取到的文章
     print(f"\n最终筛选出 {len(popular_articles)} 篇热门文章")
@@ -0,0 +1,418 @@
+"""
+文章正文提取
+提供两种提取引擎：
+- cascade: 按常见选择器依次查找正文区域（优先尝试该站点上次成功的选择器），找不到时退回文本密度提取
+- density: 直接按文本密度和链接密度为页面中的区块打分，选出正文
+
+HTML解析后端可配置：
+- selectolax: 基于lexbor的C实现，选择器匹配和文本提取最快
+- lxml: BeautifulSoup + lxml解析器
+- html.parser: BeautifulSoup + 标准库解析器（兜底，无需额外依赖）
+- auto: 按以上顺序选择已安装的后端
+"""
+import math
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+from bs4 import BeautifulSoup
+from bs4.element import NavigableString, PreformattedString, Tag
+from config import EXTRACTION_ENGINE, HTML_PARSER_BACKEND, SELECTOR_CACHE_ENABLED
+from selector_cache import get_selector_cache, host_of
+
+# 文章正文的常见选择器
+CONTENT_SELECTORS = [
+    'article .content',
+    '.article-content .content',
+    '.article-content',
+    '.content-wrapper',
+    '.article-body',
+    '.post-content',
+    '.entry-content',
+    '[class*="article"] [class*="content"]'
+]
+
+# 提取文本时忽略的标签
+NOISE_TAGS = {'script', 'style', 'noscript', 'template', 'nav', 'header', 'footer', 'aside', 'iframe', 'svg'}
+
+# 可以作为正文容器的标签
+CANDIDATE_TAGS = {'div', 'article', 'section', 'main', 'td', 'body'}
+
+# class/id 中暗示正文或噪声区域的关键词
+POSITIVE_HINTS = re.compile(r'article|content|post|entry|body|main|text', re.I)
+NEGATIVE_HINTS = re.compile(r'comment|footer|header|nav|sidebar|side|recommend|related|share|banner|ad-|ads|login|menu', re.I)
+
+TAG_CLASS_PATTERN = re.compile(r'tag|category', re.I)
+
+EXTRACTION_ENGINES = ('cascade', 'density')
+
+
+def _filter_tags(texts) -> List[str]:
+    """过滤并去重标签文本"""
+    tags = []
+    for tag_text in texts:
+        tag_text = tag_text.strip()
+        if tag_text and len(tag_text) > 1 and len(tag_text) < 30 and "#" not in tag_text:
+            tags.append(tag_text)
+    # 去重
+    return list(set(tags))[:10]  # 最多保留10个标签
+
+
+class SoupBackend:
+    """BeautifulSoup解析后端（html.parser 或 lxml）"""
+
+    def __init__(self, parser: str):
+        self.name = parser
+        self.parser = parser
+
+    def parse(self, html: str):
+        return BeautifulSoup(html, self.parser)
+
+    def root(self, doc):
+        return doc.body or doc
+
+    def select(self, doc, selector: str) -> list:
+        return doc.select(selector)
+
+    def children(self, node):
+        return node.contents
+
+    def tag_name(self, node) -> Optional[str]:
+        """元素返回标签名，文本等其他节点返回None"""
+        return node.name if isinstance(node, Tag) else None
+
+    def text(self, node) -> str:
+        """文本节点的内容，注释等节点返回空字符串"""
+        if isinstance(node, NavigableString) and not isinstance(node, PreformattedString):
+            return str(node)
+        return ''
+
+    def hints(self, node) -> str:
+        return ' '.join(node.get('class') or []) + ' ' + (node.get('id') or '')
+
+    def visible_text(self, node) -> str:
+        """
+        获取元素的可见文本，跳过脚本、样式、导航等噪声标签
+        只遍历一次子树，不修改DOM树
+        """
+        parts = []
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if isinstance(current, Tag):
+                if current.name in NOISE_TAGS:
+                    continue
+                # 倒序入栈，保证按文档顺序输出
+                stack.extend(reversed(current.contents))
+            else:
+                parts.append(self.text(current))
+        return ''.join(parts).strip()
+
+    def extract_tags(self, doc) -> List[str]:
+        tag_elements = doc.find_all('a', class_=TAG_CLASS_PATTERN) or \
+                      doc.find_all('a', attrs={'rel': 'tag'}) or \
+                      doc.find_all(class_=TAG_CLASS_PATTERN)
+        return _filter_tags(tag.get_text() for tag in tag_elements)
+
+
+class SelectolaxBackend:
+    """selectolax（lexbor）解析后端"""
+
+    name = 'selectolax'
+
+    def __init__(self):
+        from selectolax.lexbor import LexborHTMLParser
+        self._parser_class = LexborHTMLParser
+
+    def parse(self, html: str):
+        return self._parser_class(html)
+
+    def root(self, doc):
+        return doc.body or doc.root
+
+    def select(self, doc, selector: str) -> list:
+        return doc.css(selector)
+
+    def children(self, node):
+        return node.iter(include_text=True)
+
+    def tag_name(self, node) -> Optional[str]:
+        tag = node.tag
+        return None if tag.startswith('-') else tag
+
+    def text(self, node) -> str:
+        return node.text(deep=False) if node.tag == '-text' else ''
+
+    def hints(self, node) -> str:
+        attributes = node.attributes
+        return (attributes.get('class') or '') + ' ' + (attributes.get('id') or '')
+
+    def visible_text(self, node) -> str:
+        """
+        获取元素的可见文本，跳过脚本、样式、导航等噪声标签
+        与 SoupBackend 相同，只在所选元素内跳过，不修改DOM树，标签提取仍能看到整个页面
+        """
+        parts = []
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            tag = current.tag
+            if tag == '-text':
+                parts.append(current.text(deep=False))
+            elif not tag.startswith('-') and tag not in NOISE_TAGS:
+                # 倒序入栈，保证按文档顺序输出
+                stack.extend(reversed(list(current.iter(include_text=True))))
+        return ''.join(parts).strip()
+
+    def extract_tags(self, doc) -> List[str]:
+        tag_elements = doc.css('a[class*="tag" i], a[class*="category" i]') or \
+                      doc.css('a[rel="tag"]') or \
+                      doc.css('[class*="tag" i], [class*="category" i]')
+        return _filter_tags(tag.text() for tag in tag_elements)
+
+
+_backends: Dict[str, object] = {}
+
+
+def get_backend(name: str = HTML_PARSER_BACKEND):
+    """
+    获取HTML解析后端，所选后端未安装时依次退回 lxml、html.parser
+    :param name: auto / selectolax / lxml / html.parser
+    :return: 解析后端
+    """
+    if name in _backends:
+        return _backends[name]
+
+    candidates = {
+        'auto': ['selectolax', 'lxml', 'html.parser'],
+        'selectolax': ['selectolax', 'lxml', 'html.parser'],
+        'lxml': ['lxml', 'html.parser'],
+        'html.parser': ['html.parser'],
+    }.get(name)
+    if candidates is None:
+        print(f"未知的解析后端 {name}，使用 auto")
+        candidates = ['selectolax', 'lxml', 'html.parser']
+
+    backend = None
+    for candidate in candidates:
+        try:
+            if candidate == 'selectolax':
+                backend = SelectolaxBackend()
+            elif candidate == 'lxml':
+                import lxml  # noqa: F401
+                backend = SoupBackend('lxml')
+            else:
+                backend = SoupBackend('html.parser')
+            break
+        except ImportError:
+            if name != 'auto':
+                print(f"解析后端 {candidate} 未安装，尝试下一个")
+    _backends[name] = backend
+    return backend
+
+
+class _Frame:
+    """文本密度遍历时的区块统计"""
+    __slots__ = ('node', 'parent', 'name', 'text_len', 'link_len', 'tag_count', 'expanded')
+
+    def __init__(self, node, parent, name):
+        self.node = node
+        self.parent = parent
+        self.name = name
+        self.text_len = 0
+        self.link_len = 0
+        self.tag_count = 0
+        self.expanded = False
+
+
+def find_main_block(root, backend=None) -> Tuple[Optional[object], float]:
+    """
+    单次后序遍历，统计每个区块的文本长度、链接文本长度和子孙标签数，
+    按“非链接文本长度 × sqrt(文本密度)”打分，返回得分最高的区块
+    :param root: 文档根节点
+    :param backend: 解析后端
+    :return: (正文区块, 得分)，没有候选时区块为None
+    """
+    backend = backend or get_backend()
+    best, best_score = None, 0.0
+    stack = [_Frame(root, None, backend.tag_name(root))]
+    while stack:
+        frame = stack[-1]
+        if not frame.expanded:
+            frame.expanded = True
+            for child in backend.children(frame.node):
+                name = backend.tag_name(child)
+                if name is None:
+                    frame.text_len += len(backend.text(child).strip())
+                elif name not in NOISE_TAGS:
+                    stack.append(_Frame(child, frame, name))
+            continue
+
+        # 子节点都已统计完毕
+        stack.pop()
+        if frame.name == 'a':
+            frame.link_len = frame.text_len
+        if frame.name in CANDIDATE_TAGS and frame.text_len > frame.link_len:
+            density = frame.text_len / (frame.tag_count + 1)
+            score = (frame.text_len - frame.link_len) * math.sqrt(density)
+            hints = backend.hints(frame.node)
+            if NEGATIVE_HINTS.search(hints):
+                score *= 0.3
+            if POSITIVE_HINTS.search(hints):
+                score *= 1.5
+            if score > best_score:
+                best, best_score = frame.node, score
+        parent = frame.parent
+        if parent is not None:
+            parent.text_len += frame.text_len
+            parent.link_len += frame.link_len
+            parent.tag_count += frame.tag_count + 1
+    return best, best_score
+
+
+def extract_by_density(doc, backend=None) -> str:
+    """
+    按文本密度提取正文
+    :param doc: 解析后的文档
+    :param backend: 解析后端
+    :return: 正文文本
+    """
+    backend = backend or get_backend()
+    block, score = find_main_block(backend.root(doc), backend)
+    if block is None:
+        return ''
+    content = backend.visible_text(block)
+    print(f"文本密度提取: <{backend.tag_name(block)}> 得分 {score:.0f}，内容长度: {len(content)}")
+    return content
+
+
+def _selector_text(doc, backend, selector: str) -> str:
+    """
+    合并某个选择器匹配到的所有元素的文本
+    :param doc: 解析后的文档
+    :param backend: 解析后端
+    :param selector: 选择器
+    :return: 正文文本
+    """
+    content_elements = backend.select(doc, selector)
+    if not content_elements:
+        return ""
+    print(f"找到 {len(content_elements)} 个匹配元素，选择器: {selector}")
+    # 合并所有匹配元素的文本
+    full_content = ""
+    for element in content_elements:
+        element_text = backend.visible_text(element)
+        # 过滤掉太短的内容和可能的噪声内容
+        if element_text and len(element_text) > 100 and "登录" not in element_text and "会员" not in element_text:
+            # 过滤掉包含列表项的内容（可能是推荐文章）
+            if "今天" not in element_text and "08月" not in element_text:
+                full_content += element_text + "\n\n"
+    return full_content
+
+
+def select_content(doc, backend=None, selectors: Optional[List[str]] = None) -> Tuple[str, Optional[str]]:
+    """
+    按选择器依次查找正文区域
+    :param doc: 解析后的文档
+    :param backend: 解析后端
+    :param selectors: 选择器列表，默认使用 CONTENT_SELECTORS
+    :return: (正文文本, 提取出该正文的选择器)，没找到时选择器为None
+    """
+    backend = backend or get_backend()
+    content, source = "", None
+    for selector in selectors or CONTENT_SELECTORS:
+        full_content = _selector_text(doc, backend, selector)
+        if len(full_content) > len(content):
+            content, source = full_content, selector
+            print(f"提取到的内容长度: {len(content)}")
+            if len(content) > 500:  # 如果内容足够长，认为找到了正文
+                print("内容足够长，认为找到了正文")
+                break
+    return content, source
+
+
+def extract_by_selectors(doc, backend=None) -> str:
+    """
+    按常见选择器依次查找正文区域
+    :param doc: 解析后的文档
+    :param backend: 解析后端
+    :return: 正文文本
+    """
+    return select_content(doc, backend)[0]
+
+
+def extract_by_learned_selector(doc, backend, host: str) -> str:
+    """
+    优先使用站点记住的选择器提取正文，失效或需要复核时运行完整选择器级联，并记录胜出的选择器
+    :param doc: 解析后的文档
+    :param backend: 解析后端
+    :param host: 站点名
+    :return: 正文文本
+    """
+    selector_cache = get_selector_cache()
+    remembered = selector_cache.lookup(host)
+    if remembered:
+        content = _selector_text(doc, backend, remembered)
+        if len(content) >= 300:
+            print(f"使用站点 {host} 记住的选择器 {remembered} 提取到正文，长度: {len(content)}")
+            selector_cache.record_success(host, remembered)
+            return content
+        print(f"站点 {host} 记住的选择器 {remembered} 未提取到正文，运行完整选择器级联")
+        selector_cache.record_failure(host, remembered)
+
+    content, source = select_content(doc, backend)
+    if source and len(content) >= 300:
+        selector_cache.record_success(host, source, validated=True)
+    return content
+
+
+def extract_tags(doc, backend=None) -> List[str]:
+    """
+    提取文章标签或分类
+    :param doc: 解析后的文档
+    :param backend: 解析后端
+    :return: 标签列表
+    """
+    backend = backend or get_backend()
+    return backend.extract_tags(doc)
+
+
+def extract_article(html: str, engine: str = EXTRACTION_ENGINE, backend: str = HTML_PARSER_BACKEND,
+                    url: Optional[str] = None) -> Dict:
+    """
+    从HTML中提取文章正文和标签
+    :param html: 页面HTML
+    :param engine: 提取引擎，cascade 或 density
+    :param backend: HTML解析后端
+    :param url: 页面链接，提供时按站点记忆正文选择器（SELECTOR_CACHE_ENABLED）
+    :return: {'content': 正文, 'tags': 标签列表}
+    """
+    if engine not in EXTRACTION_ENGINES:
+        print(f"未知的提取引擎 {engine}，使用 cascade")
+        engine = 'cascade'
+    parser_backend = get_backend(backend)
+
+    start = time.perf_counter()
+    doc = parser_backend.parse(html)
+    parsed = time.perf_counter()
+
+    if engine == 'density':
+        content = extract_by_density(doc, parser_backend)
+    else:
+        host = host_of(url) if url and SELECTOR_CACHE_ENABLED else ''
+        if host:
+            content = extract_by_learned_selector(doc, parser_backend, host)
+        else:
+            content = extract_by_selectors(doc, parser_backend)
+        # 如果没找到特定内容区域，则按文本密度查找正文
+        if not content or len(content) < 300:
+            print("未找到特定内容区域，按文本密度提取")
+            content = extract_by_density(doc, parser_backend)
+    tags = extract_tags(doc, parser_backend)
+    finished = time.perf_counter()
+
+    print(f"HTML解析耗时 {(parsed - start) * 1000:.1f} ms，提取耗时 {(finished - parsed) * 1000:.1f} ms"
+          f"（解析后端: {parser_backend.name}）")
+    return {
+        'content': content,
+        'tags': tags
+    }
@@ -0,0 +1,104 @@
+"""
+RSS快照缓存
+保存每个RSS源上次的ETag/Last-Modified和解析后的文章列表，
+配合条件请求使用：服务器返回304时直接使用快照，无需重新下载和解析
+"""
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+from config import FEED_CACHE_PATH
+
+
+class FeedSnapshotCache:
+    """基于JSON文件的RSS快照缓存"""
+
+    def __init__(self, path: str = FEED_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, Dict]] = None
+
+    def _load(self) -> Dict[str, Dict]:
+        if self._entries is None:
+            self._entries = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        self._entries = json.load(f)
+                except Exception as e:
+                    print(f"读取RSS快照缓存失败，将重新下载: {e}")
+        return self._entries
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 先写临时文件再替换，避免中途退出导致缓存文件损坏
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """
+        构造条件请求头
+        :param url: RSS地址
+        :return: If-None-Match / If-Modified-Since 请求头，没有快照时为空
+        """
+        with self._lock:
+            entry = self._load().get(url)
+        headers = {}
+        if entry and entry.get('articles') is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def get_articles(self, url: str) -> Optional[List[Dict]]:
+        """
+        获取快照中的文章列表
+        :param url: RSS地址
+        :return: 文章列表的副本，没有快照时返回None
+        """
+        with self._lock:
+            entry = self._load().get(url)
+        if not entry or entry.get('articles') is None:
+            return None
+        # 返回副本，调用方会在文章字典上补充正文等字段
+        return [dict(article) for article in entry['articles']]
+
+    def store(self, url: str, articles: List[Dict], etag: Optional[str] = None,
+              last_modified: Optional[str] = None):
+        """
+        保存RSS快照
+        :param url: RSS地址
+        :param articles: 解析后的文章列表
+        :param etag: 响应的ETag
+        :param last_modified: 响应的Last-Modified
+        """
+        with self._lock:
+            self._load()[url] = {
+                'etag': etag,
+                'last_modified': last_modified,
+                'articles': articles,
+                'fetched_at': time.time()
+            }
+            try:
+                self._save()
+            except Exception as e:
+                print(f"保存RSS快照缓存失败: {e}")
+
+
+_feed_cache: Optional[FeedSnapshotCache] = None
+_feed_cache_lock = threading.Lock()
+
+
+def get_feed_cache() -> FeedSnapshotCache:
+    """获取进程内共享的RSS快照缓存"""
+    global _feed_cache
+    with _feed_cache_lock:
+        if _feed_cache is None:
+            _feed_cache = FeedSnapshotCache()
+        return _feed_cache
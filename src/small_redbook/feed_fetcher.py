@@ -0,0 +1,149 @@
+"""
+多RSS源并发获取
+每个源在独立线程中带超时获取（支持ETag/Last-Modified条件请求），
+全部完成或到达总时限后合并为一个文章列表，并按规范化链接去重；
+单个慢源超时后直接放弃，不会拖慢其他源
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+import feedparser
+import httpx
+from config import FEED_URLS, FEED_TIMEOUT, FEED_MAX_WORKERS, HTTP_CONNECT_TIMEOUT
+from feed_cache import get_feed_cache
+from http_client import get_http_client
+from url_utils import canonicalize_url
+
+
+def _default_author(feed, url: str) -> str:
+    """条目没有作者时，使用RSS源标题或域名"""
+    title = (getattr(feed.feed, 'title', '') or '').strip()
+    if title:
+        return title
+    return urlsplit(url).hostname or '机器之心'
+
+
+def parse_feed(content: bytes, url: str) -> List[Dict]:
+    """
+    解析RSS内容为统一格式的文章列表
+    :param content: RSS响应内容
+    :param url: RSS地址
+    :return: 文章列表
+    """
+    feed = feedparser.parse(content)
+    default_author = _default_author(feed, url)
+    articles = []
+    for entry in feed.entries:
+        title = (getattr(entry, 'title', '') or '').strip()
+        link = (getattr(entry, 'link', '') or '').strip()
+        if not title or not link:
+            continue
+        articles.append({
+            'title': title,
+            'link': link,
+            'summary': getattr(entry, 'summary', ''),
+            'published': getattr(entry, 'published', ''),
+            'author': getattr(entry, 'author', '') or default_author,
+            'feed': url
+        })
+    return articles
+
+
+def fetch_feed(url: str, timeout: float = FEED_TIMEOUT) -> Tuple[List[Dict], str]:
+    """
+    获取单个RSS源，RSS未更新（304）时直接使用本地快照
+    :param url: RSS地址
+    :param timeout: 单个请求的超时时间（秒）
+    :return: (文章列表, 状态说明)
+    """
+    feed_cache = get_feed_cache()
+    request_timeout = httpx.Timeout(timeout, connect=min(timeout, HTTP_CONNECT_TIMEOUT))
+    response = get_http_client().get(url, headers=feed_cache.conditional_headers(url), timeout=request_timeout)
+    if response.status_code == 304:
+        cached_articles = feed_cache.get_articles(url)
+        if cached_articles is not None:
+            return cached_articles, '未更新，使用快照'
+        # 快照丢失时重新完整下载
+        response = get_http_client().get(url, timeout=request_timeout)
+    response.raise_for_status()
+
+    articles = parse_feed(response.content, url)
+    feed_cache.store(
+        url,
+        articles,
+        etag=response.headers.get('ETag'),
+        last_modified=response.headers.get('Last-Modified')
+    )
+    return [dict(article) for article in articles], '已更新'
+
+
+def merge_articles(article_lists: List[List[Dict]]) -> List[Dict]:
+    """
+    合并多个源的文章，按规范化链接去重（保留先出现的）
+    :param article_lists: 按源顺序排列的文章列表
+    :return: 合并后的文章列表
+    """
+    merged = []
+    seen = set()
+    for articles in article_lists:
+        for article in articles:
+            key = canonicalize_url(article.get('link', ''))
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            merged.append(article)
+    return merged
+
+
+def fetch_all_feeds(urls: Optional[List[str]] = None, timeout: float = FEED_TIMEOUT,
+                    max_workers: int = FEED_MAX_WORKERS) -> List[Dict]:
+    """
+    并发获取所有RSS源并合并去重
+    :param urls: RSS地址列表，默认使用 FEED_URLS
+    :param timeout: 单个源的超时时间（秒），超时的源直接放弃
+    :param max_workers: 最大并发数
+    :return: 合并后的文章列表（按源的配置顺序）
+    """
+    urls = list(dict.fromkeys(urls or FEED_URLS))
+    if not urls:
+        print("未配置RSS源")
+        return []
+
+    start = time.monotonic()
+    latencies: Dict[str, float] = {}
+
+    def fetch(url: str) -> Tuple[List[Dict], str]:
+        feed_start = time.monotonic()
+        try:
+            return fetch_feed(url, timeout)
+        finally:
+            latencies[url] = time.monotonic() - feed_start
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(urls))))
+    try:
+        futures = {url: executor.submit(fetch, url) for url in urls}
+        # 任何一个源都不会超过总时限：到点后未完成的源直接放弃
+        wait(futures.values(), timeout=timeout)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    article_lists = []
+    for url, future in futures.items():
+        if not future.done():
+            print(f"RSS源 {url}: 超过 {timeout:g} 秒未完成，跳过")
+            continue
+        latency_ms = latencies.get(url, 0.0) * 1000
+        try:
+            articles, status = future.result()
+        except Exception as e:
+            print(f"RSS源 {url}: 获取失败（{latency_ms:.0f} ms）: {e}")
+            continue
+        print(f"RSS源 {url}: {len(articles)} 篇文章，{status}（{latency_ms:.0f} ms）")
+        article_lists.append(articles)
+
+    merged = merge_articles(article_lists)
+    total = sum(len(articles) for articles in article_lists)
+    print(f"共获取 {len(article_lists)}/{len(urls)} 个RSS源，{total} 篇文章，"
+          f"去重后 {len(merged)} 篇，耗时 {(time.monotonic() - start) * 1000:.0f} ms")
+    return merged
@@ -0,0 +1,199 @@
+"""
+文章热度评分
+关键词较多时预先编译成一个正则，每段文本只需扫描一次即可找出所有命中的关键词，适合对上万条文章批量评分；
+关键词较少时逐个 `in` 判断反而更快（见 benchmarks/bench_hot_score.py），此时不编译正则
+"""
+import re
+from typing import Dict, Iterable, List, Optional, Set
+from config import HOT_KEYWORDS, BOOST_KEYWORDS
+
+
+def parse_keyword_weights(spec: str) -> Dict[str, float]:
+    """
+    解析关键词配置
+    :param spec: 形如 "AI:1,大模型:1.5,芯片" 的字符串，省略权重时为1
+    :return: {关键词: 权重}
+    """
+    weights = {}
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        keyword, _, weight = item.rpartition(':') if ':' in item else (item, '', '')
+        try:
+            weights[keyword.strip()] = float(weight) if weight else 1
+        except ValueError:
+            # 关键词本身包含冒号
+            weights[item] = 1
+    return weights
+
+
+def _trie_pattern(keywords: List[str]) -> str:
+    """
+    把关键词构造成前缀树形式的正则，例如 ["数据", "数据集", "芯片"] -> (?:数据(?:集)?|芯片)
+    正则引擎在每个位置最多沿前缀树走一条路径，而不是逐个尝试所有关键词
+    """
+    trie: Dict = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node: Dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # 当前位置已经可以构成一个关键词时，后续部分可选（贪婪匹配优先取最长关键词）
+        return f'(?:{body})?' if '' in node else body
+
+    return build(trie)
+
+
+def _has_partial_overlap(keywords: List[str]) -> bool:
+    """是否存在一个关键词的后缀恰好是另一个关键词的前缀（如 "数据集" 与 "集成"）"""
+    for a in keywords:
+        for b in keywords:
+            if a == b or a in b or b in a:
+                continue
+            if any(b.startswith(a[i:]) for i in range(1, len(a))):
+                return True
+    return False
+
+
+class KeywordMatcher:
+    """
+    多关键词匹配器
+    关键词数量达到 REGEX_MIN_KEYWORDS 时，所有关键词合并为一个前缀树形式的正则，每个位置取最长的关键词，
+    命中时同时计入它包含的短关键词；只有关键词之间存在部分重叠时才使用前瞻匹配，保证结果与逐个 `in` 判断一致。
+    关键词较少时直接逐个 `in` 判断
+    """
+
+    # 基准测试中两种方式在50个关键词左右持平，更少时正则的额外开销得不偿失
+    REGEX_MIN_KEYWORDS = 50
+
+    def __init__(self, weights: Dict[str, float]):
+        self.weights = {keyword: weight for keyword, weight in weights.items() if keyword}
+        keywords = sorted(self.weights, key=len, reverse=True)
+        self._pattern: Optional[re.Pattern] = None
+        if len(keywords) >= self.REGEX_MIN_KEYWORDS:
+            pattern = _trie_pattern(keywords)
+            if _has_partial_overlap(keywords):
+                pattern = f'(?=({pattern}))'
+            self._pattern = re.compile(pattern)
+            # 每个关键词命中时，它包含的所有关键词也必然出现
+            self._implied = {keyword: [k for k in keywords if k in keyword] for keyword in keywords}
+
+    def find(self, text: str) -> Set[str]:
+        """
+        找出文本中出现的所有关键词
+        :param text: 待匹配文本
+        :return: 命中的关键词集合
+        """
+        found: Set[str] = set()
+        if not text:
+            return found
+        if self._pattern is None:
+            return {keyword for keyword in self.weights if keyword in text}
+        for keyword in self._pattern.findall(text):
+            if keyword not in found:
+                found.update(self._implied[keyword])
+        return found
+
+    def search(self, text: str) -> bool:
+        """文本中是否出现任意一个关键词"""
+        if not text:
+            return False
+        if self._pattern is None:
+            return any(keyword in text for keyword in self.weights)
+        return self._pattern.search(text) is not None
+
+    def score(self, text: str) -> float:
+        """命中关键词的权重之和（每个关键词只计一次）"""
+        if self._pattern is None:
+            total = 0
+            if text:
+                for keyword, weight in self.weights.items():
+                    if keyword in text:
+                        total += weight
+            return total
+        return sum(self.weights[keyword] for keyword in self.find(text))
+
+
+class HotScorer:
+    """根据标题、摘要中的关键词和长度估算文章热度"""
+
+    def __init__(self, keyword_weights: Optional[Dict[str, float]] = None,
+                 boost_words: Optional[Iterable[str]] = None,
+                 title_score: float = 15, summary_score: float = 8, boost_score: float = 10):
+        self.keywords = KeywordMatcher(
+            keyword_weights if keyword_weights is not None else parse_keyword_weights(HOT_KEYWORDS)
+        )
+        self.boost = KeywordMatcher(
+            {word: 1 for word in (boost_words if boost_words is not None else parse_keyword_weights(BOOST_KEYWORDS))}
+        )
+        self.title_score = title_score
+        self.summary_score = summary_score
+        self.boost_score = boost_score
+
+    def score(self, article: Dict) -> float:
+        """
+        计算单篇文章的热度
+        :param article: 文章信息
+        :return: 热度评分
+        """
+        score = 0
+        title = article.get('title', '')
+        summary = article.get('summary', '')
+
+        # 标题和摘要包含热门关键词加分
+        score += self.title_score * self.keywords.score(title)
+        score += self.summary_score * self.keywords.score(summary)
+
+        # 标题长度适中加分（标题过短或过长可能不够吸引人）
+        if 10 <= len(title) <= 50:
+            score += 5
+
+        # 包含"最新"、"发布"等词汇加分
+        if self.boost.search(title):
+            score += self.boost_score
+
+        # 内容长度加分
+        summary_length = len(summary)
+        if summary_length > 200:
+            score += 10
+        elif summary_length > 100:
+            score += 5
+
+        return score
+
+    def score_batch(self, articles: List[Dict]) -> List[float]:
+        """
+        批量计算文章热度
+        :param articles: 文章列表
+        :return: 与文章一一对应的热度评分
+        """
+        score = self.score
+        return [score(article) for article in articles]
+
+    def rank(self, articles: List[Dict]) -> List[Dict]:
+        """
+        按热度从高到低排序，热度相同时保持原顺序
+        :param articles: 文章列表
+        :return: 排序后的文章列表
+        """
+        scores = self.score_batch(articles)
+        order = sorted(range(len(articles)), key=scores.__getitem__, reverse=True)
+        return [articles[i] for i in order]
+
+
+_hot_scorer: Optional[HotScorer] = None
+
+
+def get_hot_scorer() -> HotScorer:
+    """获取按配置构建的热度评分器（只编译一次）"""
+    global _hot_scorer
+    if _hot_scorer is None:
+        _hot_scorer = HotScorer()
+    return _hot_scorer
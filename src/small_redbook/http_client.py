@@ -0,0 +1,82 @@
+"""
+共享HTTP客户端
+整个抓取层复用同一个httpx连接池，避免每次请求都重新建立TCP和TLS连接
+"""
+import atexit
+import threading
+from typing import Optional
+import httpx
+from config import (
+    HTTP_TIMEOUT, HTTP_CONNECT_TIMEOUT, HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS, HTTP_KEEPALIVE_EXPIRY, HTTP_ENABLE_HTTP2
+)
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36'
+}
+
+_http_client: Optional[httpx.Client] = None
+_http_client_lock = threading.Lock()
+
+
+def _http2_available() -> bool:
+    """检查是否安装了HTTP/2所需的h2包"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def create_http_client(timeout: float = HTTP_TIMEOUT,
+                       connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+                       max_connections: int = HTTP_MAX_CONNECTIONS,
+                       max_keepalive_connections: int = HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                       keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY,
+                       http2: bool = HTTP_ENABLE_HTTP2) -> httpx.Client:
+    """
+    创建带连接池的HTTP客户端
+    :param timeout: 读写超时时间（秒）
+    :param connect_timeout: 建立连接的超时时间（秒）
+    :param max_connections: 连接池最大连接数
+    :param max_keepalive_connections: 最多保持的空闲连接数
+    :param keepalive_expiry: 空闲连接保持时间（秒）
+    :param http2: 是否启用HTTP/2
+    :return: httpx客户端
+    """
+    if http2 and not _http2_available():
+        print("未安装h2，HTTP/2已禁用（可通过 pip install httpx[http2] 安装）")
+        http2 = False
+
+    return httpx.Client(
+        headers=DEFAULT_HEADERS,
+        timeout=httpx.Timeout(timeout, connect=connect_timeout),
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        ),
+        http2=http2,
+        follow_redirects=True
+    )
+
+
+def get_http_client() -> httpx.Client:
+    """获取进程内共享的HTTP客户端（线程安全）"""
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None or _http_client.is_closed:
+            _http_client = create_http_client()
+        return _http_client
+
+
+def close_http_client():
+    """关闭共享的HTTP客户端"""
+    global _http_client
+    with _http_client_lock:
+        client, _http_client = _http_client, None
+    if client is not None:
+        client.close()
+
+
+atexit.register(close_http_client)
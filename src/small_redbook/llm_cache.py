@@ -0,0 +1,113 @@
+"""
+大模型响应缓存
+以模型名、温度和消息内容的哈希为键，把解析后的文案持久化到SQLite。
+重新执行同一天的任务时（例如修复保存逻辑后重跑），提示词完全相同的文章直接使用缓存，不再重复计费
+"""
+import hashlib
+import json
+import sqlite3
+import time
+from typing import Dict, List, Optional
+from config import LLM_CACHE_PATH, LLM_CACHE_TTL_HOURS, LLM_CACHE_MAX_MB, LLM_CACHE_BYPASS
+from sqlite_store import SQLiteStore, evict_oldest, shared_instance
+
+
+def llm_cache_key(model: str, temperature: float, messages: List[Dict], n: int = 1) -> str:
+    """
+    计算缓存键
+    :param model: 模型名称
+    :param temperature: 采样温度
+    :param messages: 发送给模型的消息
+    :param n: 一次生成的文案变体数（为1时与旧的缓存键一致）
+    :return: 十六进制哈希值
+    """
+    key = {'model': model, 'temperature': temperature, 'messages': messages}
+    if n != 1:
+        key['n'] = n
+    payload = json.dumps(key, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMResponseCache(SQLiteStore):
+    """基于SQLite的大模型响应缓存，支持过期时间、按大小淘汰、强制重新生成和命中统计"""
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS llm_responses (
+            key TEXT PRIMARY KEY,
+            model TEXT NOT NULL,
+            response TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_llm_responses_created_at ON llm_responses (created_at)",
+    )
+
+    def __init__(self, path: str = LLM_CACHE_PATH, ttl_hours: float = LLM_CACHE_TTL_HOURS,
+                 max_mb: float = LLM_CACHE_MAX_MB, bypass: bool = LLM_CACHE_BYPASS):
+        super().__init__(path)
+        self.ttl = ttl_hours * 3600
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        # 为True时不读取缓存（强制重新生成），生成结果仍会写入缓存
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        查询缓存
+        :param key: llm_cache_key 计算的缓存键
+        :return: 缓存的文案，未命中、已过期或强制重新生成时返回None
+        """
+        if self.bypass:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT response, created_at FROM llm_responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or time.time() - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, model: str, response: Dict):
+        """
+        写入缓存
+        :param key: 缓存键
+        :param model: 模型名称
+        :param response: 解析后的文案
+        """
+        value = json.dumps(response, ensure_ascii=False)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, model, response, size, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, model, value, len(value.encode('utf-8')), time.time())
+            )
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection):
+        """删除过期条目，总大小超过上限时按写入时间淘汰最早的条目"""
+        conn.execute("DELETE FROM llm_responses WHERE created_at < ?", (time.time() - self.ttl,))
+        evicted = evict_oldest(conn, 'llm_responses', 'key', 'created_at', self.max_bytes)
+        if evicted:
+            print(f"大模型响应缓存超出大小上限，淘汰 {evicted} 条")
+
+    def stats(self) -> str:
+        """命中统计"""
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return f"大模型响应缓存: 命中 {self.hits} 次，未命中 {self.misses} 次，命中率 {rate:.0f}%"
+
+_shared_llm_cache = shared_instance(LLMResponseCache)
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """获取进程内共享的大模型响应缓存"""
+    return _shared_llm_cache()
@@ -0,0 +1,206 @@
+"""
+共享大模型客户端
+所有生成路径（各Agent的ChatOpenAI和copy_generator的OpenAI客户端）复用同一个带连接池的httpx传输层，
+连续调用时直接使用已建立的TLS连接，而不是每个Agent、每次调用各自新建客户端；
+限流和重试由挂在这个传输层上的 llm_scheduler 统一处理，SDK自身不再重试
+"""
+import asyncio
+import atexit
+import threading
+import weakref
+from typing import Dict, Optional, Tuple
+import httpx
+from langchain_openai import ChatOpenAI
+from openai import AsyncOpenAI, OpenAI
+from config import (
+    DASHSCOPE_API_KEY, AI_MODEL_NAME, BATCH_BASE_URL, LLM_BASE_URL, LLM_TEMPERATURE, LLM_MAX_TOKENS, LLM_TIMEOUT,
+    LLM_CONNECT_TIMEOUT, LLM_MAX_CONNECTIONS, LLM_MAX_KEEPALIVE_CONNECTIONS, LLM_KEEPALIVE_EXPIRY
+)
+from llm_scheduler import AsyncSchedulingTransport, SchedulingTransport, get_llm_scheduler
+
+_lock = threading.Lock()
+_http_client: Optional[httpx.Client] = None
+_openai_clients: Dict[str, OpenAI] = {}
+_batch_clients: Dict[str, OpenAI] = {}
+# 键为 (模型名, 接口地址, 温度, 最大生成token数)
+_chat_models: Dict[Tuple[str, str, float, int], ChatOpenAI] = {}
+# httpx.AsyncClient的连接绑定在创建它的事件循环上，每个事件循环各用一个客户端和对应的ChatOpenAI实例
+_async_http_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = \
+    weakref.WeakKeyDictionary()
+_loop_chat_models: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, str, float, int], ChatOpenAI]]" = \
+    weakref.WeakKeyDictionary()
+_loop_openai_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, AsyncOpenAI]]" = \
+    weakref.WeakKeyDictionary()
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY
+    )
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def get_llm_http_client() -> httpx.Client:
+    """获取大模型调用共享的同步httpx客户端"""
+    global _http_client
+    with _lock:
+        if _http_client is None or _http_client.is_closed:
+            transport = SchedulingTransport(httpx.HTTPTransport(limits=_limits()), get_llm_scheduler())
+            _http_client = httpx.Client(timeout=_timeout(), transport=transport)
+        return _http_client
+
+
+def get_llm_async_http_client() -> Optional[httpx.AsyncClient]:
+    """
+    获取当前事件循环共享的异步httpx客户端
+    :return: 异步客户端，不在事件循环中时返回None
+    """
+    loop = _running_loop()
+    if loop is None:
+        return None
+    with _lock:
+        client = _async_http_clients.get(loop)
+        if client is None or client.is_closed:
+            transport = AsyncSchedulingTransport(httpx.AsyncHTTPTransport(limits=_limits()), get_llm_scheduler())
+            client = httpx.AsyncClient(timeout=_timeout(), transport=transport)
+            _async_http_clients[loop] = client
+        return client
+
+
+async def aclose_llm_async_client():
+    """关闭当前事件循环的异步客户端，应在 asyncio.run 结束前调用"""
+    loop = _running_loop()
+    if loop is None:
+        return
+    with _lock:
+        client = _async_http_clients.pop(loop, None)
+        _loop_chat_models.pop(loop, None)
+        _loop_openai_clients.pop(loop, None)
+    if client is not None:
+        await client.aclose()
+
+
+def get_chat_model(temperature: float = LLM_TEMPERATURE, max_tokens: int = LLM_MAX_TOKENS,
+                   model: str = AI_MODEL_NAME, base_url: str = LLM_BASE_URL) -> ChatOpenAI:
+    """
+    获取共享的ChatOpenAI实例
+    在事件循环中调用时返回绑定该循环异步客户端的实例，异步调用同样复用连接
+    :param temperature: 采样温度
+    :param max_tokens: 最大生成token数
+    :param model: 模型名称（模型路由切换到备用模型时使用）
+    :param base_url: 接口地址
+    :return: ChatOpenAI
+    """
+    loop = _running_loop()
+    http_client = get_llm_http_client()
+    async_client = get_llm_async_http_client()
+    key = (model, base_url, temperature, max_tokens)
+    with _lock:
+        models = _chat_models if loop is None else _loop_chat_models.setdefault(loop, {})
+        chat_model = models.get(key)
+        if chat_model is None:
+            chat_model = ChatOpenAI(
+                base_url=base_url,
+                api_key=DASHSCOPE_API_KEY,
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                timeout=LLM_TIMEOUT,
+                max_retries=0,
+                http_client=http_client,
+                http_async_client=async_client
+            )
+            models[key] = chat_model
+        return chat_model
+
+
+def get_openai_client(base_url: str = LLM_BASE_URL) -> OpenAI:
+    """获取共享的OpenAI客户端（copy_generator使用）"""
+    http_client = get_llm_http_client()
+    with _lock:
+        client = _openai_clients.get(base_url)
+        if client is None:
+            client = OpenAI(
+                base_url=base_url,
+                api_key=DASHSCOPE_API_KEY,
+                timeout=LLM_TIMEOUT,
+                max_retries=0,
+                http_client=http_client
+            )
+            _openai_clients[base_url] = client
+        return client
+
+
+def get_batch_client(base_url: str = BATCH_BASE_URL) -> OpenAI:
+    """
+    获取批处理使用的OpenAI客户端
+    上传、提交、查询和下载不经过 llm_scheduler，不占用交互调用的RPM/TPM额度和重试预算；
+    客户端本身不重试，避免上传或提交失败重试后重复执行，可安全重试的GET请求由调用方按次指定重试
+    :param base_url: Batch接口地址
+    :return: OpenAI
+    """
+    with _lock:
+        client = _batch_clients.get(base_url)
+        if client is None:
+            client = OpenAI(
+                base_url=base_url,
+                api_key=DASHSCOPE_API_KEY,
+                timeout=LLM_TIMEOUT,
+                max_retries=0,
+                http_client=httpx.Client(timeout=_timeout(), limits=_limits())
+            )
+            _batch_clients[base_url] = client
+        return client
+
+
+def get_async_openai_client(base_url: str = LLM_BASE_URL) -> AsyncOpenAI:
+    """
+    获取当前事件循环共享的异步OpenAI客户端，只能在事件循环中调用
+    :param base_url: 接口地址
+    :return: AsyncOpenAI
+    """
+    loop = asyncio.get_running_loop()
+    http_client = get_llm_async_http_client()
+    with _lock:
+        clients = _loop_openai_clients.setdefault(loop, {})
+        client = clients.get(base_url)
+        if client is None:
+            client = AsyncOpenAI(
+                base_url=base_url,
+                api_key=DASHSCOPE_API_KEY,
+                timeout=LLM_TIMEOUT,
+                max_retries=0,
+                http_client=http_client
+            )
+            clients[base_url] = client
+        return client
+
+
+def close_llm_clients():
+    """关闭共享的大模型客户端"""
+    global _http_client
+    with _lock:
+        client, _http_client = _http_client, None
+        batch_clients = list(_batch_clients.values())
+        _openai_clients.clear()
+        _batch_clients.clear()
+        _chat_models.clear()
+    if client is not None:
+        client.close()
+    for batch_client in batch_clients:
+        batch_client.close()
+
+
+atexit.register(close_llm_clients)
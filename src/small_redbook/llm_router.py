@@ -0,0 +1,299 @@
+"""
+模型路由与对冲请求
+按顺序配置多个模型（及其接口地址），第一个为主模型：
+- 主模型超过延迟目标（LLM_HEDGE_AFTER）仍未返回时，向下一个模型发送一个对冲请求，先返回的结果胜出，另一个请求立即取消
+- 某个模型的请求失败（调度器重试之后仍失败）时，立即改用下一个模型
+- 记录每条路由的延迟，输出p50/p95/p99，便于调整延迟目标和模型顺序
+对冲和取消基于asyncio实现；同步调用在配置了多条路由时在临时事件循环中执行，只有一条路由时直接调用。
+流式调用以收到首个分片为准：异步流式调用同样对冲和切换路由，先返回首个分片的路由胜出；
+同步流式调用只在收到首个分片前失败时改用下一条路由，不发送对冲请求。流式调用的延迟统计记录首个分片的等待时间
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Iterator, List, Optional
+from urllib.parse import urlsplit
+import openai
+from config import (
+    AI_MODEL_NAME, LLM_BASE_URL, LLM_TEMPERATURE, LLM_MAX_TOKENS, LLM_ROUTES, LLM_HEDGE_AFTER, LLM_LATENCY_WINDOW
+)
+from llm_client import aclose_llm_async_client, get_chat_model
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    最近秩法计算分位数
+    :param values: 已排序的数值
+    :param q: 分位（0到100）
+    :return: 分位数，没有数值时为0
+    """
+    if not values:
+        return 0.0
+    rank = max(1, int(-(-q * len(values) // 100)))
+    return values[min(rank, len(values)) - 1]
+
+
+class Route:
+    """一条模型路由及其延迟统计"""
+
+    def __init__(self, model: str, base_url: str = LLM_BASE_URL, window: int = LLM_LATENCY_WINDOW):
+        self.model = model
+        self.base_url = base_url
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.completed = 0
+        self.hedges = 0
+        self.failures = 0
+        self.cancelled = 0
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return f"{self.model}@{urlsplit(self.base_url).hostname or self.base_url}"
+
+    @property
+    def cache_name(self) -> str:
+        """用于缓存键的路由标识，默认接口地址上只写模型名（与旧的缓存键一致）"""
+        return self.model if self.base_url == LLM_BASE_URL else f"{self.model}@{self.base_url}"
+
+    def chat_model(self, temperature: float = LLM_TEMPERATURE, max_tokens: int = LLM_MAX_TOKENS):
+        """该路由的共享ChatOpenAI实例（在事件循环中调用时绑定当前循环的连接池）"""
+        return get_chat_model(temperature, max_tokens, model=self.model, base_url=self.base_url)
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.latencies.append(seconds)
+            self.completed += 1
+
+    def count(self, field: str):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def stats(self) -> str:
+        with self._lock:
+            values = sorted(self.latencies)
+            completed, hedges, failures, cancelled = self.completed, self.hedges, self.failures, self.cancelled
+        return (f"{self.name}: 完成 {completed} 次，p50 {percentile(values, 50):.1f}s / p95 {percentile(values, 95):.1f}s / "
+                f"p99 {percentile(values, 99):.1f}s，对冲 {hedges} 次，失败 {failures} 次，被取消 {cancelled} 次")
+
+
+def parse_routes(specs: List[str]) -> List[Route]:
+    """
+    解析路由配置
+    :param specs: 每项为 模型名 或 模型名@接口地址
+    :return: 路由列表，配置为空时只包含 AI_MODEL_NAME
+    """
+    routes = []
+    for spec in specs:
+        model, _, base_url = spec.strip().partition('@')
+        if model.strip():
+            routes.append(Route(model.strip(), base_url.strip() or LLM_BASE_URL))
+    return routes or [Route(AI_MODEL_NAME)]
+
+
+def _should_fall_back(error: Exception) -> bool:
+    """请求错误（如参数不被支持）换一个模型通常同样失败，交给调用方处理；其余错误改用下一条路由"""
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code >= 500 or error.status_code in (408, 429)
+    return True
+
+
+class LLMRouter:
+    """按顺序尝试多条模型路由，主模型慢时发送对冲请求"""
+
+    def __init__(self, routes: Optional[List[Route]] = None, hedge_after: float = LLM_HEDGE_AFTER):
+        self.routes = routes or parse_routes(LLM_ROUTES)
+        self.hedge_after = hedge_after
+
+    @property
+    def cache_model(self) -> str:
+        """
+        缓存键使用的模型标识
+        对冲和切换路由时结果可能来自任意一条路由，因此由完整的路由列表决定；只有默认路由时即 AI_MODEL_NAME
+        """
+        return '|'.join(route.cache_name for route in self.routes)
+
+    async def _timed(self, route: Route, call: Callable[[Route], Awaitable[Any]]) -> Any:
+        start = time.perf_counter()
+        try:
+            result = await call(route)
+        except asyncio.CancelledError:
+            route.count('cancelled')
+            raise
+        except Exception:
+            route.count('failures')
+            raise
+        route.record(time.perf_counter() - start)
+        return result
+
+    async def ainvoke(self, call: Callable[[Route], Awaitable[Any]],
+                      release: Optional[Callable[[Any], Awaitable[Any]]] = None) -> Any:
+        """
+        异步调用，按需对冲和切换路由
+        :param call: call(路由) 返回该路由上的一次调用
+        :param release: 结果持有连接时（如流式响应），用于关闭同时完成但落选的结果
+        :return: 最先成功的结果
+        """
+        running: Dict[asyncio.Task, Route] = {}
+        next_index = 0
+        last_error: Optional[Exception] = None
+
+        def launch():
+            nonlocal next_index
+            route = self.routes[next_index]
+            next_index += 1
+            running[asyncio.ensure_future(self._timed(route, call))] = route
+
+        launch()
+        try:
+            while running:
+                can_hedge = self.hedge_after > 0 and next_index < len(self.routes) and len(running) == 1
+                done, _ = await asyncio.wait(
+                    running, timeout=self.hedge_after if can_hedge else None, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    slow = next(iter(running.values()))
+                    print(f"{slow.name} 超过 {self.hedge_after:g} 秒未返回，向 {self.routes[next_index].name} 发送对冲请求")
+                    self.routes[next_index].count('hedges')
+                    launch()
+                    continue
+                for task in done:
+                    route = running.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        if running:
+                            print(f"{route.name} 先返回，取消其他请求")
+                        return task.result()
+                    last_error = error
+                    if not _should_fall_back(error):
+                        raise error
+                    if not running and next_index < len(self.routes):
+                        print(f"{route.name} 调用失败，改用 {self.routes[next_index].name}: {error}")
+                        launch()
+            raise last_error
+        finally:
+            # 输掉的请求立即取消，关闭其连接，不再继续生成
+            for task in running:
+                task.cancel()
+            if running:
+                results = await asyncio.gather(*running, return_exceptions=True)
+                if release is not None:
+                    for result in results:
+                        if not isinstance(result, BaseException):
+                            await release(result)
+
+    async def _ainvoke_and_close(self, call: Callable[[Route], Awaitable[Any]]) -> Any:
+        try:
+            return await self.ainvoke(call)
+        finally:
+            await aclose_llm_async_client()
+
+    def invoke(self, sync_call: Callable[[Route], Any], async_call: Callable[[Route], Awaitable[Any]]) -> Any:
+        """
+        同步调用
+        只有一条路由时直接调用 sync_call（复用同步连接池）；有多条路由时在临时事件循环中执行 async_call 以便对冲和取消
+        :param sync_call: sync_call(路由) 执行一次同步调用
+        :param async_call: async_call(路由) 返回一次异步调用
+        :return: 最先成功的结果
+        """
+        if len(self.routes) == 1:
+            route = self.routes[0]
+            start = time.perf_counter()
+            try:
+                result = sync_call(route)
+            except Exception:
+                route.count('failures')
+                raise
+            route.record(time.perf_counter() - start)
+            return result
+        return asyncio.run(self._ainvoke_and_close(async_call))
+
+    def invoke_messages(self, messages: List[Dict], max_tokens: int = LLM_MAX_TOKENS,
+                        wrap: Optional[Callable] = None) -> Any:
+        """
+        用ChatOpenAI同步调用消息
+        :param messages: 消息列表
+        :param max_tokens: 最大生成token数
+        :param wrap: 对ChatOpenAI的包装，例如 with_structured_output
+        :return: 模型返回
+        """
+        def runnable(route: Route):
+            chat_model = route.chat_model(max_tokens=max_tokens)
+            return wrap(chat_model) if wrap else chat_model
+        return self.invoke(lambda route: runnable(route).invoke(messages),
+                           lambda route: runnable(route).ainvoke(messages))
+
+    async def ainvoke_messages(self, messages: List[Dict], max_tokens: int = LLM_MAX_TOKENS,
+                               wrap: Optional[Callable] = None) -> Any:
+        """用ChatOpenAI异步调用消息，参数同 invoke_messages"""
+        def runnable(route: Route):
+            chat_model = route.chat_model(max_tokens=max_tokens)
+            return wrap(chat_model) if wrap else chat_model
+        return await self.ainvoke(lambda route: runnable(route).ainvoke(messages))
+
+    def stream_messages(self, messages: List[Dict], max_tokens: int = LLM_MAX_TOKENS) -> Iterator:
+        """
+        用ChatOpenAI同步流式调用消息，收到首个分片前失败时改用下一条路由
+        :param messages: 消息列表
+        :param max_tokens: 最大生成token数
+        :return: 分片迭代器，关闭即断开流式响应
+        """
+        for index, route in enumerate(self.routes):
+            start = time.perf_counter()
+            stream = route.chat_model(max_tokens=max_tokens).stream(messages)
+            try:
+                first = next(stream, None)
+            except Exception as e:
+                stream.close()
+                route.count('failures')
+                if not _should_fall_back(e) or index + 1 >= len(self.routes):
+                    raise
+                print(f"{route.name} 调用失败，改用 {self.routes[index + 1].name}: {e}")
+                continue
+            route.record(time.perf_counter() - start)
+            break
+        try:
+            if first is not None:
+                yield first
+                yield from stream
+        finally:
+            stream.close()
+
+    async def astream_messages(self, messages: List[Dict], max_tokens: int = LLM_MAX_TOKENS) -> AsyncIterator:
+        """用ChatOpenAI异步流式调用消息，先返回首个分片的路由胜出，参数同 stream_messages"""
+        async def first_chunk(route: Route):
+            stream = route.chat_model(max_tokens=max_tokens).astream(messages)
+            try:
+                return stream, await stream.__anext__()
+            except StopAsyncIteration:
+                return stream, None
+            except BaseException:
+                # 包括对冲落选被取消的情况
+                await stream.aclose()
+                raise
+
+        stream, first = await self.ainvoke(first_chunk, release=lambda result: result[0].aclose())
+        try:
+            if first is not None:
+                yield first
+                async for chunk in stream:
+                    yield chunk
+        finally:
+            await stream.aclose()
+
+    def stats(self) -> str:
+        """各路由的延迟分位数和对冲统计"""
+        return "模型路由延迟统计:\n" + "\n".join(f"  {route.stats()}" for route in self.routes)
+
+
+_llm_router: Optional[LLMRouter] = None
+_llm_router_lock = threading.Lock()
+
+
+def get_llm_router() -> LLMRouter:
+    """获取进程内共享的模型路由"""
+    global _llm_router
+    with _llm_router_lock:
+        if _llm_router is None:
+            _llm_router = LLMRouter()
+        return _llm_router
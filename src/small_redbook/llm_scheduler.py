@@ -0,0 +1,257 @@
+"""
+大模型请求调度
+所有大模型请求（各Agent的ChatOpenAI、copy_generator的OpenAI客户端，同步、异步和流式）都经过共享httpx客户端，
+调度器以httpx传输层的形式挂在这个客户端上，因此每条生成路径都受同一套限制：
+- 每分钟请求数（RPM）和每分钟token数（TPM）两个令牌桶，发送前预留额度，超出时等待而不是被服务端限流
+- 429和临时性5xx、连接错误按带抖动的指数退避重试，服务端返回Retry-After时按其等待，并让所有请求一起暂停
+- 单次任务的重试总次数有上限，服务端持续故障时尽快失败，不会无限拖长任务
+SDK自身的重试因此关闭（max_retries=0），避免两层重试叠加
+"""
+import asyncio
+import email.utils
+import json
+import random
+import threading
+import time
+from typing import Optional
+import httpx
+from config import (
+    LLM_RPM, LLM_TPM, LLM_MAX_RETRIES, LLM_RETRY_BUDGET, LLM_BACKOFF_BASE, LLM_BACKOFF_MAX, LLM_RETRY_AFTER_MAX
+)
+from prompt_budget import count_message_tokens
+
+# 可以重试的HTTP状态码
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """按分钟补充的令牌桶，预留额度后返回需要等待的时间（额度可以预支为负数，后来者按顺序排队）"""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def reserve(self, amount: float, now: float) -> float:
+        """
+        预留额度（调用方负责加锁）
+        :param amount: 需要的额度，超过桶容量时按容量计算，保证单个大请求也能发出
+        :param now: 当前时间（time.monotonic）
+        :return: 需要等待的秒数
+        """
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= min(amount, self.capacity)
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """
+    解析Retry-After（或retry-after-ms）响应头
+    :param response: 服务端响应
+    :return: 需要等待的秒数，没有或无法解析时返回None
+    """
+    value = response.headers.get('retry-after-ms')
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = response.headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def request_tokens(request: httpx.Request) -> int:
+    """
+    估算请求占用的TPM额度：提示词token数加上max_tokens（与服务端按最大生成长度预估的计费方式一致）
+    :param request: 发往大模型的请求
+    :return: token数，不是对话补全请求时为0
+    """
+    if request.method != 'POST' or not request.url.path.endswith('/chat/completions'):
+        return 0
+    try:
+        body = json.loads(request.content)
+    except (ValueError, httpx.RequestNotRead):
+        return 0
+    completion = body.get('max_completion_tokens') or body.get('max_tokens') or 0
+    # n个候选各自最多生成 max_tokens
+    return count_message_tokens(body.get('messages') or []) + int(completion) * int(body.get('n') or 1)
+
+
+class LLMScheduler:
+    """大模型请求的限流、重试和统计，同步与异步请求共用同一套额度"""
+
+    def __init__(self, rpm: float = LLM_RPM, tpm: float = LLM_TPM, max_retries: int = LLM_MAX_RETRIES,
+                 retry_budget: int = LLM_RETRY_BUDGET, backoff_base: float = LLM_BACKOFF_BASE,
+                 backoff_max: float = LLM_BACKOFF_MAX, retry_after_max: float = LLM_RETRY_AFTER_MAX):
+        self.requests_bucket = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens_bucket = TokenBucket(tpm) if tpm > 0 else None
+        self.max_retries = max(0, max_retries)
+        self.retry_budget = max(0, retry_budget)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_after_max = retry_after_max
+        self._lock = threading.Lock()
+        # 收到Retry-After后所有请求暂停到该时间（time.monotonic）
+        self._paused_until = 0.0
+        self.start_run()
+
+    def start_run(self):
+        """开始新一次任务：重置重试预算和统计"""
+        with self._lock:
+            self.retries_left = self.retry_budget
+            self.requests = 0
+            self.retries = 0
+            self.throttled = 0
+            self.failures = 0
+            self.waited = 0.0
+
+    def acquire(self, tokens: int) -> float:
+        """
+        为一次请求预留RPM和TPM额度
+        :param tokens: 请求占用的token数
+        :return: 发送前需要等待的秒数
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._paused_until - now)
+            if self.requests_bucket is not None:
+                wait = max(wait, self.requests_bucket.reserve(1, now))
+            if self.tokens_bucket is not None and tokens:
+                wait = max(wait, self.tokens_bucket.reserve(tokens, now))
+            self.requests += 1
+            self.waited += wait
+        return wait
+
+    def retry_delay(self, attempt: int, response: Optional[httpx.Response] = None,
+                    error: Optional[Exception] = None) -> Optional[float]:
+        """
+        判断失败的请求是否重试
+        :param attempt: 已重试次数
+        :param response: 服务端响应（连接错误时为None）
+        :param error: 连接错误
+        :return: 重试前等待的秒数，不重试时返回None
+        """
+        reason = f"HTTP {response.status_code}" if response is not None else type(error).__name__
+        with self._lock:
+            if response is not None and response.status_code == 429:
+                self.throttled += 1
+            if attempt >= self.max_retries:
+                self.failures += 1
+                print(f"大模型请求失败（{reason}），已重试 {attempt} 次，放弃")
+                return None
+            if self.retries_left <= 0:
+                self.failures += 1
+                print(f"大模型请求失败（{reason}），本次任务的重试预算已用完，放弃")
+                return None
+            self.retries_left -= 1
+            self.retries += 1
+
+            retry_after = retry_after_seconds(response) if response is not None else None
+            if retry_after is not None:
+                delay = min(retry_after, self.retry_after_max)
+                # 限流针对整个账号，其他请求也一起等待
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            else:
+                # 完全抖动（full jitter）的指数退避，避免并发请求同时重试
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+            self.waited += delay
+        print(f"大模型请求失败（{reason}），{delay:.1f} 秒后第 {attempt + 1} 次重试")
+        return delay
+
+    def stats(self) -> str:
+        """本次任务的调度统计"""
+        with self._lock:
+            return (f"大模型请求调度: 请求 {self.requests} 次，重试 {self.retries} 次（其中限流 {self.throttled} 次），"
+                    f"放弃 {self.failures} 次，剩余重试预算 {self.retries_left}，累计等待 {self.waited:.1f} 秒")
+
+
+class SchedulingTransport(httpx.BaseTransport):
+    """在同步httpx传输层上执行限流和重试"""
+
+    def __init__(self, transport: httpx.BaseTransport, scheduler: 'LLMScheduler'):
+        self.transport = transport
+        self.scheduler = scheduler
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        tokens = request_tokens(request)
+        attempt = 0
+        while True:
+            wait = self.scheduler.acquire(tokens)
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                response = self.transport.handle_request(request)
+            except httpx.TransportError as e:
+                delay = self.scheduler.retry_delay(attempt, error=e)
+                if delay is None:
+                    raise
+            else:
+                if response.status_code not in RETRYABLE_STATUS:
+                    return response
+                delay = self.scheduler.retry_delay(attempt, response=response)
+                if delay is None:
+                    return response
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncSchedulingTransport(httpx.AsyncBaseTransport):
+    """在异步httpx传输层上执行限流和重试，等待时不阻塞事件循环"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, scheduler: 'LLMScheduler'):
+        self.transport = transport
+        self.scheduler = scheduler
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        tokens = request_tokens(request)
+        attempt = 0
+        while True:
+            wait = self.scheduler.acquire(tokens)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                response = await self.transport.handle_async_request(request)
+            except httpx.TransportError as e:
+                delay = self.scheduler.retry_delay(attempt, error=e)
+                if delay is None:
+                    raise
+            else:
+                if response.status_code not in RETRYABLE_STATUS:
+                    return response
+                delay = self.scheduler.retry_delay(attempt, response=response)
+                if delay is None:
+                    return response
+                await response.aclose()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+_llm_scheduler: Optional[LLMScheduler] = None
+_llm_scheduler_lock = threading.Lock()
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    """获取进程内共享的大模型请求调度器"""
+    global _llm_scheduler
+    with _llm_scheduler_lock:
+        if _llm_scheduler is None:
+            _llm_scheduler = LLMScheduler()
+        return _llm_scheduler
@@ -11,10 +11,22 @@ def main():
     parser = argparse.ArgumentParser(description='小红书文案生成器')
     parser.add_argument('--once', action='store_true', help='立即执行一次任务')
     parser.add_argument('--mcp', action='store_true', help='启用MCP模式')
+    parser.add_argument('--regenerate', action='store_true', help='忽略大模型响应缓存，强制重新生成文案')
+    parser.add_argument('--batch', action='store_true', help='通过Batch接口离线批量生成文案，中断后重新运行可继续')
+    parser.add_argument('--batch-input', metavar='PATH', help='批处理模式下需要回填的文章文件（JSON或JSONL），默认从RSS获取')
     
     args = parser.parse_args()
     
-    if args.once:
+    if args.regenerate:
+        # 在导入config之前设置，缓存不再读取但仍会写入新结果
+        os.environ["LLM_CACHE_BYPASS"] = "true"
+    
+    if args.batch:
+        # 离线批量生成文案
+        from agents.main_agent import MainAgent
+        agent = MainAgent()
+        agent.run_batch(args.batch_input)
+    elif args.once:
         # 立即执行一次任务
         from agents.main_agent import MainAgent
         agent = MainAgent()
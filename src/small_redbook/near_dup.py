@@ -0,0 +1,273 @@
+"""
+近似重复文章检测
+RSS中同一事件常有转载、跟进和翻译等多个版本，逐篇调用大模型会生成几乎相同的文案。
+对标题+摘要以及抓取到的正文计算MinHash签名，估计的Jaccard相似度超过阈值即视为同一簇，
+每簇只保留热度最高的一篇；已生成过文案的文章签名持久化到SQLite中的LSH分段索引，
+跨天的转载同样会被识别，查询只需按分段桶键命中少量候选，不随索引规模增长而变慢
+"""
+import hashlib
+import re
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+from config import NEAR_DUP_INDEX_PATH, NEAR_DUP_THRESHOLD
+from sqlite_store import SQLiteStore, shared_instance
+
+# MinHash签名长度，以及LSH分段：16段×每段4个值，Jaccard相似度约0.5以上的文章会落入同一桶
+NUM_PERM = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+
+# 英文单词、数字和单个汉字作为词元
+_TOKEN_PATTERN = re.compile(r'[a-z0-9]+|[\u4e00-\u9fff]')
+_HTML_TAG_PATTERN = re.compile(r'<[^>]+>')
+
+# 空桶稠密化时按距离加上的偏移，保证借来的值与原值不会冲突
+_EMPTY_BIN_OFFSET = (1 << 64) // NUM_PERM + 1
+
+
+def _hash64(value: str) -> int:
+    # 签名需要跨进程稳定，不能使用受 PYTHONHASHSEED 影响的内置hash
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def shingles(text: str) -> Set[str]:
+    """
+    把文本切成相邻两个词元组成的片段
+    :param text: 文本（可包含HTML标签）
+    :return: 片段集合
+    """
+    tokens = _TOKEN_PATTERN.findall(_HTML_TAG_PATTERN.sub(' ', text or '').lower())
+    if len(tokens) < 2:
+        return set(tokens)
+    return {a + ' ' + b for a, b in zip(tokens, tokens[1:])}
+
+
+def minhash(text: str) -> Tuple[int, ...]:
+    """
+    计算文本的MinHash签名
+    使用单哈希分桶（one permutation hashing）：每个片段只计算一次哈希，按哈希值分到 NUM_PERM 个桶中取最小值，
+    空桶从右侧最近的非空桶借值，比逐个排列计算快一个数量级
+    :param text: 文本
+    :return: 长度为 NUM_PERM 的签名，文本为空时返回空元组
+    """
+    features = shingles(text)
+    if not features:
+        return ()
+    bins: List[Optional[int]] = [None] * NUM_PERM
+    for feature in features:
+        value = _hash64(feature)
+        index, rest = value % NUM_PERM, value // NUM_PERM
+        current = bins[index]
+        if current is None or rest < current:
+            bins[index] = rest
+
+    signature = list(bins)
+    for index in range(NUM_PERM):
+        if bins[index] is None:
+            distance = 1
+            while bins[(index + distance) % NUM_PERM] is None:
+                distance += 1
+            signature[index] = bins[(index + distance) % NUM_PERM] + distance * _EMPTY_BIN_OFFSET
+    return tuple(signature)
+
+
+def similarity(a: Sequence[int], b: Sequence[int]) -> float:
+    """
+    根据两个签名估计Jaccard相似度
+    :return: 0到1之间的相似度
+    """
+    if not a or not b:
+        return 0.0
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+def band_keys(signature: Sequence[int]) -> List[int]:
+    """
+    签名各段的桶键
+    :param signature: MinHash签名
+    :return: 长度为 BANDS 的列表，每个键为有符号64位整数（可直接存入SQLite）
+    """
+    keys = []
+    for band in range(BANDS):
+        chunk = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(','.join(map(str, chunk)).encode('ascii'), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'little', signed=True))
+    return keys
+
+
+def _pack(signature: Sequence[int]) -> str:
+    return ','.join(map(str, signature))
+
+
+def _unpack(value: str) -> Tuple[int, ...]:
+    return tuple(int(x) for x in value.split(',')) if value else ()
+
+
+def summary_text(article: Dict) -> str:
+    """用于检测近似重复的标题+摘要文本"""
+    return f"{article.get('title', '')} {article.get('summary', '')}"
+
+
+def content_text(article: Dict) -> str:
+    """用于检测近似重复的正文文本"""
+    return article.get('content', '') or ''
+
+
+class MinHashLSH:
+    """内存中的MinHash分段索引，用于单次任务内的聚类"""
+
+    def __init__(self, threshold: float = NEAR_DUP_THRESHOLD):
+        self.threshold = threshold
+        self._buckets: Dict[Tuple[int, int], List[Tuple[Tuple[int, ...], object]]] = {}
+
+    def add(self, signature: Tuple[int, ...], item):
+        for band, key in enumerate(band_keys(signature)):
+            self._buckets.setdefault((band, key), []).append((signature, item))
+
+    def query(self, signature: Tuple[int, ...]) -> Optional[Tuple[object, float]]:
+        """
+        查找最相似的近似重复项
+        :param signature: MinHash签名
+        :return: (条目, 相似度)，没有时返回None
+        """
+        best = None
+        for band, key in enumerate(band_keys(signature)):
+            for other, item in self._buckets.get((band, key), ()):
+                score = similarity(signature, other)
+                if score >= self.threshold and (best is None or score > best[1]):
+                    best = (item, score)
+        return best
+
+
+class NearDuplicateIndex(SQLiteStore):
+    """基于SQLite的持久化MinHash分段索引，记录已生成过文案的文章签名"""
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS near_dup_signatures (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            signature TEXT NOT NULL,
+            link TEXT,
+            title TEXT,
+            added_at REAL NOT NULL
+        )
+        """,
+        # 每个签名按段各存一行，(kind, band, band_key) 上的索引保证查询只命中同桶的少量候选
+        """
+        CREATE TABLE IF NOT EXISTS near_dup_bands (
+            kind TEXT NOT NULL,
+            band INTEGER NOT NULL,
+            band_key INTEGER NOT NULL,
+            signature_id INTEGER NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_near_dup_bands ON near_dup_bands (kind, band, band_key)",
+    )
+
+    def __init__(self, path: str = NEAR_DUP_INDEX_PATH, threshold: float = NEAR_DUP_THRESHOLD):
+        super().__init__(path)
+        self.threshold = threshold
+
+    def query(self, kind: str, signature: Tuple[int, ...]) -> Optional[Tuple[str, float]]:
+        """
+        查找已处理过的近似重复文章
+        :param kind: 签名类型，summary 或 content
+        :param signature: MinHash签名
+        :return: (已处理文章的标题, 相似度)，没有时返回None
+        """
+        if not signature:
+            return None
+        best = None
+        with self._lock:
+            conn = self._connect()
+            candidates = set()
+            for band, key in enumerate(band_keys(signature)):
+                rows = conn.execute(
+                    "SELECT signature_id FROM near_dup_bands WHERE kind = ? AND band = ? AND band_key = ?",
+                    (kind, band, key)
+                ).fetchall()
+                candidates.update(row[0] for row in rows)
+            for signature_id in candidates:
+                other, title = conn.execute(
+                    "SELECT signature, title FROM near_dup_signatures WHERE id = ?", (signature_id,)
+                ).fetchone()
+                score = similarity(signature, _unpack(other))
+                if score >= self.threshold and (best is None or score > best[1]):
+                    best = (title, score)
+        return best
+
+    def add(self, kind: str, signature: Tuple[int, ...], link: str = '', title: str = ''):
+        """
+        写入签名
+        :param kind: 签名类型，summary 或 content
+        :param signature: MinHash签名
+        :param link: 文章链接
+        :param title: 文章标题
+        """
+        if not signature:
+            return
+        with self._lock:
+            conn = self._connect()
+            cursor = conn.execute(
+                "INSERT INTO near_dup_signatures (kind, signature, link, title, added_at) VALUES (?, ?, ?, ?, ?)",
+                (kind, _pack(signature), link, title, time.time())
+            )
+            conn.executemany(
+                "INSERT INTO near_dup_bands (kind, band, band_key, signature_id) VALUES (?, ?, ?, ?)",
+                [(kind, band, key, cursor.lastrowid) for band, key in enumerate(band_keys(signature))]
+            )
+            conn.commit()
+
+    def add_article(self, article: Dict):
+        """
+        记录已生成文案的文章的标题+摘要签名和正文签名
+        :param article: 文章信息
+        """
+        link, title = article.get('link', ''), article.get('title', '')
+        self.add('summary', minhash(summary_text(article)), link, title)
+        self.add('content', minhash(content_text(article)), link, title)
+
+
+def drop_near_duplicates(articles: List[Dict], kind: str, text_func: Callable[[Dict], str],
+                         index: Optional[NearDuplicateIndex] = None,
+                         threshold: float = NEAR_DUP_THRESHOLD) -> List[Dict]:
+    """
+    对按热度排好序的文章做近似重复聚类，每簇只保留最靠前（热度最高）的一篇，
+    并跳过与已生成过文案的文章近似重复的文章
+    :param articles: 按热度从高到低排序的文章列表
+    :param kind: 签名类型，summary 或 content
+    :param text_func: 从文章中取出用于计算签名的文本
+    :param index: 持久化索引，为None时只做本次任务内的聚类
+    :param threshold: 视为近似重复的最小相似度
+    :return: 去重后的文章列表（保持原顺序）
+    """
+    start = time.perf_counter()
+    clusters = MinHashLSH(threshold)
+    kept = []
+    for article in articles:
+        signature = minhash(text_func(article))
+        if signature:
+            match = clusters.query(signature)
+            if match is not None:
+                representative, score = match
+                print(f"近似重复（相似度 {score:.2f}）: {article.get('title', '')} -> 保留 {representative.get('title', '')}")
+                continue
+            if index is not None:
+                processed = index.query(kind, signature)
+                if processed is not None:
+                    print(f"与已处理文章近似重复（相似度 {processed[1]:.2f}），跳过: {article.get('title', '')} ~ {processed[0]}")
+                    continue
+            clusters.add(signature, article)
+        kept.append(article)
+    print(f"近似重复检测（{kind}）: {len(articles)} 篇 -> {len(kept)} 篇，"
+          f"耗时 {(time.perf_counter() - start) * 1000:.1f} ms")
+    return kept
+
+
+_shared_near_dup_index = shared_instance(NearDuplicateIndex)
+
+
+def get_near_dup_index() -> NearDuplicateIndex:
+    """获取进程内共享的近似重复索引"""
+    return _shared_near_dup_index()
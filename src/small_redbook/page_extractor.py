@@ -0,0 +1,154 @@
+"""
+Playwright页面内容提取
+选择器匹配、div兜底、噪声过滤和标签提取全部在页面内的一段JavaScript中完成，
+每个页面只需一次 page.evaluate 往返，而不是对每个元素分别调用 inner_text()
+"""
+from typing import Dict, List, Optional
+from browser_pool import load_article_page
+from config import SELECTOR_CACHE_ENABLED
+from extractor import CONTENT_SELECTORS
+from selector_cache import get_selector_cache, host_of
+
+# 在页面内执行的提取脚本，返回 {title, content, source, tags}
+PAGE_EXTRACT_SCRIPT = """
+({selectors, keywords}) => {
+    const noisy = (text) => text.includes('登录') || text.includes('会员');
+    const listLike = (text) => text.includes('今天') || text.includes('08月');
+    const textOf = (el) => (el.innerText || '').trim();
+
+    // 1. 按选择器依次查找正文区域
+    let content = '';
+    let source = '';
+    for (const selector of selectors) {
+        let elements;
+        try {
+            elements = document.querySelectorAll(selector);
+        } catch (e) {
+            continue;
+        }
+        if (!elements.length) {
+            continue;
+        }
+        let full = '';
+        for (const el of elements) {
+            const text = textOf(el);
+            // 过滤掉太短的内容、登录提示和推荐列表
+            if (text.length > 100 && !noisy(text) && !listLike(text)) {
+                full += text + '\\n\\n';
+            }
+        }
+        if (full.length > content.length) {
+            content = full;
+            source = selector;
+            if (content.length > 500) {
+                break;
+            }
+        }
+    }
+
+    // 2. 没找到足够长的正文时，查找包含文章主要内容的div
+    if (content.length < 500) {
+        for (const div of document.querySelectorAll('div')) {
+            // textContent不触发排版，先用它过滤掉明显太短的div
+            if ((div.textContent || '').length <= 1000) {
+                continue;
+            }
+            const text = textOf(div);
+            if (text.length > 1000 && !noisy(text) && keywords.some((k) => text.includes(k))
+                    && !listLike(text.slice(0, 500))) {
+                content = text;
+                source = 'div';
+                break;
+            }
+        }
+    }
+
+    // 3. 提取标签，找不到时从页面末尾的 #话题 行中提取
+    const tags = new Set();
+    for (const el of document.querySelectorAll('.tag, .tags, [class*="tag"], a[href*="tag"]')) {
+        const text = textOf(el);
+        if (text.length > 1 && text.length < 30 && !text.includes('#')) {
+            tags.add(text);
+        }
+    }
+    if (!tags.size && document.body) {
+        const lines = document.body.innerText.split('\\n').slice(-20);
+        for (const line of lines) {
+            const text = line.trim();
+            if (text.startsWith('#') && text.length < 30) {
+                tags.add(text);
+            }
+        }
+    }
+
+    return {title: document.title, content, source, tags: Array.from(tags).slice(0, 10)};
+}
+"""
+
+# div兜底时正文需要包含的关键词
+ARTICLE_KEYWORDS = ["AI", "人工智能", "模型", "芯片", "数据"]
+
+
+def extract_article_from_page(page, selectors: Optional[List[str]] = None) -> Dict:
+    """
+    在已加载的页面中一次性提取正文和标签
+    :param page: Playwright页面
+    :param selectors: 正文选择器，默认使用 CONTENT_SELECTORS
+    :return: {'title', 'content', 'source', 'tags'}
+    """
+    return page.evaluate(PAGE_EXTRACT_SCRIPT, {
+        'selectors': selectors or CONTENT_SELECTORS,
+        'keywords': ARTICLE_KEYWORDS
+    })
+
+
+def _record_selector(host: str, remembered: Optional[str], source: str, length: int):
+    """根据页面内级联的结果更新站点选择器缓存（div兜底不计入）"""
+    selector_cache = get_selector_cache()
+    accepted = source in CONTENT_SELECTORS and length >= 300
+    if remembered and (not accepted or source != remembered):
+        selector_cache.record_failure(host, remembered)
+    if accepted:
+        selector_cache.record_success(host, source, validated=remembered is None or source != remembered)
+
+
+def extract_with_page(page, url: str) -> Dict:
+    """
+    在浏览器池提供的页面中打开文章并提取内容
+    :param page: Playwright页面
+    :param url: 文章链接
+    :return: 文章详细内容
+    """
+    # 站点记住的选择器排在最前面，页面内的级联会先尝试它
+    host = host_of(url) if SELECTOR_CACHE_ENABLED else ''
+    remembered = get_selector_cache().lookup(host) if host else None
+    selectors = [remembered] + [s for s in CONTENT_SELECTORS if s != remembered] if remembered else CONTENT_SELECTORS
+
+    # 访问页面并等待正文加载（等待策略由 PLAYWRIGHT_FETCH_MODE 配置）
+    response = load_article_page(page, url, ', '.join(selectors))
+
+    if not response or response.status != 200:
+        print(f"访问页面失败，状态码: {response.status if response else 'None'}")
+        return {}
+
+    result = extract_article_from_page(page, selectors)
+    content = result.get('content') or ''
+    tags = result.get('tags') or []
+    source = result.get('source') or ''
+    print(f"页面标题: {result.get('title', '')}")
+    if source:
+        print(f"通过 {source} 提取到内容，长度: {len(content)}")
+    if host:
+        _record_selector(host, remembered, source, len(content))
+    print(f"提取到标签: {tags}")
+    print(f"最终提取到的内容长度: {len(content)}")
+
+    # 如果内容太短，认为获取失败
+    if len(content) < 300:
+        print("内容太短，认为获取失败")
+        return {'content': '', 'tags': []}
+
+    return {
+        'content': content[:8000],  # 限制内容长度为8000字符
+        'tags': tags
+    }
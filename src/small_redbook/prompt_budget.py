@@ -0,0 +1,274 @@
+"""
+提示词token预算
+文章正文按token而不是字符截断：先切分句子并按信息量打分，在预算内优先保留信息量高的句子
+（去掉"点击关注"、版权声明等套话），再按原文顺序拼成摘录，同样的token花费覆盖更多关键内容。
+token数优先使用本地的tiktoken计算，未安装或编码文件不可用时按字符类型估算
+"""
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from config import PROMPT_CONTENT_TOKENS, PROMPT_TOKENIZER
+from hot_score import get_hot_scorer
+
+_HTML_TAG_PATTERN = re.compile(r'<[^>]+>')
+# 句子在句末标点、中文逗号、英文句号（后跟空白）或换行处切分，标点保留在句子中；
+# 长段落因此可以按分句挑选，而不是整段放不进预算
+_SENTENCE_PATTERN = re.compile(r'[^\n]+?(?:[。！？!?；;，]+|\.(?=\s)|$)', re.M)
+# 用于打分的词项：英文单词、数字和相邻两个汉字
+_WORD_PATTERN = re.compile(r'[a-z][a-z0-9\-]*|[0-9][0-9.%]*|[\u4e00-\u9fff]+')
+_CJK_PATTERN = re.compile(r'[\u4e00-\u9fff\u3040-\u30ff\uac00-\ud7af]')
+_ASCII_WORD_PATTERN = re.compile(r'[A-Za-z0-9]+')
+_URL_PATTERN = re.compile(r'https?://|www\.', re.I)
+# 公众号文章常见的套话，命中的句子不进入摘录
+_BOILERPLATE_PATTERN = re.compile(
+    r'点击.{0,6}(关注|阅读原文|蓝字)|扫码|二维码|转载请|未经授权|版权(归|所有|声明)|免责声明|'
+    r'原标题|责任编辑|编辑[:：]|来源[:：]|作者[:：]|投稿|商务合作|联系我们|星标|置顶|点赞|在看|分享给'
+)
+# 信息量较高的开头几句的加权
+_LEAD_BONUS = (1.3, 1.2, 1.1)
+# 短于该字数的句子不单独进入摘录
+_MIN_SENTENCE_CHARS = 6
+
+_encoder = None
+_encoder_name: Optional[str] = None
+_encoder_lock = threading.Lock()
+
+
+def _get_encoder():
+    """加载tiktoken编码，失败时只提示一次并改用估算"""
+    global _encoder, _encoder_name
+    with _encoder_lock:
+        if _encoder_name is None:
+            _encoder_name = 'heuristic'
+            if PROMPT_TOKENIZER != 'heuristic':
+                try:
+                    import tiktoken
+                    _encoder = tiktoken.get_encoding(PROMPT_TOKENIZER)
+                    _encoder_name = PROMPT_TOKENIZER
+                except ImportError:
+                    print("未安装tiktoken，按字符类型估算token数")
+                except Exception as e:
+                    print(f"无法加载tiktoken编码 {PROMPT_TOKENIZER}，按字符类型估算token数: {type(e).__name__}")
+        return _encoder
+
+
+def tokenizer_name() -> str:
+    """当前使用的分词方式（tiktoken编码名或 heuristic）"""
+    _get_encoder()
+    return _encoder_name
+
+
+def count_tokens(text: str) -> int:
+    """
+    计算文本的token数
+    :param text: 文本
+    :return: token数；估算时每个中日韩字符计1，英文和数字约4个字符计1，其他符号各计1
+    """
+    if not text:
+        return 0
+    encoder = _get_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    cjk = len(_CJK_PATTERN.findall(text))
+    words = _ASCII_WORD_PATTERN.findall(text)
+    ascii_tokens = sum(math.ceil(len(word) / 4) for word in words)
+    others = len(text) - cjk - sum(len(word) for word in words) - sum(1 for char in text if char.isspace())
+    return cjk + ascii_tokens + max(0, others)
+
+
+def count_message_tokens(messages: List[Dict]) -> int:
+    """
+    计算消息列表的token数（每条消息另加角色等固定开销）
+    :param messages: 消息列表
+    :return: token数
+    """
+    return sum(count_tokens(message.get('content') or '') + 4 for message in messages) + 2
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """
+    截取文本开头不超过 budget 个token的部分
+    :param text: 文本
+    :param budget: token数上限
+    :return: 截取后的文本
+    """
+    if budget <= 0:
+        return ''
+    encoder = _get_encoder()
+    if encoder is not None:
+        tokens = encoder.encode(text, disallowed_special=())
+        return text if len(tokens) <= budget else encoder.decode(tokens[:budget])
+    # 估算时token数随长度单调增加，二分查找最长的前缀
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(text[:middle]) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low]
+
+
+def _join_sentences(sentences: List[str], chosen: List[int]) -> str:
+    """按原文顺序拼接选中的句子，原文中相邻的分句接在同一行，不相邻的句子换行"""
+    text = ''
+    previous = None
+    for i in chosen:
+        if previous is None:
+            text = sentences[i]
+        elif previous == i - 1 and sentences[previous].endswith('，'):
+            text += sentences[i]
+        elif previous == i - 1 and sentences[previous].endswith('.'):
+            text += ' ' + sentences[i]
+        else:
+            text += '\n' + sentences[i]
+        previous = i
+    return text
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    切分句子
+    :param text: 正文（可包含HTML标签）
+    :return: 去掉首尾空白后的非空句子
+    """
+    text = _HTML_TAG_PATTERN.sub('\n', text or '')
+    sentences = (match.group(0).strip() for match in _SENTENCE_PATTERN.finditer(text))
+    return [sentence for sentence in sentences if sentence]
+
+
+def _terms(text: str) -> List[str]:
+    terms = []
+    for word in _WORD_PATTERN.findall(text.lower()):
+        if '\u4e00' <= word[0] <= '\u9fff':
+            terms.extend(word[i:i + 2] for i in range(max(1, len(word) - 1)))
+        else:
+            terms.append(word)
+    return terms
+
+
+def score_sentences(title: str, sentences: List[str]) -> List[float]:
+    """
+    按信息量给句子打分
+    词项在全文中出现得越多（文章主题）、与标题重合越多、命中热门关键词、位置越靠前，分数越高；
+    套话、链接和过短的句子为0分
+    :param title: 文章标题
+    :param sentences: 句子列表
+    :return: 与句子一一对应的分数
+    """
+    sentence_terms = [_terms(sentence) for sentence in sentences]
+    frequency = Counter(term for terms in sentence_terms for term in set(terms))
+    title_terms = set(_terms(title or ''))
+    keywords = get_hot_scorer().keywords
+    scores = []
+    lead = 0
+    for sentence, terms in zip(sentences, sentence_terms):
+        if (len(sentence) < _MIN_SENTENCE_CHARS or not terms
+                or _URL_PATTERN.search(sentence) or _BOILERPLATE_PATTERN.search(sentence)):
+            scores.append(0.0)
+            continue
+        unique = set(terms)
+        # 只出现一次的词项不代表主题，log(1) = 0
+        topic = sum(math.log(frequency[term]) for term in unique)
+        title_overlap = len(unique & title_terms)
+        score = (topic + 2 * title_overlap + 3 * keywords.score(sentence)) / math.sqrt(len(terms))
+        if lead < len(_LEAD_BONUS):
+            score *= _LEAD_BONUS[lead]
+        lead += 1
+        scores.append(score)
+    return scores
+
+
+class Excerpt:
+    """预算内的正文摘录及其统计"""
+
+    def __init__(self, text: str, tokens: int, source_tokens: int, kept: int, total: int):
+        self.text = text
+        self.tokens = tokens
+        self.source_tokens = source_tokens
+        self.kept = kept
+        self.total = total
+
+    @property
+    def truncated(self) -> bool:
+        return self.tokens < self.source_tokens
+
+    def describe(self) -> str:
+        if not self.truncated:
+            return f"正文 {self.source_tokens} tokens，全部保留"
+        return f"正文 {self.source_tokens} tokens -> 摘录 {self.tokens} tokens（保留 {self.kept}/{self.total} 句）"
+
+
+def build_excerpt(title: str, content: str, budget: int = PROMPT_CONTENT_TOKENS) -> Excerpt:
+    """
+    在token预算内构造信息量最高的正文摘录
+    按分数从高到低选入句子，放不下的句子跳过、继续尝试更短的句子，最后按原文顺序拼接；
+    一句都放不下时截取分数最高的句子
+    :param title: 文章标题
+    :param content: 文章正文
+    :param budget: 正文的token预算（0表示不限制）
+    :return: 摘录
+    """
+    sentences = split_sentences(content)
+    costs = [count_tokens(sentence) for sentence in sentences]
+    source_tokens = sum(costs)
+    if budget <= 0 or source_tokens <= budget:
+        chosen = list(range(len(sentences)))
+        return Excerpt(_join_sentences(sentences, chosen), source_tokens, source_tokens, len(sentences), len(sentences))
+
+    scores = score_sentences(title, sentences)
+    order = sorted((i for i in range(len(sentences)) if scores[i] > 0), key=lambda i: -scores[i])
+    chosen: List[int] = []
+    used = 0
+    for i in order:
+        if used + costs[i] <= budget:
+            chosen.append(i)
+            used += costs[i]
+    if not chosen and sentences:
+        # 没有一句放得进预算（例如不分句的超长段落），截取分数最高的句子（都为0分时取第一句），不让正文为空
+        best = max(range(len(sentences)), key=lambda i: (scores[i], -i))
+        text = truncate_to_tokens(sentences[best], budget)
+        tokens = count_tokens(text)
+        return Excerpt(text, tokens, source_tokens, 1, len(sentences))
+    chosen.sort()
+    return Excerpt(_join_sentences(sentences, chosen), used, source_tokens, len(chosen), len(sentences))
+
+
+_excerpts: Dict[Tuple[str, str, int], Excerpt] = {}
+_excerpts_lock = threading.Lock()
+
+
+def article_excerpt(article_info: Dict, budget: int = PROMPT_CONTENT_TOKENS) -> Excerpt:
+    """
+    获取文章的正文摘录（同一篇文章重复构造提示词时复用，例如补全字段或切换输出格式）
+    :param article_info: 文章信息
+    :param budget: 正文的token预算
+    :return: 摘录
+    """
+    key = (article_info.get('title', ''), article_info.get('content', ''), budget)
+    with _excerpts_lock:
+        excerpt = _excerpts.get(key)
+    if excerpt is None:
+        excerpt = build_excerpt(key[0], key[1], budget)
+        with _excerpts_lock:
+            # 只保留最近的少量文章，避免长时间运行时占用内存
+            if len(_excerpts) >= 64:
+                _excerpts.clear()
+            _excerpts[key] = excerpt
+    return excerpt
+
+
+def report_prompt_tokens(article_info: Dict, messages: List[Dict]) -> int:
+    """
+    输出单篇文章提示词的token数，便于按成本和质量调整预算
+    :param article_info: 文章信息
+    :param messages: 发送给模型的消息
+    :return: 提示词token数
+    """
+    tokens = count_message_tokens(messages)
+    excerpt = article_excerpt(article_info)
+    print(f"提示词 {tokens} tokens（{tokenizer_name()}，正文预算 {PROMPT_CONTENT_TOKENS}）: "
+          f"{excerpt.describe()} - {article_info.get('title', '')[:30]}")
+    return tokens
@@ -0,0 +1,134 @@
+"""
+按站点记忆正文选择器
+同一站点的文章几乎总是由同一个选择器提取成功，记住它之后优先尝试，
+只有记住的选择器失效或到了定期复核时才运行完整的选择器级联
+"""
+import time
+from typing import Optional
+from urllib.parse import urlsplit
+from config import SELECTOR_CACHE_PATH, SELECTOR_REVALIDATE_EVERY
+from sqlite_store import SQLiteStore, shared_instance
+
+
+def host_of(url: str) -> str:
+    """
+    获取用于记忆选择器的站点名
+    :param url: 文章链接
+    :return: 小写域名，无法解析时为空字符串
+    """
+    return (urlsplit(url or '').hostname or '').lower()
+
+
+class SelectorCache(SQLiteStore):
+    """基于SQLite的站点选择器缓存，记录每个站点成功的选择器及其成功、失败次数"""
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS host_selectors (
+            host TEXT PRIMARY KEY,
+            selector TEXT NOT NULL,
+            successes INTEGER NOT NULL,
+            failures INTEGER NOT NULL,
+            uses_since_validation INTEGER NOT NULL,
+            validated_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+        """,
+    )
+
+    def __init__(self, path: str = SELECTOR_CACHE_PATH, revalidate_every: int = SELECTOR_REVALIDATE_EVERY):
+        super().__init__(path)
+        self.revalidate_every = max(0, revalidate_every)
+
+    def lookup(self, host: str) -> Optional[str]:
+        """
+        查询站点记住的选择器
+        到了定期复核的时候返回None，让调用方运行完整级联并重新记录结果；
+        复核计数在此时即重置，无论级联是否成功，之后的页面都继续使用记住的选择器直到下次复核
+        :param host: 站点名
+        :return: 选择器，没有记录或需要复核时返回None
+        """
+        if not host:
+            return None
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT selector, uses_since_validation FROM host_selectors WHERE host = ?", (host,)
+            ).fetchone()
+            if row is None:
+                return None
+            selector, uses = row
+            if not (self.revalidate_every and uses >= self.revalidate_every):
+                return selector
+            # 在锁内记录复核，并发的其他页面不会重复复核
+            now = time.time()
+            conn.execute(
+                "UPDATE host_selectors SET uses_since_validation = 0, validated_at = ?, updated_at = ? "
+                "WHERE host = ?",
+                (now, now, host)
+            )
+            conn.commit()
+        print(f"站点 {host} 的选择器已使用 {uses} 次，重新运行完整选择器级联进行复核")
+        return None
+
+    def record_success(self, host: str, selector: str, validated: bool = False):
+        """
+        记录选择器提取成功
+        :param host: 站点名
+        :param selector: 提取成功的选择器
+        :param validated: 是否由完整级联选出（此时重置复核计数）
+        """
+        if not host or not selector:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT selector FROM host_selectors WHERE host = ?", (host,)
+            ).fetchone()
+            if row is None or row[0] != selector:
+                if row is not None:
+                    print(f"站点 {host} 的正文选择器由 {row[0]} 更新为 {selector}")
+                conn.execute(
+                    "INSERT OR REPLACE INTO host_selectors "
+                    "(host, selector, successes, failures, uses_since_validation, validated_at, updated_at) "
+                    "VALUES (?, ?, 1, 0, 0, ?, ?)",
+                    (host, selector, now, now)
+                )
+            elif validated:
+                conn.execute(
+                    "UPDATE host_selectors SET successes = successes + 1, uses_since_validation = 0, "
+                    "validated_at = ?, updated_at = ? WHERE host = ?",
+                    (now, now, host)
+                )
+            else:
+                conn.execute(
+                    "UPDATE host_selectors SET successes = successes + 1, "
+                    "uses_since_validation = uses_since_validation + 1, updated_at = ? WHERE host = ?",
+                    (now, host)
+                )
+            conn.commit()
+
+    def record_failure(self, host: str, selector: str):
+        """
+        记录记住的选择器没有提取到合格正文
+        :param host: 站点名
+        :param selector: 失败的选择器
+        """
+        if not host or not selector:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "UPDATE host_selectors SET failures = failures + 1, updated_at = ? "
+                "WHERE host = ? AND selector = ?",
+                (time.time(), host, selector)
+            )
+            conn.commit()
+
+_shared_selector_cache = shared_instance(SelectorCache)
+
+
+def get_selector_cache() -> SelectorCache:
+    """获取进程内共享的站点选择器缓存"""
+    return _shared_selector_cache()
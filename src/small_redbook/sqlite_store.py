@@ -0,0 +1,86 @@
+"""
+SQLite持久化的公共部分
+内容缓存、已处理文章索引、选择器缓存、近似重复索引和大模型响应缓存都是单个SQLite文件加一把进程内的锁：
+- SQLiteStore: 首次使用时建立连接（WAL模式）并建表，提供 close()
+- evict_oldest: 总大小超过上限时按写入时间淘汰最早的条目
+- shared_instance: 生成线程安全的 get_x() 访问函数，进程内共享同一个实例
+"""
+import os
+import sqlite3
+import threading
+from typing import Callable, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
+
+
+class SQLiteStore:
+    """
+    单个SQLite文件的存储，子类在 SCHEMA 中声明建表和建索引语句
+    访问连接时需持有 self._lock
+    """
+
+    SCHEMA: Tuple[str, ...] = ()
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            for statement in self.SCHEMA:
+                self._conn.execute(statement)
+            self._conn.commit()
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def evict_oldest(conn: sqlite3.Connection, table: str, key_column: str, time_column: str, max_bytes: int) -> int:
+    """
+    总大小（size 列之和）超过上限时，按写入时间从早到晚删除条目，直到不超过上限
+    :param conn: 数据库连接（调用方持有锁并负责提交）
+    :param table: 表名
+    :param key_column: 主键列
+    :param time_column: 写入时间列
+    :param max_bytes: 大小上限
+    :return: 淘汰的条目数
+    """
+    total = conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {table}").fetchone()[0]
+    if total <= max_bytes:
+        return 0
+    evicted = []
+    for key, size in conn.execute(f"SELECT {key_column}, size FROM {table} ORDER BY {time_column}"):
+        if total <= max_bytes:
+            break
+        evicted.append((key,))
+        total -= size
+    conn.executemany(f"DELETE FROM {table} WHERE {key_column} = ?", evicted)
+    return len(evicted)
+
+
+def shared_instance(factory: Callable[[], T]) -> Callable[[], T]:
+    """
+    生成进程内共享实例的访问函数，首次调用时创建
+    :param factory: 创建实例的函数
+    :return: 访问函数
+    """
+    lock = threading.Lock()
+    instance: list = []
+
+    def get() -> T:
+        with lock:
+            if not instance:
+                instance.append(factory())
+            return instance[0]
+
+    return get
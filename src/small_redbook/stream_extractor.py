@@ -0,0 +1,222 @@
+"""
+流式下载与提前结束
+边下载边用增量HTML解析器查找正文容器，容器闭合或正文达到字数上限后，只再读取紧随其后的标签列表即停止读取，
+超长页面（大量评论、推荐内容）不再需要完整下载；已读取的HTML仍交给 extractor.extract_article 提取正文和标签
+"""
+import codecs
+import re
+from html.parser import HTMLParser
+from typing import List, Optional
+from config import FETCH_MAX_BYTES, FETCH_TAG_SCAN_BYTES
+from http_client import get_http_client
+
+# 正文容器的class（与 extractor.CONTENT_SELECTORS 对应）
+CONTAINER_CLASSES = {'article-content', 'content-wrapper', 'article-body', 'post-content', 'entry-content'}
+
+# 容器内忽略文本的标签
+NOISE_TAGS = {'script', 'style', 'noscript', 'template', 'nav', 'header', 'footer', 'aside', 'iframe', 'svg'}
+
+# 没有闭合标签的元素
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source', 'track', 'wbr'}
+
+TAG_CLASS_PATTERN = re.compile(r'tag|category', re.I)
+
+# 正文最多保留的字符数
+MAX_CONTENT_CHARS = 8000
+
+# 容器内文本至少达到该长度才认为是正文
+MIN_CONTENT_CHARS = 300
+
+
+def is_acceptable_content(text: str) -> bool:
+    """与选择器提取相同的过滤规则：足够长，且不是登录提示或推荐列表"""
+    return len(text) >= MIN_CONTENT_CHARS and "登录" not in text and "会员" not in text \
+        and "今天" not in text and "08月" not in text
+
+
+class StreamingArticleParser(HTMLParser):
+    """
+    增量解析HTML，进入正文容器后收集文本，容器闭合或字数达到上限时标记正文完成；
+    之后只继续查找标签链接，标签所在的元素闭合后标记全部完成
+    """
+
+    def __init__(self, max_chars: int = MAX_CONTENT_CHARS):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        # 未闭合元素的标签名；结束标签弹出到与之匹配的元素，省略了结束标签的 <p>、<li> 等随之闭合
+        self.stack: List[str] = []
+        # 以下均为对应元素在 stack 中的位置
+        self.article_index: Optional[int] = None
+        self.container_index: Optional[int] = None
+        self.noise_index: Optional[int] = None
+        self.tag_anchor_index: Optional[int] = None
+        # 最近一个标签链接的父元素，闭合时说明标签列表已结束
+        self.tag_group_index: Optional[int] = None
+        self.parts: List[str] = []
+        self.length = 0
+        self.tag_parts: List[str] = []
+        self.tags: List[str] = []
+        # 正文是否已完整读取
+        self.done = False
+        # 正文之后的标签是否也已读取
+        self.tags_done = False
+
+    @property
+    def content(self) -> str:
+        return ''.join(self.parts).strip()
+
+    @property
+    def finished(self) -> bool:
+        """正文和标签都已读取，可以停止下载"""
+        return self.done and self.tags_done
+
+    def _is_container(self, tag: str, classes: List[str]) -> bool:
+        if CONTAINER_CLASSES.intersection(classes):
+            return True
+        # 对应选择器 'article .content'
+        return self.article_index is not None and 'content' in classes
+
+    def handle_starttag(self, tag, attrs):
+        if self.finished or tag in VOID_TAGS:
+            return
+        index = len(self.stack)
+        self.stack.append(tag)
+        attributes = dict(attrs)
+        classes = (attributes.get('class') or '').split()
+
+        if not self.done:
+            if tag == 'article' and self.article_index is None:
+                self.article_index = index
+            if self.container_index is None:
+                if self._is_container(tag, classes):
+                    self.container_index = index
+            elif tag in NOISE_TAGS and self.noise_index is None:
+                self.noise_index = index
+        if tag == 'a' and self.tag_anchor_index is None and \
+                (any(TAG_CLASS_PATTERN.search(c) for c in classes) or attributes.get('rel') == 'tag'):
+            self.tag_anchor_index = index
+            self.tag_group_index = index - 1 if index > 0 else None
+            self.tag_parts = []
+
+    def handle_startendtag(self, tag, attrs):
+        # <br/> 等自闭合标签不影响层级
+        pass
+
+    def handle_endtag(self, tag):
+        if self.finished or tag in VOID_TAGS:
+            return
+        # 没有匹配的开始标签（多余的结束标签）时忽略
+        for index in range(len(self.stack) - 1, -1, -1):
+            if self.stack[index] == tag:
+                break
+        else:
+            return
+        # 从内到外依次闭合，包括省略了结束标签的元素
+        while len(self.stack) > index:
+            self._close(len(self.stack) - 1)
+            self.stack.pop()
+
+    def _close(self, index: int):
+        if self.tag_anchor_index == index:
+            self._add_tag(''.join(self.tag_parts))
+            self.tag_anchor_index = None
+        if self.tag_group_index == index:
+            self.tag_group_index = None
+            if self.done and self.tags:
+                self.tags_done = True
+        if self.noise_index == index:
+            self.noise_index = None
+        if self.article_index == index:
+            self.article_index = None
+        if self.container_index == index and not self.done:
+            # 正文容器已闭合
+            self._finish_container()
+
+    def handle_data(self, data):
+        if self.finished:
+            return
+        if self.tag_anchor_index is not None:
+            self.tag_parts.append(data)
+        if not self.done and self.container_index is not None and self.noise_index is None:
+            self.parts.append(data)
+            self.length += len(data)
+            if self.length >= self.max_chars:
+                self._finish_container()
+
+    def _finish_container(self):
+        """容器闭合或字数达到上限时检查内容，不合格则丢弃并继续查找下一个容器"""
+        if is_acceptable_content(self.content):
+            self.done = True
+            self.container_index = None
+            self.noise_index = None
+            # 标签列表出现在正文之前且已结束时无需继续读取
+            if self.tags and self.tag_anchor_index is None and self.tag_group_index is None:
+                self.tags_done = True
+        else:
+            self.parts = []
+            self.length = 0
+            self.container_index = None
+            self.noise_index = None
+
+    def _add_tag(self, tag_text: str):
+        tag_text = tag_text.strip()
+        if tag_text and len(tag_text) > 1 and len(tag_text) < 30 and "#" not in tag_text \
+                and tag_text not in self.tags and len(self.tags) < 10:
+            self.tags.append(tag_text)
+
+
+class StreamResult:
+    """流式获取的结果"""
+
+    def __init__(self, status_code: int, text: str, received: int, complete: bool):
+        self.status_code = status_code
+        # 已读取部分的HTML文本
+        self.text = text
+        self.received = received
+        # 是否读完了整个响应
+        self.complete = complete
+
+
+def stream_article(url: str, max_bytes: int = FETCH_MAX_BYTES, max_chars: int = MAX_CONTENT_CHARS,
+                   tag_scan_bytes: int = FETCH_TAG_SCAN_BYTES) -> StreamResult:
+    """
+    流式下载文章页面，找到完整正文及其后的标签或达到字节上限后停止读取
+    :param url: 文章链接
+    :param max_bytes: 最多读取的字节数
+    :param max_chars: 正文字数上限
+    :param tag_scan_bytes: 正文读完后为查找标签最多再读取的字节数
+    :return: StreamResult
+    """
+    parser = StreamingArticleParser(max_chars)
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    parts: List[str] = []
+    received = 0
+    # 正文读完时已读取的字节数
+    content_end: Optional[int] = None
+    complete = False
+
+    with get_http_client().stream('GET', url) as response:
+        status_code = response.status_code
+        for chunk in response.iter_bytes():
+            received += len(chunk)
+            text = decoder.decode(chunk)
+            parts.append(text)
+            if status_code == 200:
+                parser.feed(text)
+                if parser.done and content_end is None:
+                    content_end = received
+                if parser.finished:
+                    print(f"正文和标签已完整读取，提前结束下载（已读取 {received} 字节）")
+                    break
+                # 标签通常紧跟在正文之后，正文读完后最多再读取 tag_scan_bytes 字节查找标签
+                if content_end is not None and received - content_end >= tag_scan_bytes:
+                    print(f"正文已完整读取，提前结束下载（已读取 {received} 字节，标签 {len(parser.tags)} 个）")
+                    break
+            if received >= max_bytes:
+                print(f"页面超过 {max_bytes} 字节，停止读取")
+                break
+        else:
+            parts.append(decoder.decode(b'', final=True))
+            complete = True
+
+    return StreamResult(status_code, ''.join(parts), received, complete)
@@ -0,0 +1,32 @@
+"""
+URL工具函数
+"""
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# 不影响页面内容的跟踪参数
+TRACKING_PARAMS = {'spm', 'share_from', 'fbclid', 'gclid'}
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    规范化URL，用于缓存和去重
+    统一协议和域名大小写，去掉锚点、跟踪参数、默认端口和末尾斜杠，并对查询参数排序
+    :param url: 原始URL
+    :return: 规范化后的URL
+    """
+    url = (url or '').strip()
+    if not url:
+        return url
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if (scheme == 'http' and netloc.endswith(':80')) or (scheme == 'https' and netloc.endswith(':443')):
+        netloc = netloc.rsplit(':', 1)[0]
+    path = parts.path or '/'
+    if len(path) > 1:
+        path = path.rstrip('/')
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_') and key.lower() not in TRACKING_PARAMS
+    ))
+    return urlunsplit((scheme, netloc, path, query, ''))
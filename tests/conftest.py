@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 模块平铺在 src/small_redbook 下并以绝对路径互相导入
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'small_redbook'))
@@ -0,0 +1,132 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from copy_batch import CopyBatchRunner, batch_output_text
+
+
+class FakeBatchClient:
+    """模拟OpenAI兼容的文件和批处理接口，结果按请求中的文章标题生成"""
+
+    def __init__(self):
+        self.uploads = []
+        self.submitted = []
+        self.status = 'in_progress'
+        self.files = SimpleNamespace(create=self._create_file, content=self._content)
+        self.batches = SimpleNamespace(create=self._create_batch, retrieve=self._retrieve)
+
+    def with_options(self, **kwargs):
+        return self
+
+    def _create_file(self, file, purpose):
+        name, data, _ = file
+        self.uploads.append([json.loads(line) for line in data.read().decode('utf-8').splitlines()])
+        return SimpleNamespace(id=f"file-{len(self.uploads)}")
+
+    def _create_batch(self, input_file_id, endpoint, completion_window):
+        self.submitted.append(input_file_id)
+        return SimpleNamespace(id=f"batch-{input_file_id}", status='validating')
+
+    def _retrieve(self, batch_id):
+        done = self.status == 'completed'
+        return SimpleNamespace(id=batch_id, status=self.status, request_counts=None,
+                               output_file_id=f"out-{batch_id}" if done else None, error_file_id=None)
+
+    def _content(self, file_id):
+        requests = self.uploads[int(file_id.rsplit('-', 1)[1]) - 1]
+        lines = [{'custom_id': request['custom_id'],
+                  'response': {'status_code': 200,
+                               'body': {'choices': [{'message': {'content': request['body']['title']}}]}}}
+                 for request in requests]
+        return SimpleNamespace(text='\n'.join(json.dumps(line, ensure_ascii=False) for line in lines))
+
+
+class FakeCopyAgent:
+    def __init__(self, cached=()):
+        self.cached = set(cached)
+
+    def cached_copy(self, article, variants):
+        return {'title': article['title']} if article['title'] in self.cached else None
+
+    def batch_request(self, article, variants):
+        return {'title': article['title']}
+
+    def copy_from_batch_result(self, article, result, variants):
+        return {'title': result}
+
+
+def make_jobs(count):
+    return [(i, {'title': f"文章{i}", 'content': '正文', 'link': f"https://example.com/{i}"}) for i in range(count)]
+
+
+def make_runner(path, client, saved, copy_agent=None, fail_on=None, **kwargs):
+    def save_copy(index, article, copy_data, timestamp, current_time):
+        if index == fail_on:
+            raise KeyboardInterrupt
+        saved.append((index, copy_data and copy_data['title']))
+
+    options = dict(poll_interval=0, max_wait=0, max_requests=2, variants=1)
+    options.update(kwargs)
+    return CopyBatchRunner(copy_agent or FakeCopyAgent(), save_copy, path=path, client=client, **options)
+
+
+def test_batch_output_text():
+    assert batch_output_text({'response': {'status_code': 200,
+                                           'body': {'choices': [{'message': {'content': '文案'}}]}}}) == ('文案', None)
+    assert batch_output_text({'error': {'message': 'boom'}}) == (None, 'boom')
+    text, error = batch_output_text({'response': {'status_code': 500, 'body': {'error': {'message': 'down'}}}})
+    assert text is None and 'down' in error
+
+
+def test_cached_articles_are_saved_without_submitting(tmp_path):
+    path, client, saved = str(tmp_path / 'state.json'), FakeBatchClient(), []
+    runner = make_runner(path, client, saved, copy_agent=FakeCopyAgent(cached=['文章0', '文章1']))
+    assert runner.run(make_jobs(2), 'ts', 'now')
+    assert saved == [(0, '文章0'), (1, '文章1')]
+    assert client.uploads == []
+    assert not (tmp_path / 'state.json').exists()
+
+
+def test_resume_after_timeout_does_not_resubmit(tmp_path):
+    path, client, saved = str(tmp_path / 'state.json'), FakeBatchClient(), []
+    runner = make_runner(path, client, saved, max_wait=1e-9)
+    assert not runner.run(make_jobs(3), 'ts', 'now')
+    # 3篇文章按每批2个请求分成两个批处理，进度文件已记录
+    assert len(client.submitted) == 2
+    assert saved == []
+    assert (tmp_path / 'state.json').exists()
+
+    client.status = 'completed'
+    runner = make_runner(path, client, saved)
+    assert runner.pending
+    # 有未完成的批处理时，本次的新文章留到下次提交
+    assert runner.run(make_jobs(5), 'ts2', 'later')
+    assert len(client.uploads) == len(client.submitted) == 2
+    assert sorted(saved) == [(0, '文章0'), (1, '文章1'), (2, '文章2')]
+    assert not runner.pending
+    assert not (tmp_path / 'state.json').exists()
+
+
+def test_resume_after_interrupt_skips_saved_articles(tmp_path):
+    path, client, saved = str(tmp_path / 'state.json'), FakeBatchClient(), []
+    client.status = 'completed'
+    runner = make_runner(path, client, saved, fail_on=1)
+    with pytest.raises(KeyboardInterrupt):
+        runner.run(make_jobs(3), 'ts', 'now')
+    assert saved == [(0, '文章0')]
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f)['saved'] == ['article-0']
+
+    runner = make_runner(path, client, saved)
+    assert runner.run([], 'ts', 'now')
+    assert saved == [(0, '文章0'), (1, '文章1'), (2, '文章2')]
+    assert len(client.submitted) == 2
+
+
+def test_failed_requests_are_saved_without_copy(tmp_path):
+    path, client, saved = str(tmp_path / 'state.json'), FakeBatchClient(), []
+    client.status = 'expired'
+    runner = make_runner(path, client, saved)
+    assert runner.run(make_jobs(1), 'ts', 'now')
+    assert saved == [(0, None)]
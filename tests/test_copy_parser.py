@@ -0,0 +1,117 @@
+import pytest
+
+from copy_parser import (
+    CopyFormatError, IncrementalCopyParser, normalize_structured, parse_copy, parse_copy_sections, salvage_json,
+    split_variants,
+)
+
+COPY_TEXT = ("[标题开始]🔥 大模型又进化了[标题结束]\n"
+             "[正文开始]今天聊聊新发布的模型。[正文结束]\n"
+             "[标签开始]#AI #大模型 科技[标签结束]")
+EXPECTED = {'title': '🔥 大模型又进化了', 'content': '今天聊聊新发布的模型。', 'tags': ['#AI', '#大模型']}
+
+
+def feed_in_chunks(parser, text, size):
+    completed = []
+    for start in range(0, len(text), size):
+        completed.extend(parser.feed(text[start:start + size]))
+    return completed
+
+
+def test_parse_copy():
+    assert parse_copy(COPY_TEXT) == EXPECTED
+    assert parse_copy(COPY_TEXT.replace('[标签结束]', '')) is None
+    assert parse_copy('') is None
+
+
+def test_parse_copy_sections_returns_found_fields():
+    sections = parse_copy_sections(COPY_TEXT.replace('[正文结束]', ''))
+    assert sections == {'title': EXPECTED['title'], 'tags': EXPECTED['tags']}
+    assert parse_copy_sections(COPY_TEXT, fields=['tags']) == {'tags': EXPECTED['tags']}
+
+
+@pytest.mark.parametrize('size', [1, 3, 7, len(COPY_TEXT)])
+def test_incremental_parser_matches_full_parse(size):
+    seen = []
+    parser = IncrementalCopyParser(on_section=lambda name, value: seen.append(name))
+    completed = feed_in_chunks(parser, COPY_TEXT, size)
+    assert [name for name, _ in completed] == seen == ['title', 'content', 'tags']
+    assert parser.done
+    assert parser.result() == EXPECTED
+
+
+def test_incremental_parser_ignores_trailing_output():
+    parser = IncrementalCopyParser()
+    parser.feed(COPY_TEXT)
+    assert parser.feed('以上是文案') == []
+    assert parser.result() == EXPECTED
+    assert parser.received == len(COPY_TEXT) + len('以上是文案')
+
+
+def test_incremental_parser_result_is_none_until_done():
+    parser = IncrementalCopyParser()
+    parser.feed(COPY_TEXT[:COPY_TEXT.index('[标签开始]')])
+    assert not parser.done
+    assert parser.result() is None
+
+
+def test_incremental_parser_rejects_preamble():
+    parser = IncrementalCopyParser()
+    # 可能是开始标记的前半部分，继续等待
+    parser.feed('  [标题')
+    with pytest.raises(CopyFormatError):
+        parser.feed('xx')
+    with pytest.raises(CopyFormatError):
+        IncrementalCopyParser().feed('好的，以下是文案：')
+
+
+def test_incremental_parser_rejects_out_of_order_sections():
+    parser = IncrementalCopyParser()
+    with pytest.raises(CopyFormatError):
+        parser.feed('[标题开始]标题[正文开始]正文')
+    parser = IncrementalCopyParser()
+    with pytest.raises(CopyFormatError):
+        parser.feed('[标签开始]#AI[标签结束]')
+
+
+def test_incremental_parser_aborts_overlong_section():
+    parser = IncrementalCopyParser(max_chars={'title': 10, 'content': 50, 'tags': 20})
+    parser.feed('[标题开始]' + '长' * 10)
+    with pytest.raises(CopyFormatError):
+        parser.feed('长' * 10)
+    parser = IncrementalCopyParser(max_chars={'title': 10, 'content': 50, 'tags': 20})
+    with pytest.raises(CopyFormatError):
+        parser.feed('[标题开始]' + '长' * 11 + '[标题结束]')
+
+
+def test_salvage_json_reads_valid_json():
+    assert salvage_json('{"title": "标题", "tags": ["#AI"]}') == {'title': '标题', 'tags': ['#AI']}
+    assert salvage_json('[1, 2]') == {}
+    assert salvage_json('') == {}
+
+
+def test_salvage_json_recovers_fields_from_truncated_output():
+    text = '{"title": "新\\"模型\\"发布", "tags": ["#AI", "#大模型"], "content": "今天聊聊新发'
+    assert salvage_json(text) == {'title': '新"模型"发布', 'tags': ['#AI', '#大模型']}
+
+
+def test_normalize_structured_keeps_valid_fields():
+    assert normalize_structured({'title': ' 标题 ', 'content': '', 'tags': 'AI #大模型'}) == {
+        'title': '标题', 'tags': ['#AI', '#大模型']}
+    assert normalize_structured('{"content": "正文", "tags": [" ", 1]}') == {'content': '正文'}
+    assert normalize_structured(None) == {}
+
+
+def test_split_variants():
+    text = f"[文案1开始]{COPY_TEXT}[文案1结束]\n[文案2开始]第二个[文案2结束]"
+    variants = split_variants(text, 2)
+    assert variants == [COPY_TEXT, '第二个']
+    assert parse_copy(variants[0]) == EXPECTED
+
+
+def test_split_variants_keeps_truncated_and_skips_missing():
+    # 第1个缺少结束标记时取到第2个开始，最后一个被截断时取到末尾
+    text = "[文案1开始]一[文案2开始]二[文案2结束][文案3开始]三"
+    assert split_variants(text, 3) == ['一', '二', '三']
+    assert split_variants("[文案2开始]二[文案2结束]", 3) == ['二']
+    assert split_variants('', 2) == []
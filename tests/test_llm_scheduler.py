@@ -0,0 +1,124 @@
+import json
+
+import httpx
+import pytest
+
+from llm_scheduler import LLMScheduler, SchedulingTransport, TokenBucket, request_tokens, retry_after_seconds
+
+
+def make_scheduler(**kwargs):
+    options = dict(rpm=0, tpm=0, max_retries=3, retry_budget=10, backoff_base=0, backoff_max=0, retry_after_max=5)
+    options.update(kwargs)
+    return LLMScheduler(**options)
+
+
+def test_token_bucket_waits_for_deficit():
+    bucket = TokenBucket(60)
+    assert bucket.reserve(60, now=bucket._updated) == 0
+    # 桶已空，每秒补充1个，再预留2个需要等待2秒
+    assert bucket.reserve(2, now=bucket._updated) == pytest.approx(2)
+    # 后来者在预支的额度之后排队
+    assert bucket.reserve(1, now=bucket._updated) == pytest.approx(3)
+
+
+def test_token_bucket_refills_and_caps_large_requests():
+    bucket = TokenBucket(60)
+    start = bucket._updated
+    bucket.reserve(60, now=start)
+    assert bucket.reserve(10, now=start + 10) == 0
+    # 超过容量的请求按容量计算，不会永远等待
+    assert bucket.reserve(1000, now=start + 70) == 0
+
+
+def test_request_tokens_counts_prompt_and_completions():
+    body = {'messages': [{'role': 'user', 'content': 'hello'}], 'max_tokens': 100, 'n': 2}
+    request = httpx.Request('POST', 'https://api.example.com/v1/chat/completions', content=json.dumps(body))
+    tokens = request_tokens(request)
+    assert 200 < tokens < 220
+    assert request_tokens(httpx.Request('GET', 'https://api.example.com/v1/models')) == 0
+
+
+def test_retry_after_header():
+    assert retry_after_seconds(httpx.Response(429, headers={'retry-after': '3'})) == 3
+    assert retry_after_seconds(httpx.Response(429, headers={'retry-after-ms': '1500'})) == 1.5
+    assert retry_after_seconds(httpx.Response(429, headers={'retry-after': 'soon'})) is None
+    assert retry_after_seconds(httpx.Response(429)) is None
+
+
+def test_retry_delay_respects_max_retries():
+    scheduler = make_scheduler(max_retries=2)
+    response = httpx.Response(503)
+    assert scheduler.retry_delay(0, response=response) is not None
+    assert scheduler.retry_delay(1, response=response) is not None
+    assert scheduler.retry_delay(2, response=response) is None
+    assert (scheduler.retries, scheduler.failures) == (2, 1)
+
+
+def test_retry_budget_is_shared_across_requests():
+    scheduler = make_scheduler(retry_budget=2)
+    error = httpx.ConnectError('refused')
+    assert scheduler.retry_delay(0, error=error) is not None
+    assert scheduler.retry_delay(0, error=error) is not None
+    # 预算用完后即使单个请求还没到重试上限也放弃
+    assert scheduler.retry_delay(0, error=error) is None
+    assert scheduler.retries_left == 0
+
+    scheduler.start_run()
+    assert scheduler.retries_left == 2
+    assert scheduler.retry_delay(0, error=error) is not None
+
+
+def test_retry_after_is_capped_and_pauses_all_requests():
+    scheduler = make_scheduler(retry_after_max=5)
+    delay = scheduler.retry_delay(0, response=httpx.Response(429, headers={'retry-after': '120'}))
+    assert delay == 5
+    assert scheduler.throttled == 1
+    # 其他请求发送前同样需要等待
+    assert 4 < scheduler.acquire(0) <= 5
+
+
+def test_backoff_is_bounded():
+    scheduler = make_scheduler(backoff_base=1, backoff_max=4, max_retries=10)
+    for attempt in range(6):
+        assert 0 <= scheduler.retry_delay(attempt, response=httpx.Response(500)) <= min(4, 2 ** attempt)
+
+
+def test_transport_retries_retryable_status():
+    statuses = [429, 502, 200]
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        return httpx.Response(statuses[len(seen) - 1], headers={'retry-after-ms': '0'})
+
+    scheduler = make_scheduler()
+    with httpx.Client(transport=SchedulingTransport(httpx.MockTransport(handler), scheduler)) as client:
+        response = client.get('https://api.example.com/v1/models')
+    assert response.status_code == 200
+    assert len(seen) == 3
+    assert (scheduler.requests, scheduler.retries, scheduler.throttled) == (3, 2, 1)
+
+
+def test_transport_returns_non_retryable_status_immediately():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(400)
+
+    scheduler = make_scheduler()
+    with httpx.Client(transport=SchedulingTransport(httpx.MockTransport(handler), scheduler)) as client:
+        assert client.get('https://api.example.com/v1/models').status_code == 400
+    assert len(calls) == 1
+    assert scheduler.retries == 0
+
+
+def test_transport_raises_after_connection_errors_exhaust_retries():
+    def handler(request):
+        raise httpx.ConnectError('refused', request=request)
+
+    scheduler = make_scheduler(max_retries=2)
+    with httpx.Client(transport=SchedulingTransport(httpx.MockTransport(handler), scheduler)) as client:
+        with pytest.raises(httpx.ConnectError):
+            client.get('https://api.example.com/v1/models')
+    assert (scheduler.requests, scheduler.retries, scheduler.failures) == (3, 2, 1)
@@ -0,0 +1,99 @@
+import random
+
+import pytest
+
+from near_dup import (
+    BANDS, NUM_PERM, MinHashLSH, NearDuplicateIndex, band_keys, content_text, drop_near_duplicates, minhash, shingles,
+    similarity,
+)
+
+WORDS = [f"w{i}" for i in range(2000)]
+
+
+def make_text(seed, length=200):
+    rng = random.Random(seed)
+    return ' '.join(rng.choice(WORDS) for _ in range(length))
+
+
+def edit_text(text, changes, seed=0):
+    rng = random.Random(seed)
+    tokens = text.split()
+    for position in rng.sample(range(len(tokens)), changes):
+        tokens[position] = f"x{position}"
+    return ' '.join(tokens)
+
+
+def jaccard(a, b):
+    a, b = shingles(a), shingles(b)
+    return len(a & b) / len(a | b)
+
+
+def test_shingles_ignore_markup_and_case():
+    assert shingles('<p>Hello</p> WORLD') == shingles('hello world') == {'hello world'}
+    assert shingles('大模型') == {'大 模', '模 型'}
+    assert shingles('') == set()
+
+
+def test_minhash_is_stable_and_complete():
+    text = make_text(1)
+    signature = minhash(text)
+    assert len(signature) == NUM_PERM
+    assert signature == minhash(text)
+    assert len(band_keys(signature)) == BANDS
+    assert minhash('') == ()
+    # 片段很少时空桶借值后仍然是完整签名
+    assert len(minhash('only two')) == NUM_PERM
+
+
+@pytest.mark.parametrize('changes', [0, 5, 20, 60])
+def test_similarity_estimates_jaccard(changes):
+    base = make_text(2)
+    other = edit_text(base, changes)
+    assert similarity(minhash(base), minhash(other)) == pytest.approx(jaccard(base, other), abs=0.15)
+
+
+def test_similarity_of_unrelated_texts_is_low():
+    assert similarity(minhash(make_text(3)), minhash(make_text(4))) < 0.1
+    assert similarity((), minhash(make_text(3))) == 0
+
+
+def test_lsh_finds_near_duplicates_only():
+    base = make_text(5)
+    lsh = MinHashLSH(threshold=0.5)
+    lsh.add(minhash(base), 'base')
+    item, score = lsh.query(minhash(edit_text(base, 5)))
+    assert item == 'base' and score >= 0.5
+    assert lsh.query(minhash(make_text(6))) is None
+
+
+def test_drop_near_duplicates_keeps_first_of_each_cluster():
+    base, other = make_text(7), make_text(8)
+    articles = [
+        {'title': 'a', 'content': base},
+        {'title': 'b', 'content': other},
+        {'title': 'a-repost', 'content': edit_text(base, 4)},
+        {'title': 'empty', 'content': ''},
+    ]
+    kept = drop_near_duplicates(articles, 'content', content_text, threshold=0.5)
+    assert [article['title'] for article in kept] == ['a', 'b', 'empty']
+
+
+def test_index_skips_articles_processed_in_earlier_runs(tmp_path):
+    path = str(tmp_path / 'near_dup.sqlite3')
+    base = make_text(9)
+    index = NearDuplicateIndex(path, threshold=0.5)
+    index.add_article({'title': 'yesterday', 'link': 'https://example.com/1', 'summary': '', 'content': base})
+    index.close()
+
+    # 重新打开，模拟第二天的任务
+    index = NearDuplicateIndex(path, threshold=0.5)
+    title, score = index.query('content', minhash(edit_text(base, 5)))
+    assert title == 'yesterday' and score >= 0.5
+    assert index.query('content', minhash(make_text(10))) is None
+    # 不同类型的签名互不干扰
+    assert index.query('summary', minhash(base)) is None
+
+    articles = [{'title': 'repost', 'content': edit_text(base, 3)}, {'title': 'new', 'content': make_text(11)}]
+    kept = drop_near_duplicates(articles, 'content', content_text, index=index, threshold=0.5)
+    assert [article['title'] for article in kept] == ['new']
+    index.close()